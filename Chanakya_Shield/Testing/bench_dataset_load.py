@@ -0,0 +1,85 @@
+"""
+Benchmark: loading a CICIDS2017 CSV the way the training scripts used to
+(pd.read_csv over every column) against the columnar dataset cache
+(dataset_cache.py).
+
+Each mode runs in a fresh Python process so peak RSS is measured per mode:
+
+  csv          pd.read_csv with default dtypes, all columns
+  csv-pruned   read_csv limited to the cached columns, compact dtypes
+  cache        Parquet cache (built first if missing, outside the timing)
+
+    python Testing/bench_dataset_load.py datasets/CICIDS2017_full.csv
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MLMODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel")
+sys.path.append(MLMODEL_DIR)
+
+MODES = ("csv", "csv-pruned", "cache")
+
+
+def child(mode, source):
+    import pandas as pd
+    from dataset_cache import load_dataset
+    from perf import peak_rss_mb
+
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "csv":
+        df = pd.read_csv(source)
+        df.columns = df.columns.str.strip()
+    else:
+        df = load_dataset(source, use_cache=mode == "cache")
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'rows': len(df), 'columns': df.shape[1],
+                      'frame_mb': df.memory_usage(deep=True).sum() / 1e6,
+                      'peak_rss_mb': peak_rss_mb(), 'import_rss_mb': baseline_rss}))
+
+
+def run_mode(mode, source):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), source, "--child", mode],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.csv)
+        return
+
+    if "cache" in args.modes:
+        # Built in its own process: peak RSS carries over from a parent into
+        # the children it starts, so this one must stay small
+        subprocess.run([sys.executable, os.path.join(MLMODEL_DIR, "dataset_cache.py"), args.csv], check=True)
+
+    print(f"🔹 {args.csv} ({os.path.getsize(args.csv) / 1e6:.1f} MB)\n")
+    results = {mode: run_mode(mode, args.csv) for mode in args.modes}
+
+    print(f"{'mode':<12}{'load s':>9}{'rows':>12}{'cols':>6}{'frame MB':>10}{'peak RSS MiB':>14}")
+    for mode, r in results.items():
+        print(f"{mode:<12}{r['seconds']:>9.2f}{r['rows']:>12,}{r['columns']:>6}"
+              f"{r['frame_mb']:>10.1f}{r['peak_rss_mb']:>14.0f}")
+
+    if "csv" in results and "cache" in results:
+        base, cached = results["csv"], results["cache"]
+        print(f"\n⏱️  Load: {base['seconds']:.2f}s (CSV) -> {cached['seconds']:.2f}s (cache), "
+              f"{base['seconds'] / max(cached['seconds'], 1e-9):.1f}x faster")
+        print(f"💾 Frame: {base['frame_mb']:.1f} MB -> {cached['frame_mb']:.1f} MB, "
+              f"peak RSS {base['peak_rss_mb']:.0f} -> {cached['peak_rss_mb']:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: legacy detection insert paths vs the pooled bulk DetectionWriter.
+
+  per_row_commit     one INSERT + COMMIT per row (old replay_from_csv / inject_attacks)
+  connect_per_batch  new connection per 10 rows, one INSERT per row (old analysis.py)
+  bulk_writer        mlmodel/db_writer.py: pooled connection, executemany, batched commits
+
+Runs against a throwaway SQLite file by default. Pass --mysql to use the
+database from .env (rows go to a scratch table that is dropped afterwards).
+
+    python Testing/bench_db_writes.py --rows 20000
+    python Testing/bench_db_writes.py --rows 20000 --mysql
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel"))
+from db_writer import (
+    DetectionWriter, MySQLBackend, SQLiteBackend, PACKETS_DDL, PACKET_COLUMNS, db_config_from_env
+)
+
+BENCH_TABLE = "packets_bench"
+LEGACY_BATCH = 10
+
+
+def make_rows(n):
+    now = datetime.datetime.now()
+    return [
+        (now, f"192.168.1.{i % 254 + 1}", "10.0.0.1", "6", 60 + i % 1400, 2,
+         "Anomaly" if i % 7 == 0 else "Normal", "Classified as DDoS", "DDoS")
+        for i in range(n)
+    ]
+
+
+def insert_sql(placeholder):
+    marks = ",".join([placeholder] * len(PACKET_COLUMNS))
+    return f"INSERT INTO {BENCH_TABLE} ({', '.join(PACKET_COLUMNS)}) VALUES ({marks})"
+
+
+def per_row_commit(connect, placeholder, rows):
+    conn = connect()
+    cursor = conn.cursor()
+    sql = insert_sql(placeholder)
+    for row in rows:
+        cursor.execute(sql, row)
+        conn.commit()
+    conn.close()
+
+
+def connect_per_batch(connect, placeholder, rows):
+    sql = insert_sql(placeholder)
+    for start in range(0, len(rows), LEGACY_BATCH):
+        conn = connect()
+        cursor = conn.cursor()
+        for row in rows[start:start + LEGACY_BATCH]:
+            cursor.execute(sql, row)
+        conn.commit()
+        conn.close()
+
+
+def bulk_writer(backend, rows):
+    writer = DetectionWriter(backend=backend, table=BENCH_TABLE)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--mysql", action="store_true", help="Benchmark against the MySQL server from .env")
+    args = parser.parse_args()
+
+    if args.mysql:
+        import mysql.connector
+        config = db_config_from_env()
+        backend = MySQLBackend(**config)
+        connect = lambda: mysql.connector.connect(**config)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="packeteye_bench_"), "bench.db")
+        backend = SQLiteBackend(path)
+        connect = lambda: sqlite3.connect(path)
+
+    ddl = backend.ddl(PACKETS_DDL).replace("packets", BENCH_TABLE)
+    conn = connect()
+    conn.cursor().execute(ddl)
+    conn.commit()
+    conn.close()
+
+    rows = make_rows(args.rows)
+    runs = [
+        ("per_row_commit", lambda: per_row_commit(connect, backend.placeholder, rows)),
+        ("connect_per_batch", lambda: connect_per_batch(connect, backend.placeholder, rows)),
+        ("bulk_writer", lambda: bulk_writer(backend, rows)),
+    ]
+
+    print(f"📊 Inserting {len(rows)} rows into {'MySQL' if args.mysql else 'SQLite'} ({BENCH_TABLE})\n")
+    results = {}
+    for name, run in runs:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        results[name] = len(rows) / elapsed
+        print(f"   {name:<18} {elapsed:8.3f} s   {results[name]:>12,.0f} rows/s")
+
+    baseline = min(results["per_row_commit"], results["connect_per_batch"])
+    print(f"\n✅ bulk_writer speedup vs slowest legacy path: {results['bulk_writer'] / baseline:.1f}x")
+
+    conn = connect()
+    conn.cursor().execute(f"DROP TABLE {BENCH_TABLE}")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
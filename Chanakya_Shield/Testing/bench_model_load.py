@@ -0,0 +1,127 @@
+"""
+Benchmark: model startup time and per-process memory, legacy pickles vs
+the versioned model bundle (model_bundle.py).
+
+Each mode is loaded in --workers fresh Python processes at the same time,
+as the sniffer's worker processes would be. Every worker loads the models,
+scores one batch (so the model pages are actually touched) and then waits
+while the parent reads its RSS and PSS from /proc. PSS divides shared pages
+between the processes mapping them, so the summed PSS shows how much the
+memory-mapped bundle saves once several workers share it.
+
+    python Testing/bench_model_load.py --workers 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MLMODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel")
+sys.path.append(MLMODEL_DIR)
+from perf import memory_mb
+
+MODES = ("pickles", "bundle", "bundle-mmap")
+
+
+def load(mode):
+    import joblib
+    from model_bundle import load_bundle
+
+    if mode == "pickles":
+        iso_model = joblib.load(os.path.join(MLMODEL_DIR, "anomaly_model.pkl"))
+        classifier = joblib.load(os.path.join(MLMODEL_DIR, "attack_classifier.pkl"))
+        scaler = joblib.load(os.path.join(MLMODEL_DIR, "scaler.pkl"))
+        selected_idx = joblib.load(os.path.join(MLMODEL_DIR, "selected_features_idx.pkl"))
+    else:
+        bundle = load_bundle(mmap=mode == "bundle-mmap")
+        iso_model, classifier, scaler = bundle.iso_model, bundle.classifier, bundle.scaler
+        selected_idx = bundle.selected_features_idx
+    return iso_model, classifier, scaler, selected_idx
+
+
+def child(mode):
+    """Worker process: load, score one batch, report, wait for the parent."""
+    start = time.perf_counter()
+    import numpy as np
+    imported = time.perf_counter()
+    iso_model, classifier, scaler, selected_idx = load(mode)
+    loaded = time.perf_counter()
+
+    X = scaler.transform(np.random.default_rng(0).normal(size=(256, scaler.n_features_in_)))
+    X = X[:, selected_idx] if selected_idx is not None else X
+    iso_model.decision_function(X)
+    classifier.predict_proba(X)
+    scored = time.perf_counter()
+
+    print(json.dumps({'load_s': loaded - imported, 'first_batch_s': scored - loaded,
+                      'startup_s': scored - start}), flush=True)
+    sys.stdin.read()
+
+
+def run_mode(mode, workers):
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", mode],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(workers)]
+    try:
+        reports = [json.loads(p.stdout.readline()) for p in procs]
+        memory = [memory_mb(p.pid) or {} for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+    def mean(key, rows):
+        values = [row[key] for row in rows if key in row]
+        return sum(values) / len(values) if values else float("nan")
+
+    return {
+        'load_s': mean('load_s', reports),
+        'startup_s': mean('startup_s', reports),
+        'first_batch_s': mean('first_batch_s', reports),
+        'rss_mb': mean('rss', memory),
+        'pss_mb': mean('pss', memory),
+        'total_pss_mb': sum(m.get('pss', 0.0) for m in memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent worker processes per mode")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    from model_bundle import MODELS_FILE, BundleError, read_manifest
+    try:
+        manifest = read_manifest()
+    except BundleError:
+        print("❌ No model bundle; run train_classifier.py or model_bundle.py --from-pickles first")
+        sys.exit(1)
+    print(f"🔹 {args.workers} concurrent workers per mode, bundle {manifest['version']} "
+          f"{manifest['files'][MODELS_FILE]['bytes'] / 1e6:.1f} MB\n")
+
+    results = {mode: run_mode(mode, args.workers) for mode in args.modes}
+
+    print(f"{'mode':<14}{'load ms':>10}{'startup ms':>12}{'1st batch ms':>14}"
+          f"{'RSS MiB':>10}{'PSS MiB':>10}{'total PSS':>11}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['load_s'] * 1000:>10.1f}{r['startup_s'] * 1000:>12.1f}"
+              f"{r['first_batch_s'] * 1000:>14.1f}{r['rss_mb']:>10.1f}{r['pss_mb']:>10.1f}"
+              f"{r['total_pss_mb']:>11.1f}")
+
+    if "pickles" in results and "bundle-mmap" in results:
+        base, mapped = results["pickles"], results["bundle-mmap"]
+        print(f"\n💾 Total PSS across {args.workers} workers: {base['total_pss_mb']:.1f} MiB (pickles) -> "
+              f"{mapped['total_pss_mb']:.1f} MiB (memory-mapped bundle)")
+        print(f"⏱️  Model load: {base['load_s'] * 1000:.0f} ms -> {mapped['load_s'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
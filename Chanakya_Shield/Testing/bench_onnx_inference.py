@@ -0,0 +1,100 @@
+"""
+Benchmark: joblib vs onnxruntime scoring backend across batch sizes.
+
+Each batch runs the same steps as analysis.process_batch in "full" mode:
+preprocess (scaler + feature selection), IsolationForest, ensemble
+predict_proba and the per-class threshold decision. Export the graphs
+first with ``python mlmodel/export_onnx.py``.
+
+    python Testing/bench_onnx_inference.py
+    python Testing/bench_onnx_inference.py --batches 1 10 100 --threads 1
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+MLMODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel")
+sys.path.append(MLMODEL_DIR)
+from onnx_backend import ONNX_DIR, load_onnx_models
+from scoring import apply_thresholds, benign_index, threshold_vector
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+MIN_ROWS = 20000      # rows scored per batch size (at least 5 batches)
+
+
+def joblib_backend():
+    scaler = joblib.load(os.path.join(MLMODEL_DIR, "scaler.pkl"))
+    selected_idx = joblib.load(os.path.join(MLMODEL_DIR, "selected_features_idx.pkl"))
+
+    def preprocess(X):
+        return scaler.transform(X)[:, selected_idx]
+
+    return (preprocess,
+            joblib.load(os.path.join(MLMODEL_DIR, "anomaly_model.pkl")),
+            joblib.load(os.path.join(MLMODEL_DIR, "attack_classifier.pkl")))
+
+
+def score(backend, X, thresholds, benign_idx):
+    preprocess, iso_model, ensemble = backend
+    X_scaled = preprocess(X)
+    iso_model.predict(X_scaled)
+    return apply_thresholds(ensemble.predict_proba(X_scaled), thresholds, benign_idx)
+
+
+def bench(backend, X, batch_size, thresholds, benign_idx):
+    batches = max(5, MIN_ROWS // batch_size)
+    score(backend, X[:batch_size], thresholds, benign_idx)  # warm-up
+    times = []
+    for b in range(batches):
+        start = (b * batch_size) % (len(X) - batch_size + 1)
+        t0 = time.perf_counter()
+        score(backend, X[start:start + batch_size], thresholds, benign_idx)
+        times.append(time.perf_counter() - t0)
+    times = np.array(times)
+    return {'ms_per_batch': float(np.median(times)) * 1000,
+            'p99_ms': float(np.percentile(times, 99)) * 1000,
+            'rows_per_s': batch_size / float(np.median(times))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads (0 = default)")
+    parser.add_argument("--onnx-dir", default=ONNX_DIR)
+    args = parser.parse_args()
+
+    print("🔹 Loading models...")
+    reference = joblib_backend()
+    onnx_preprocess, onnx_iso, onnx_ensemble = load_onnx_models(reference[2], args.onnx_dir, threads=args.threads)
+    onnx = (onnx_preprocess.transform, onnx_iso, onnx_ensemble)
+
+    label_map = joblib.load(os.path.join(MLMODEL_DIR, "attack_labels.pkl"))
+    inv_label_map = {v: k for k, v in label_map.items()}
+    thresholds = threshold_vector(joblib.load(os.path.join(MLMODEL_DIR, "optimal_thresholds.pkl")),
+                                  len(inv_label_map))
+    benign_idx = benign_index(inv_label_map)
+
+    scaler = joblib.load(os.path.join(MLMODEL_DIR, "scaler.pkl"))
+    rng = np.random.RandomState(0)
+    X = np.abs(rng.normal(scaler.mean_, scaler.scale_, size=(max(args.batches) * 2, len(scaler.mean_))))
+
+    agreement = np.mean(score(reference, X, thresholds, benign_idx) == score(onnx, X, thresholds, benign_idx))
+    print(f"✅ Prediction agreement joblib vs onnx: {agreement:.4%}\n")
+
+    print(f"{'batch':>7} | {'joblib ms':>10} {'rows/s':>10} | {'onnx ms':>10} {'rows/s':>10} | {'speedup':>7}")
+    print("-" * 66)
+    for batch_size in args.batches:
+        ref = bench(reference, X, batch_size, thresholds, benign_idx)
+        fast = bench(onnx, X, batch_size, thresholds, benign_idx)
+        print(f"{batch_size:>7} | {ref['ms_per_batch']:>10.3f} {ref['rows_per_s']:>10.0f} | "
+              f"{fast['ms_per_batch']:>10.3f} {fast['rows_per_s']:>10.0f} | "
+              f"{ref['ms_per_batch'] / fast['ms_per_batch']:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
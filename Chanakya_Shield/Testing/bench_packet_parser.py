@@ -0,0 +1,115 @@
+"""
+Benchmark: scapy dissection vs the vectorized raw header parser.
+
+Builds a mix of Ethernet frames (TCP, UDP, VLAN / QinQ, IP options,
+fragments, ARP, IPv6), checks that packet_parser.py extracts the same
+fields as the scapy path in analysis.extract_features(), then measures
+packets per second for both.
+
+    python Testing/bench_packet_parser.py --packets 50000 --batch 256
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from scapy.all import ARP, Dot1AD, Dot1Q, Ether, IP, IPv6, TCP, UDP, Raw
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel"))
+from flow_table import ip_to_int
+from packet_parser import PROTO_TCP, parse_batch
+
+
+def random_ip(rng):
+    return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def make_frames(n, seed=0):
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(n):
+        kind = rng.random()
+        ip = IP(src=random_ip(rng), dst=random_ip(rng))
+        tcp = TCP(sport=rng.randint(1024, 65535), dport=rng.choice([22, 80, 443, 8080]),
+                  flags=rng.choice(["S", "SA", "A", "PA", "FA", "R", "SEC"]))
+        payload = Raw(b"x" * rng.randint(0, 1200))
+        if kind < 0.55:
+            pkt = Ether() / ip / tcp / payload
+        elif kind < 0.75:
+            pkt = Ether() / ip / UDP(sport=5353, dport=rng.choice([53, 123, 161])) / payload
+        elif kind < 0.85:
+            pkt = Ether() / Dot1Q(vlan=10) / ip / tcp / payload
+        elif kind < 0.88:
+            pkt = Ether() / Dot1AD(vlan=20) / Dot1Q(vlan=10) / ip / tcp / payload
+        elif kind < 0.91:
+            pkt = Ether() / IP(src=ip.src, dst=ip.dst, options=b"\x01" * 8) / tcp / payload
+        elif kind < 0.94:
+            pkt = Ether() / IP(src=ip.src, dst=ip.dst, frag=10, proto=6) / payload
+        elif kind < 0.97:
+            pkt = Ether() / ARP(psrc=ip.src, pdst=ip.dst)
+        else:
+            pkt = Ether() / IPv6() / tcp / payload
+        frames.append(bytes(pkt))
+    return frames
+
+
+def scapy_fields(frame):
+    """Same field extraction as analysis.extract_features()."""
+    packet = Ether(frame)
+    if not packet.haslayer(IP):
+        return None
+    ip = packet[IP]
+    tcp = packet[TCP] if packet.haslayer(TCP) else None
+    return (ip_to_int(ip.src), ip_to_int(ip.dst), ip.proto, len(packet),
+            int(tcp.flags) if tcp is not None else 0, tcp.dport if tcp is not None else 0)
+
+
+def raw_fields(frames, batch):
+    out = []
+    for start in range(0, len(frames), batch):
+        parsed = parse_batch(frames[start:start + batch])
+        dport = np.where(parsed.proto == PROTO_TCP, parsed.dport, 0)
+        for i in range(len(parsed)):
+            if not parsed.valid[i]:
+                out.append(None)
+            else:
+                out.append((int(parsed.src[i]), int(parsed.dst[i]), int(parsed.proto[i]),
+                            int(parsed.length[i]), int(parsed.flags[i]), int(dport[i])))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"🔹 Building {args.packets} frames...")
+    frames = make_frames(args.packets)
+
+    check = frames[:5000]
+    expected = [scapy_fields(f) for f in check]
+    mismatches = sum(a != b for a, b in zip(expected, raw_fields(check, args.batch)))
+    print(f"✅ Parity on {len(check)} frames: {mismatches} mismatches\n")
+
+    t0 = time.perf_counter()
+    for frame in frames:
+        scapy_fields(frame)
+    scapy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for start in range(0, len(frames), args.batch):
+        parse_batch(frames[start:start + args.batch])
+    raw_s = time.perf_counter() - t0
+
+    print(f"{'path':<22}{'seconds':>10}{'pkts/s':>14}")
+    print(f"{'scapy dissection':<22}{scapy_s:>10.3f}{len(frames) / scapy_s:>14,.0f}")
+    print(f"{'raw parser':<22}{raw_s:>10.3f}{len(frames) / raw_s:>14,.0f}")
+    print(f"\n⚡ Speedup: {scapy_s / raw_s:.1f}x (batch {args.batch})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+End-to-end benchmark of the detection pipeline in analysis.py.
+
+Frames (synthetic, or the first --packets of a pcap) go through the raw
+header parser, flow features, the staged pipeline and process_batch. The
+database is an in-memory SQLite backend and Telegram alerts are counted in
+memory, so no MySQL, network or root is needed. Each packet is stamped
+with the wall-clock time it was handed to the pipeline. Its detection
+latency is the time until the sink stage receives its scored row.
+
+Reports packets/s, p50/p95/p99 detection latency, peak RSS, per-stage
+time and batching stats. Writes them as JSON and compares them with a
+stored baseline (exit code 1 on a regression beyond --tolerance).
+
+    python Testing/bench_pipeline.py --packets 20000
+    python Testing/bench_pipeline.py --pcap capture.pcap --rate 5000 --log-csv detections_log.csv
+    python Testing/bench_pipeline.py --save-baseline
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(TESTING_DIR), "mlmodel"))
+import db_writer
+from packet_parser import parse_batch
+from perf import StageTimers, peak_rss_mb, percentiles
+
+BASELINE_PATH = os.path.join(TESTING_DIR, "baselines", "pipeline.json")
+
+# metric -> True if higher is better
+COMPARED_METRICS = {
+    'packets_per_s': True,
+    'latency_ms_p50': False,
+    'latency_ms_p95': False,
+    'latency_ms_p99': False,
+    'peak_rss_mb': False,
+}
+
+
+class MemoryAlerts:
+    """Stand-in for TelegramDispatcher that only counts submitted alerts."""
+
+    def __init__(self):
+        self.submitted = 0
+        self.sent = 0
+
+    def submit(self, text, key=None):
+        self.submitted += 1
+        self.sent += 1
+        return True
+
+    def close(self, timeout=None):
+        pass
+
+    def stats(self):
+        return {'sent': self.submitted}
+
+
+def load_frames(args):
+    if args.pcap:
+        from scapy.utils import RawPcapReader
+        frames = []
+        for path in args.pcap:
+            with RawPcapReader(path) as reader:
+                for data, _ in reader:
+                    frames.append(data)
+                    if len(frames) >= args.packets:
+                        return frames
+        return frames
+    from bench_packet_parser import make_frames
+    return make_frames(args.packets)
+
+
+def run(args):
+    # In-memory sinks must be in place before analysis creates its writer
+    db_writer.set_backend(db_writer.SQLiteBackend())
+    import analysis
+
+    alerts = MemoryAlerts()
+    analysis.alert_dispatcher = alerts
+    pipeline = analysis.pipeline
+
+    timers = StageTimers()
+    latencies = []
+    log = [] if args.log_csv else None
+
+    sink = pipeline.sink.handler
+
+    def measured_sink(result):
+        detected = datetime.datetime.now()
+        for row in result[0]:
+            latency = (detected - row[0]).total_seconds() * 1000
+            latencies.append(latency)
+            if log is not None:
+                log.append((row[0], detected, latency) + tuple(row[1:]))
+        sink(result)
+
+    pipeline.score = timers.wrap('score', pipeline.score)
+    pipeline.sink.handler = timers.wrap('sink', measured_sink)
+
+    frames = load_frames(args)
+    print(f"🔹 Benchmarking {len(frames)} packets "
+          f"({'max rate' if not args.rate else f'{args.rate} pkts/s'}, {args.batch_frames} frames per read)")
+
+    pipeline.start()
+    start = time.perf_counter()
+    for offset in range(0, len(frames), args.batch_frames):
+        chunk = frames[offset:offset + args.batch_frames]
+        if args.rate:
+            delay = start + offset / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        with timers.time('parse'):
+            parsed = parse_batch(chunk)
+        with timers.time('capture'):
+            analysis.process_frames(parsed, np.full(len(chunk), time.time()))
+    pipeline.stop()
+    analysis.detection_writer.close()
+    elapsed = time.perf_counter() - start
+
+    stats = pipeline.stats()
+    latency = percentiles(latencies)
+    results = {
+        'packets': len(frames),
+        'scored': len(latencies),
+        'dropped': stats['capture']['dropped'] + stats['inference']['dropped'] + stats['sink']['dropped'],
+        'seconds': elapsed,
+        'packets_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms_p50': latency['p50'],
+        'latency_ms_p95': latency['p95'],
+        'latency_ms_p99': latency['p99'],
+        'peak_rss_mb': peak_rss_mb(),
+        'alerts': alerts.submitted,
+        'stages': timers.summary(),
+        'batching': stats['batching'],
+    }
+    if log is not None:
+        write_log(args.log_csv, log)
+    return results
+
+
+def write_log(path, log):
+    """Per-packet detection log in the detections_log.csv format."""
+    with open(path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["seen_time", "detected_time", "detection_latency_ms", "src_ip", "dst_ip",
+                      "protocol", "length", "status", "reason", "attack_type", "ground_truth_label"])
+        for seen, detected, latency, src, dst, proto, length, _flags, status, reason, attack, _version in log:
+            out.writerow([seen.isoformat(), detected.isoformat(), f"{latency:.3f}", src, dst,
+                          proto, length, status, reason, attack, ""])
+    print(f"📁 Detection log saved: {path}")
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against the baseline; returns the regressed metric names."""
+    regressions = []
+    print(f"\n{'metric':<18}{'baseline':>12}{'current':>12}{'change':>10}")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = baseline['results'].get(metric), results.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  ⚠️ regression" if worse > tolerance else ""
+        if flag:
+            regressions.append(metric)
+        print(f"{metric:<18}{old:>12.1f}{new:>12.1f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--pcap", nargs="+", metavar="FILE", help="Use recorded packets instead of synthetic ones")
+    parser.add_argument("--rate", type=float, default=0, help="Offered load in packets/s (0 = as fast as possible)")
+    parser.add_argument("--batch-frames", type=int, default=256, help="Frames per capture read")
+    parser.add_argument("--json", default="bench_pipeline.json", help="Where to write the results")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--log-csv", help="Also write a per-packet detections log with detection_latency_ms")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec="seconds"),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'config': {'packets': args.packets, 'pcap': args.pcap, 'rate': args.rate,
+                   'batch_frames': args.batch_frames},
+        'results': results,
+    }
+
+    print(f"\n{'='*60}")
+    print(f"📊 {results['scored']} packets scored in {results['seconds']:.2f}s "
+          f"({results['packets_per_s']:,.0f} pkts/s), {results['dropped']} dropped")
+    print(f"⏱️  Detection latency p50 {results['latency_ms_p50']:.1f} ms | "
+          f"p95 {results['latency_ms_p95']:.1f} ms | p99 {results['latency_ms_p99']:.1f} ms")
+    if results['peak_rss_mb'] is not None:
+        print(f"💾 Peak RSS {results['peak_rss_mb']:.0f} MiB")
+    for stage, timing in results['stages'].items():
+        print(f"   {stage:<8} {timing['seconds']:>8.2f}s over {timing['calls']} calls "
+              f"({timing['ms_per_call']:.2f} ms/call)")
+    print(f"{'='*60}")
+
+    with open(args.json, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📁 Results saved: {args.json}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📁 Baseline saved: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            print(f"⚠️  Baseline was recorded with {baseline.get('config')}; numbers may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline")
+    else:
+        print("ℹ️  No baseline found; run with --save-baseline to create one")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 
+import os
+import sys
 import pandas as pd
 from pathlib import Path
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel"))
+from dataset_cache import load_dataset
+
 CSV_FOLDER = Path("TestingDatasets")
 OUTPUT_CSV = Path("datasets/payload_data_CICIDS2017_17features.csv")
 
@@ -24,9 +29,7 @@ print(f"Found {len(csv_files)} CSV files. Reading...")
 dfs = []
 for p in csv_files:
     try:
-        df = pd.read_csv(p, low_memory=False)
-        df.columns = df.columns.str.strip()
-        dfs.append(df)
+        dfs.append(load_dataset(p))
         print("✅ Loaded", p.name)
     except Exception as e:
         print("⚠️ Skipping", p, "due to error:", e)
@@ -35,6 +38,8 @@ if not dfs:
     raise SystemExit("No valid CSVs loaded.")
 
 full = pd.concat(dfs, ignore_index=True)
+# Plain values again, so the zero fill below also works on label/IP columns
+full = full.astype({c: object for c in full.select_dtypes("category").columns})
 print("Combined shape:", full.shape)
 
 
@@ -68,7 +73,12 @@ if "Protocol" not in full.columns:
     print("⚠️ No protocol column found — assigning random TCP/UDP/ICMP.")
     full["Protocol"] = pd.Series([6,17,1])[pd.Series(range(len(full))) % 3].values
 
-cols_out = selected_features + ["Src IP","Dst IP","Protocol",label_col]
+# Timestamps drive the replay scheduler in replay_from_csv.py
+time_col = next((c for c in ("Timestamp", "Time") if c in full.columns), None)
+if time_col is None:
+    print("⚠️ No Timestamp column — replay_from_csv.py will use a synthetic arrival rate.")
+
+cols_out = selected_features + ["Src IP","Dst IP","Protocol"] + ([time_col] if time_col else []) + [label_col]
 
 out_df = full[cols_out].replace([pd.NA, pd.NaT, float('inf'), float('-inf')], 0).fillna(0)
 print("✅ Final dataset columns:", list(out_df.columns))
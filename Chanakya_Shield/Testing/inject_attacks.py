@@ -4,29 +4,33 @@ Bypasses network capture and directly inserts attack patterns into database
 Works WITHOUT Npcap!
 """
 
-import mysql.connector
 import datetime
 import random
 import time
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", ""),
-        database=os.getenv("DB_NAME", "packeteye")
-    )
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mlmodel"))
+from db_writer import DetectionWriter, check_schema, normal_sample_rate
+
+_writer = None
+
+def get_writer():
+    """Shared pooled bulk writer (rows become visible within a second)."""
+    global _writer
+    if _writer is None:
+        check_schema()
+        _writer = DetectionWriter(normal_sample_rate=normal_sample_rate())
+    return _writer
 
 def inject_benign_traffic(count=20):
     """Inject normal benign traffic"""
     print(f"[🟢 Benign] Injecting {count} benign packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     for i in range(count):
         timestamp = datetime.datetime.now()
@@ -36,25 +40,19 @@ def inject_benign_traffic(count=20):
         length = random.randint(500, 1500)
         flags = random.randint(16, 24)  # Normal ACK/PSH flags
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags, 
-              "Normal", "Normal traffic", "BENIGN"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags, 
+                      "Normal", "Normal traffic", "BENIGN"))
         
         if (i + 1) % 5 == 0:
             print(f"  ✓ Injected {i + 1}/{count} benign packets")
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ Benign] Completed - {count} benign packets injected\n")
 
 def inject_ddos_attack(count=50):
     """Inject DDoS attack pattern"""
     print(f"[🔴 DDoS] Injecting {count} DDoS attack packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     for i in range(count):
         timestamp = datetime.datetime.now()
@@ -64,26 +62,20 @@ def inject_ddos_attack(count=50):
         length = random.randint(40, 100)
         flags = 2  # SYN flag
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags,
-              "Anomaly", "Classified as DDoS", "DDoS"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags,
+                      "Anomaly", "Classified as DDoS", "DDoS"))
         
         if (i + 1) % 10 == 0:
             print(f"  ✓ Injected {i + 1}/{count} DDoS packets")
         time.sleep(0.01)
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ DDoS] Completed - {count} DDoS attack packets injected\n")
 
 def inject_port_scan(count=100):
     """Inject port scan pattern"""
     print(f"[🔴 PortScan] Injecting {count} port scan packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     src_ip = f"192.168.1.{random.randint(10, 200)}"
     
@@ -95,26 +87,20 @@ def inject_port_scan(count=100):
         length = 60
         flags = 2  # SYN flag
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags,
-              "Anomaly", "Classified as PortScan", "PortScan"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags,
+                      "Anomaly", "Classified as PortScan", "PortScan"))
         
         if (i + 1) % 20 == 0:
             print(f"  ✓ Injected {i + 1}/{count} port scan packets")
         time.sleep(0.005)
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ PortScan] Completed - {count} port scan packets injected\n")
 
 def inject_dos_hulk(count=40):
     """Inject DoS Hulk attack"""
     print(f"[🔴 DoS Hulk] Injecting {count} DoS Hulk packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     for i in range(count):
         timestamp = datetime.datetime.now()
@@ -124,26 +110,20 @@ def inject_dos_hulk(count=40):
         length = random.randint(100, 500)
         flags = 2  # SYN
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags,
-              "Anomaly", "Classified as DoS Hulk", "DoS Hulk"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags,
+                      "Anomaly", "Classified as DoS Hulk", "DoS Hulk"))
         
         if (i + 1) % 10 == 0:
             print(f"  ✓ Injected {i + 1}/{count} DoS Hulk packets")
         time.sleep(0.01)
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ DoS Hulk] Completed - {count} DoS Hulk packets injected\n")
 
 def inject_ssh_brute_force(count=30):
     """Inject SSH brute force attack"""
     print(f"[🔴 SSH-Patator] Injecting {count} SSH brute force packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     src_ip = f"192.168.1.{random.randint(10, 200)}"
     
@@ -154,26 +134,20 @@ def inject_ssh_brute_force(count=30):
         length = random.randint(100, 300)
         flags = 24  # PSH+ACK
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags,
-              "Anomaly", "Classified as SSH-Patator", "SSH-Patator"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags,
+                      "Anomaly", "Classified as SSH-Patator", "SSH-Patator"))
         
         if (i + 1) % 10 == 0:
             print(f"  ✓ Injected {i + 1}/{count} SSH brute force packets")
         time.sleep(0.05)
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ SSH-Patator] Completed - {count} SSH brute force packets injected\n")
 
 def inject_web_attack(count=25):
     """Inject web attack"""
     print(f"[🔴 Web Attack] Injecting {count} web attack packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     for i in range(count):
         timestamp = datetime.datetime.now()
@@ -183,26 +157,20 @@ def inject_web_attack(count=25):
         length = random.randint(200, 800)
         flags = 24  # PSH+ACK
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags,
-              "Anomaly", "Classified as Web Attack", "Web Attack"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags,
+                      "Anomaly", "Classified as Web Attack", "Web Attack"))
         
         if (i + 1) % 10 == 0:
             print(f"  ✓ Injected {i + 1}/{count} web attack packets")
         time.sleep(0.05)
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ Web Attack] Completed - {count} web attack packets injected\n")
 
 def inject_bot_traffic(count=15):
     """Inject bot traffic"""
     print(f"[🔴 Bot] Injecting {count} bot traffic packets...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    writer = get_writer()
     
     src_ip = f"192.168.1.{random.randint(10, 200)}"
     
@@ -213,19 +181,14 @@ def inject_bot_traffic(count=15):
         length = random.randint(150, 400)
         flags = 24  # PSH+ACK
         
-        cursor.execute("""
-            INSERT INTO packets 
-            (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (timestamp, src_ip, dest_ip, protocol, length, flags,
-              "Anomaly", "Classified as Bot", "Bot"))
+        writer.write((timestamp, src_ip, dest_ip, protocol, length, flags,
+                      "Anomaly", "Classified as Bot", "Bot"))
         
         if (i + 1) % 5 == 0:
             print(f"  ✓ Injected {i + 1}/{count} bot packets")
         time.sleep(0.1)
     
-    conn.commit()
-    conn.close()
+    writer.flush()
     print(f"[✅ Bot] Completed - {count} bot traffic packets injected\n")
 
 def run_full_simulation():
@@ -1,22 +1,34 @@
 
 """
-Telegram alert service that polls MySQL for new anomaly rows and only
+Telegram alert service that reads new anomaly rows from MySQL and only
 sends Telegram notifications for attack types present in ALERT_WHITELIST.
 
 - Edit ALERT_WHITELIST to include the attack names you want alerts for.
-- last_id is persisted to last_id.txt so restarts don't resend old alerts.
+- Rows are read in bounded keyset pages (mlmodel/alert_feed.py); last_id is
+  persisted to last_id.txt once every alert of a page has been delivered or
+  refused by Telegram (refused ones go to undeliverable_alerts.jsonl), so
+  restarts don't resend old alerts and never skip undelivered ones.
+- analysis.py rings a UDP doorbell once anomalies are committed, so alerts go
+  out within milliseconds; without it the service polls every POLL_INTERVAL.
 """
 
-import mysql.connector
+import html
+import json
 import time
-import requests
-import datetime
 from pathlib import Path
 
 
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel"))
+from alert_dispatcher import Delivery, TelegramDispatcher
+from alert_feed import AlertFeed, Checkpoint, DoorbellListener
+from db_writer import MySQLBackend
+from config import (ALERT_DELIVERY_TIMEOUT, ALERT_DOORBELL_HOST, ALERT_DOORBELL_PORT, ALERT_FEED_PAGE_SIZE,
+                    ALERT_POLL_INTERVAL)
+
 # Load environment variables from the root .env file
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
 
@@ -36,107 +48,133 @@ ALERT_WHITELIST = [
     "PortScan",
     "DoS Hulk",
     "DOS"
-    
+
 ]
 
-POLL_INTERVAL = 5 
+POLL_INTERVAL = ALERT_POLL_INTERVAL
 LAST_ID_FILE = Path("last_id.txt")
+DEAD_LETTER_FILE = Path("undeliverable_alerts.jsonl")
 
 
 
 whitelist_lower = {a.lower() for a in ALERT_WHITELIST}
 
-def load_last_id() -> int:
-    if LAST_ID_FILE.exists():
-        try:
-            return int(LAST_ID_FILE.read_text().strip() or 0)
-        except Exception:
-            return 0
-    return 0
+# HTML rather than Markdown: row values are escaped, so a stray * or _ in a
+# reason cannot make Telegram refuse the message
+alert_dispatcher = TelegramDispatcher(BOT_TOKEN, CHAT_ID, parse_mode="HTML", verbose=True)
 
-def save_last_id(last_id: int):
-    try:
-        LAST_ID_FILE.write_text(str(int(last_id)))
-    except Exception as e:
-        print("⚠️ Failed to persist last_id:", e)
+# Row id -> Delivery of the page being handled; reused when the page is read
+# again so only alerts that failed transiently are queued a second time
+in_flight = {}
+
+class DeliveryError(RuntimeError):
+    """An alert of the page is not delivered yet; the page is read again."""
 
 def send_telegram_alert(packet: dict):
-    """Send alert message to Telegram (formatted)."""
+    """
+    Queue a formatted alert and return its Delivery; sending, rate limiting
+    and coalescing happen in the background.
+    """
+    def field(name):
+        return html.escape(str(packet.get(name)))
+
     msg = (
-        f"🚨 *Anomaly Detected!* \n"
-        f"🆔 ID: `{packet.get('id')}`\n"
-        f"🕒 `{packet.get('timestamp')}`\n"
-        f"📡 *Source:* `{packet.get('src_ip')}`\n"
-        f"🎯 *Destination:* `{packet.get('dest_ip')}`\n"
-        f"📘 *Protocol:* `{packet.get('protocol')}`\n"
-        f"📏 *Length:* `{packet.get('length')}` bytes\n"
-        f"⚠️ *Reason:* {packet.get('reason')}\n"
-        f"💥 *Attack Type:* *{packet.get('attack_type') or 'Unknown'}*"
+        f"🚨 <b>Anomaly Detected!</b>\n"
+        f"🆔 ID: <code>{field('id')}</code>\n"
+        f"🕒 <code>{field('timestamp')}</code>\n"
+        f"📡 <b>Source:</b> <code>{field('src_ip')}</code>\n"
+        f"🎯 <b>Destination:</b> <code>{field('dest_ip')}</code>\n"
+        f"📘 <b>Protocol:</b> <code>{field('protocol')}</code>\n"
+        f"📏 <b>Length:</b> <code>{field('length')}</code> bytes\n"
+        f"⚠️ <b>Reason:</b> {field('reason')}\n"
+        f"💥 <b>Attack Type:</b> <b>{html.escape(packet.get('attack_type') or 'Unknown')}</b>"
     )
+    delivery = alert_dispatcher.deliver(msg, key=(packet.get('src_ip'), packet.get('attack_type')))
+    if delivery.status is None:
+        print(f"✅ Queued Telegram alert for ID {packet.get('id')}")
+    return delivery
+
+def dead_letter(packet, status):
+    """Record an alert Telegram refused; resending it would only be refused again."""
+    print(f"⚠️ Alert for ID {packet.get('id')} {status} by Telegram; written to {DEAD_LETTER_FILE}")
     try:
-        resp = requests.post(
-            f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
-            data={"chat_id": CHAT_ID, "text": msg, "parse_mode": "Markdown"},
-            timeout=5
-        )
-        if resp.ok:
-            print(f"✅ Sent Telegram alert for ID {packet.get('id')}")
+        with DEAD_LETTER_FILE.open("a") as f:
+            f.write(json.dumps(dict(packet, status=status), default=str) + "\n")
+    except OSError as e:
+        print("⚠️ Failed to write dead letter:", e)
+
+def handle_page(rows, timeout=ALERT_DELIVERY_TIMEOUT):
+    """
+    Alert on whitelisted rows of one page and wait up to ``timeout`` seconds
+    for them. The feed checkpoints only after this returns. Alerts that are
+    sent, coalesced or refused by Telegram (dead-lettered) are done; if any
+    failed transiently, was dropped or is still queued this raises, so the
+    page is read again and only those alerts are resent (at least once).
+    """
+    deliveries = []
+    for packet in rows:
+        atype = (packet.get("attack_type") or "").strip()
+        if atype.lower() in whitelist_lower:
+            delivery = in_flight.get(packet.get('id'))
+            if delivery is None or delivery.status in Delivery.TRANSIENT:
+                delivery = send_telegram_alert(packet)
+            in_flight[packet.get('id')] = delivery
+            deliveries.append((packet, delivery))
         else:
-            print(f"⚠️ Telegram API error {resp.status_code}: {resp.text}")
-    except Exception as e:
-        print("⚠️ Telegram send failed:", e)
-
-def connect_db():
-    """Create a new DB connection and return (conn, cursor)."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
-    return conn, cursor
+            print(f"ℹ️ Skipped ID {packet.get('id')} (attack_type='{atype}')")
+
+    deadline = time.monotonic() + timeout
+    pending = [(packet.get('id'), delivery.status or "still queued") for packet, delivery in deliveries
+               if not delivery.wait(max(0.0, deadline - time.monotonic()))
+               and delivery.status not in Delivery.PERMANENT]
+    if pending:
+        raise DeliveryError(f"{len(pending)} alerts not delivered (first: ID {pending[0][0]}, "
+                            f"{pending[0][1]}); retrying the page")
+
+    for packet, delivery in deliveries:
+        if delivery.status in Delivery.PERMANENT:
+            dead_letter(packet, delivery.status)
+        in_flight.pop(packet.get('id'), None)
+
+def open_doorbell():
+    """Listen for the detector's doorbell; None means poll only."""
+    if not ALERT_DOORBELL_PORT:
+        return None
+    try:
+        return DoorbellListener(ALERT_DOORBELL_HOST, ALERT_DOORBELL_PORT)
+    except OSError as e:
+        print(f"⚠️ Doorbell port {ALERT_DOORBELL_PORT} unavailable ({e}); polling every {POLL_INTERVAL}s")
+        return None
 
-def main():
+def main(backend=None):
     print("📡 Telegram Alert Service (whitelist) starting...")
-    last_id = load_last_id()
-    print("▶️ Starting from last_id =", last_id)
-
-    conn, cursor = connect_db()
+    if not alert_dispatcher.enabled:
+        # Nothing can be delivered; stop instead of retrying the first page forever
+        print("❌ BOT_TOKEN and CHAT_ID must be set")
+        return
+    backend = backend or MySQLBackend(pool_size=1, **DB_CONFIG)
+    feed = AlertFeed(backend, Checkpoint(LAST_ID_FILE), page_size=ALERT_FEED_PAGE_SIZE)
+    print("▶️ Starting from last_id =", feed.checkpoint.value)
+
+    doorbell = open_doorbell()
+    if doorbell is not None:
+        print(f"🔔 Waiting for doorbell on {ALERT_DOORBELL_HOST}:{ALERT_DOORBELL_PORT}")
 
     while True:
         try:
-            
-            cursor.execute(
-                "SELECT * FROM packets WHERE id > %s AND status = 'Anomaly' ORDER BY id ASC",
-                (last_id,)
-            )
-            rows = cursor.fetchall()
-
-            for packet in rows:
-                
-                atype = (packet.get("attack_type") or "").strip()
-                atype_lower = atype.lower()
-
-                
-                if atype_lower in whitelist_lower:
-                    send_telegram_alert(packet)
-                else:
-                    print(f"ℹ️ Skipped ID {packet.get('id')} (attack_type='{atype}')")
-
-                
-                last_id = max(last_id, packet.get("id", last_id))
-
-            if rows:
-                save_last_id(last_id)
-                conn.commit()
-
-            time.sleep(POLL_INTERVAL)
-
-        except mysql.connector.errors.OperationalError as e:
-       
+            handled = feed.drain(handle_page)
+            if handled:
+                print(f"📥 {handled} anomaly rows processed (last_id = {feed.checkpoint.value})")
+
+            if doorbell is not None:
+                doorbell.wait(POLL_INTERVAL)
+            else:
+                time.sleep(POLL_INTERVAL)
+
+        except backend.transient_errors as e:
+            # The pool hands out a fresh connection on the next drain
             print("🔄 Lost DB connection. Reconnecting in 5s...", e)
             time.sleep(5)
-            try:
-                conn.close()
-            except Exception:
-                pass
-            conn, cursor = connect_db()
 
         except Exception as e:
             print("❌ Error in main loop:", e)
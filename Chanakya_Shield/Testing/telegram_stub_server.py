@@ -0,0 +1,69 @@
+"""
+Local stand-in for the Telegram Bot API sendMessage endpoint.
+
+Accepts POST /bot<token>/sendMessage, prints each message and answers like
+Telegram. Use --fail-every N to answer every Nth request with HTTP 429 so
+retry/backoff handling can be exercised.
+
+    python Testing/telegram_stub_server.py --port 8081
+    set TELEGRAM_API_BASE=http://127.0.0.1:8081   (then run analysis.py / replay)
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    fail_every = 0
+    received = []
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        fields = {k: v[0] for k, v in parse_qs(body).items()}
+
+        with self._lock:
+            StubHandler.received.append(fields)
+            n = len(StubHandler.received)
+
+        if self.fail_every and n % self.fail_every == 0:
+            self._reply(429, {"ok": False, "error_code": 429,
+                              "description": "Too Many Requests: retry after 1",
+                              "parameters": {"retry_after": 1}})
+            return
+
+        print(f"📨 #{n} chat={fields.get('chat_id')}\n{fields.get('text')}\n")
+        self._reply(200, {"ok": True, "result": {"message_id": n}})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=8081, fail_every=0):
+    """Start the stub in a background thread; returns the server."""
+    StubHandler.fail_every = fail_every
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telegram sendMessage stub")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth request with 429")
+    args = parser.parse_args()
+
+    StubHandler.fail_every = args.fail_every
+    print(f"🤖 Telegram stub listening on http://127.0.0.1:{args.port}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler).serve_forever()
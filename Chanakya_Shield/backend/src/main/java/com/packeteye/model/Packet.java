@@ -3,6 +3,9 @@ package com.packeteye.model;
 import com.fasterxml.jackson.annotation.JsonProperty;
 import jakarta.persistence.*;
 
+import java.time.LocalDateTime;
+import java.time.format.DateTimeFormatter;
+
 @Entity
 @Table(name = "packets")
 public class Packet {
@@ -11,6 +14,8 @@ public class Packet {
     @GeneratedValue(strategy = GenerationType.IDENTITY)
     private Long id;
 
+    // Partitioning column (schema v3): part of the primary key, never null
+    @Column(nullable = false)
     private String timestamp;
 
     @Column(name = "src_ip")
@@ -44,6 +49,13 @@ public class Packet {
         this.attackType = attackType;
     }
 
+    @PrePersist
+    void defaultTimestamp() {
+        if (timestamp == null || timestamp.isBlank()) {
+            timestamp = LocalDateTime.now().format(DateTimeFormatter.ofPattern("yyyy-MM-dd HH:mm:ss"));
+        }
+    }
+
     public Long getId() { return id; }
     public String getTimestamp() { return timestamp; }
     public String getSrcIp() { return srcIp; }
@@ -1,12 +1,78 @@
+-- PacketEyePro detection schema (MySQL), schema version 3.
+--
+-- The Python services own this schema: `python mlmodel/schema.py --migrate`
+-- applies the migrations, which also upgrade older databases, and the
+-- services only check the version on startup. This file is the same schema
+-- for a manual bootstrap; the history partition ends at the current date.
+-- Afterwards run `python mlmodel/schema.py --maintain` (or start
+-- analysis.py) to create the daily partitions and apply retention.
+
 CREATE DATABASE IF NOT EXISTS packeteye;
 
 USE packeteye;
 
-CREATE TABLE packets (
-  id INT AUTO_INCREMENT PRIMARY KEY,
-  timestamp DATETIME,
-  src VARCHAR(100),
-  dst VARCHAR(100),
-  protocol VARCHAR(50),
-  summary TEXT
-);
\ No newline at end of file
+-- Partition bounds cannot call CURDATE(), so the statements are prepared
+SET @today = TO_DAYS(CURDATE());
+
+SET @ddl = CONCAT('CREATE TABLE IF NOT EXISTS packets (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  src_ip VARCHAR(45),
+  dest_ip VARCHAR(45),
+  protocol VARCHAR(10),
+  length INT,
+  flags INT,
+  status VARCHAR(20),
+  reason VARCHAR(255),
+  attack_type VARCHAR(50),
+  model_version VARCHAR(32),
+  PRIMARY KEY (id, timestamp),
+  INDEX idx_packets_status_id (status, id),
+  INDEX idx_packets_timestamp (timestamp),
+  INDEX idx_packets_attack_time (attack_type, timestamp)
+)
+PARTITION BY RANGE (TO_DAYS(timestamp)) (
+  PARTITION p_history VALUES LESS THAN (', @today, '),
+  PARTITION p_future VALUES LESS THAN MAXVALUE
+)');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = CONCAT('CREATE TABLE IF NOT EXISTS flows (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  first_seen DATETIME,
+  last_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  src_ip VARCHAR(45),
+  dest_ip VARCHAR(45),
+  fwd_packets INT,
+  bwd_packets INT,
+  fwd_bytes BIGINT,
+  bwd_bytes BIGINT,
+  attack_packets INT,
+  max_anomaly_score DOUBLE,
+  verdict VARCHAR(50),
+  end_reason VARCHAR(10),
+  model_version VARCHAR(32),
+  PRIMARY KEY (id, last_seen),
+  INDEX idx_flows_last_seen (last_seen),
+  INDEX idx_flows_verdict_time (verdict, last_seen)
+)
+PARTITION BY RANGE (TO_DAYS(last_seen)) (
+  PARTITION p_history VALUES LESS THAN (', @today, '),
+  PARTITION p_future VALUES LESS THAN MAXVALUE
+)');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INT PRIMARY KEY,
+  description VARCHAR(255),
+  applied_at DATETIME
+);
+
+INSERT IGNORE INTO schema_version (version, description, applied_at) VALUES
+  (1, 'packets and flows tables', NOW()),
+  (2, 'indexes for alert polling and dashboard time/attack filters', NOW()),
+  (3, 'daily range partitions (MySQL)', NOW());
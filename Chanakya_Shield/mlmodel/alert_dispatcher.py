@@ -0,0 +1,263 @@
+"""
+Non-blocking Telegram alert dispatcher: bounded queue, rate limit, retries
+and per-key coalescing, shared by analysis.py and the Testing scripts.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_BASE = "https://api.telegram.org"
+
+# Telegram allows roughly one message per second per chat (bursts are
+# tolerated) and 20 per minute in groups
+RATE_PER_SECOND = 1.0
+BURST = 5
+COALESCE_WINDOW = 30.0
+MAX_RETRIES = 4
+QUEUE_SIZE = 1000
+REQUEST_TIMEOUT = 5
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Delivery:
+    """
+    Outcome of one submitted message; wait() blocks until it is known. A
+    coalesced message is final at once: its key's summary reports it.
+    """
+
+    # Final states; a queued message has status None
+    DELIVERED = ("sent", "coalesced")
+    # Telegram refused the message itself; resending cannot help
+    PERMANENT = ("rejected", "disabled")
+    # Worth resending
+    TRANSIENT = ("failed", "dropped")
+
+    def __init__(self, status=None, coalesced=False):
+        self.status = status
+        self.coalesced = coalesced
+        self._done = threading.Event()
+        if status is not None:
+            self._done.set()
+
+    def finish(self, status):
+        self.status = status
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """True once the message was sent or coalesced; False if it failed or timed out."""
+        self._done.wait(timeout)
+        return self.status in self.DELIVERED
+
+
+def default_summary(key, count, window):
+    src_ip, attack_type = key
+    return (
+        f"{count} more {attack_type} alerts from {src_ip} "
+        f"in the last {window:.0f}s (suppressed)"
+    )
+
+
+class TelegramDispatcher:
+    def __init__(self, bot_token, chat_id, parse_mode=None, api_base=None,
+                 rate=RATE_PER_SECOND, burst=BURST, coalesce_window=COALESCE_WINDOW,
+                 summary=default_summary, max_retries=MAX_RETRIES,
+                 queue_size=QUEUE_SIZE, timeout=REQUEST_TIMEOUT, verbose=False, on_send=None):
+        self.enabled = bool(bot_token and chat_id)
+        api_base = api_base or os.getenv("TELEGRAM_API_BASE", DEFAULT_API_BASE)
+        self.url = f"{api_base}/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+        self.parse_mode = parse_mode
+        self.coalesce_window = coalesce_window
+        self.summary = summary
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.verbose = verbose
+        self.on_send = on_send  # on_send(ok, seconds) after each delivery attempt chain
+
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(queue_size)
+        self._bucket = TokenBucket(rate, burst)
+        self._windows = {}  # key -> [window_end, suppressed_count]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._thread = None
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name="telegram-dispatcher", daemon=True)
+            self._thread.start()
+
+    # ---------------------------------------------------------
+    # Producer side (any thread, never blocks)
+    # ---------------------------------------------------------
+    def submit(self, text, key=None):
+        """Queue ``text``; returns False if it was coalesced or dropped."""
+        delivery = self.deliver(text, key)
+        return not delivery.coalesced and delivery.status not in ("dropped", "disabled")
+
+    def deliver(self, text, key=None):
+        """
+        Queue ``text`` and return its Delivery. Its status ends as "sent",
+        "failed" (transient errors, retries exhausted), "rejected" (a 4xx
+        Telegram will not accept on retry), "coalesced" (reported by the
+        key's summary), "dropped" (queue full) or "disabled" (no token/chat id).
+        """
+        if not self.enabled:
+            return Delivery("disabled")
+        if key is not None and self.coalesce_window:
+            now = time.monotonic()
+            with self._lock:
+                window = self._windows.get(key)
+                if window is not None and now < window[0]:
+                    window[1] += 1
+                    self.coalesced += 1
+                    return Delivery("coalesced", coalesced=True)
+                self._windows[key] = [now + self.coalesce_window, 0]
+        return self._enqueue(text, key)
+
+    def _enqueue(self, text, key=None):
+        delivery = Delivery()
+        try:
+            self._queue.put_nowait((text, delivery, key))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            self._finish(delivery, "dropped", key)
+        return delivery
+
+    def _finish(self, delivery, status, key=None):
+        delivery.finish(status)
+        if status != "sent" and key is not None:
+            # The alert that opened the window never went out: close the
+            # window so a resend is not suppressed as a duplicate of it
+            with self._lock:
+                window = self._windows.pop(key, None)
+            if window is not None and window[1]:
+                self._enqueue(self.summary(key, window[1], self.coalesce_window))
+
+    # ---------------------------------------------------------
+    # Sender thread
+    # ---------------------------------------------------------
+    def _flush_windows(self, force=False):
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for key, (window_end, count) in list(self._windows.items()):
+                if force or now >= window_end:
+                    del self._windows[key]
+                    if count:
+                        summaries.append(self.summary(key, count, self.coalesce_window))
+        for text in summaries:
+            self._enqueue(text)
+
+    def _run(self):
+        while True:
+            self._flush_windows(force=self._stop.is_set())
+            try:
+                text, delivery, key = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    # Stopped while idle: summaries of open windows still go out
+                    self._flush_windows(force=True)
+                    if self._queue.empty():
+                        return
+                continue
+            start = time.perf_counter()
+            status = self._send(text)
+            self._finish(delivery, status, key)
+            if self.on_send is not None:
+                self.on_send(status == "sent", time.perf_counter() - start)
+
+    def _send(self, text):
+        """POST ``text``; returns "sent", "failed" or "rejected"."""
+        data = {"chat_id": self.chat_id, "text": text}
+        if self.parse_mode:
+            data["parse_mode"] = self.parse_mode
+
+        for attempt in range(self.max_retries + 1):
+            delay = self._bucket.wait_time()
+            if delay:
+                time.sleep(delay)
+            self._bucket.take()
+
+            retry_after = None
+            try:
+                resp = self.session.post(self.url, data=data, timeout=self.timeout)
+                if resp.ok:
+                    self.sent += 1
+                    if self.verbose:
+                        print("📲 Telegram alert sent")
+                    return "sent"
+                if resp.status_code == 429:
+                    try:
+                        retry_after = resp.json()["parameters"]["retry_after"]
+                    except Exception:
+                        retry_after = None
+                elif resp.status_code < 500:
+                    # Bad token / chat id / markup: retrying will not help
+                    print(f"⚠️ Telegram API error {resp.status_code}: {resp.text}")
+                    self.failed += 1
+                    return "rejected"
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    print("⚠️ Telegram send failed:", e)
+
+            if attempt < self.max_retries:
+                backoff = retry_after if retry_after is not None else min(30, 2 ** attempt)
+                time.sleep(backoff + random.uniform(0, 0.25))
+
+        self.failed += 1
+        return "failed"
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def close(self, timeout=10):
+        """Send pending summaries and queued messages (bounded by ``timeout``)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self.session.close()
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+        }
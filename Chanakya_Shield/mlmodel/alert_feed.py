@@ -0,0 +1,139 @@
+"""
+Keyset-paginated anomaly feed with an atomic checkpoint and a UDP doorbell,
+read by Testing/telegram_alert_service.py.
+"""
+
+import os
+import select
+import socket
+import tempfile
+
+from config import ALERT_DOORBELL_HOST, ALERT_DOORBELL_PORT, ALERT_FEED_PAGE_SIZE
+
+ALERT_COLUMNS = ("id", "timestamp", "src_ip", "dest_ip", "protocol", "length", "reason", "attack_type")
+
+
+class Checkpoint:
+    """Last processed row id, persisted atomically (write, fsync, rename)."""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.value = self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def save(self, value):
+        value = int(value)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".last_id-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(str(value))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.value = value
+
+
+class AlertFeed:
+    """
+    Keyset-paginated reader of anomaly rows. drain(handler) calls
+    ``handler(rows)`` once per page (rows are dicts keyed by ALERT_COLUMNS)
+    and checkpoints the page's last id before fetching the next one. If the
+    handler raises, the checkpoint stays put and the exception propagates.
+    """
+
+    def __init__(self, backend, checkpoint, page_size=ALERT_FEED_PAGE_SIZE, table="packets"):
+        self.backend = backend
+        self.checkpoint = checkpoint if isinstance(checkpoint, Checkpoint) else Checkpoint(checkpoint)
+        self.page_size = page_size
+        mark = backend.placeholder
+        self._sql = (
+            f"SELECT {', '.join(ALERT_COLUMNS)} FROM {table} "
+            f"WHERE status = 'Anomaly' AND id > {mark} ORDER BY id LIMIT {mark}"
+        )
+        self.rows_read = 0
+        self.pages = 0
+
+    def fetch_page(self, cursor, after_id):
+        cursor.execute(self._sql, (after_id, self.page_size))
+        return [dict(zip(ALERT_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def drain(self, handler):
+        """Read every row past the checkpoint; returns the number of rows handled."""
+        conn = self.backend.connect()
+        handled = 0
+        try:
+            cursor = conn.cursor()
+            while True:
+                rows = self.fetch_page(cursor, self.checkpoint.value)
+                # End the read snapshot so the next page sees new commits
+                conn.commit()
+                if not rows:
+                    break
+                handler(rows)
+                self.checkpoint.save(rows[-1]["id"])
+                handled += len(rows)
+                self.pages += 1
+                if len(rows) < self.page_size:
+                    break
+            cursor.close()
+        finally:
+            self.backend.release(conn)
+        self.rows_read += handled
+        return handled
+
+
+class Doorbell:
+    """Detector side: fire-and-forget UDP wake-up for the alert service."""
+
+    def __init__(self, host=ALERT_DOORBELL_HOST, port=ALERT_DOORBELL_PORT):
+        self.address = (host, port)
+        self.rings = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def ring(self):
+        try:
+            self._sock.sendto(b"!", self.address)
+            self.rings += 1
+        except OSError:
+            pass  # No listener or buffer full: the service's poll picks it up
+
+    def close(self):
+        self._sock.close()
+
+
+class DoorbellListener:
+    """Service side: wait(timeout) returns True early when the doorbell rang."""
+
+    def __init__(self, host=ALERT_DOORBELL_HOST, port=ALERT_DOORBELL_PORT):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.setblocking(False)
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self._sock], [], [], timeout)
+        if not ready:
+            return False
+        # Coalesce every ring queued so far into one wake-up
+        try:
+            while True:
+                self._sock.recv(64)
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        self._sock.close()
@@ -1,15 +1,34 @@
 from scapy.all import sniff, IP, TCP
-import mysql.connector
+import argparse
 import datetime
+import time
 import joblib
-import pandas as pd
 import numpy as np
-import requests
 import warnings
 import os
 
-import os
 from dotenv import load_dotenv
+from flow_table import ALL_FEATURE_COLUMNS, FlowTable, int_to_ip, ip_to_int
+from packet_capture import PcapCapture, RawCapture
+from packet_parser import PROTO_TCP
+from db_writer import DETECTION_COLUMNS, FLOW_COLUMNS, DetectionWriter, get_backend, check_schema, normal_sample_rate
+from alert_dispatcher import TelegramDispatcher
+from alert_feed import Doorbell
+from scoring import CascadeScorer, apply_thresholds, benign_index, threshold_vector
+from detection_pipeline import AdaptiveBatcher, DetectionPipeline
+from metrics import REGISTRY, start_http_server
+from model_bundle import BundleError, BundleWatcher, load_bundle
+from schema import MaintenanceJob
+from config import FLOW_MAX_FLOWS, FLOW_IDLE_TIMEOUT, FLOW_ACTIVE_TIMEOUT, FLOW_SWEEP_INTERVAL
+from config import PIPELINE_FEATURE_QUEUE_SIZE, PIPELINE_SINK_QUEUE_SIZE, PIPELINE_INFERENCE_WORKERS
+from config import PIPELINE_MIN_BATCH, PIPELINE_MAX_BATCH, PIPELINE_LATENCY_TARGET
+from config import INFERENCE_MODE, CASCADE_UNCERTAIN_BAND, INFERENCE_BACKEND, ONNX_THREADS
+from config import CAPTURE_BACKEND, CAPTURE_INTERFACE, CAPTURE_BATCH_FRAMES
+from config import STORAGE_MODE
+from config import DB_RETENTION_DAYS, DB_PARTITION_DAYS_AHEAD, DB_MAINTENANCE_INTERVAL
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+from config import ALERT_DOORBELL_HOST, ALERT_DOORBELL_PORT
+from config import MODEL_BUNDLE_DIR, MODEL_BUNDLE_MMAP, MODEL_RELOAD_INTERVAL
 
 warnings.filterwarnings("ignore")
 
@@ -23,7 +42,93 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
 ALERT_ATTACKS = ["DoS Hulk", "PortScan", "DDoS", "Infiltration", "Bot", "Web Attack"] 
 
+# Hot-path metrics, served as Prometheus text when METRICS_ENABLED
+STAGES = ("parse", "features", "scale", "isolation_forest", "ensemble", "db_write", "alert_send")
+stage_seconds = {
+    stage: REGISTRY.histogram("ids_stage_seconds", "Seconds per call of each pipeline stage "
+                              "(parse/features per capture batch, model stages per scored batch)",
+                              {"stage": stage})
+    for stage in STAGES
+}
+packets_total = REGISTRY.counter("ids_packets_total", "Packets scored")
+batches_total = REGISTRY.counter("ids_batches_total", "Batches scored")
+anomalies_total = REGISTRY.counter("ids_anomalies_total", "Packets flagged as outliers by IsolationForest")
+alerts_total = REGISTRY.counter("ids_alerts_total", "Alerts handed to the Telegram dispatcher")
+capture_errors = REGISTRY.counter("ids_errors_total", "Exceptions caught and skipped", {"where": "capture"})
+model_reloads = {
+    result: REGISTRY.counter("ids_model_reloads_total", "Hot model reloads by outcome", {"result": result})
+    for result in ("ok", "failed")
+}
+
+class ActiveModels:
+    """
+    One model version and everything derived from it. process_batch() reads
+    the module-level ``models`` once per batch, so replacing it swaps every
+    component at once between batches.
+    """
+
+    def __init__(self, version, iso_model, ensemble_model, scaler, inv_label_map,
+                 optimal_thresholds, selected_features_idx):
+        self.version = version
+        self.iso_model = iso_model
+        self.ensemble_model = ensemble_model
+        self.scaler = scaler
+        self.inv_label_map = inv_label_map
+        self.selected_features_idx = selected_features_idx
+
+        # ONNX backend: scaler + selection, IsolationForest and ensemble members as
+        # onnxruntime graphs (python export_onnx.py; exported here for a new version)
+        self.onnx_preprocess = None
+        self.onnx_degraded = False
+        if INFERENCE_BACKEND == "onnx":
+            try:
+                from onnx_backend import load_or_export_models
+                self.onnx_preprocess, self.iso_model, self.ensemble_model = load_or_export_models(
+                    iso_model, ensemble_model, scaler, selected_features_idx, version, threads=ONNX_THREADS)
+                print(f"✅ Using onnxruntime inference backend for model {version}")
+            except (ImportError, OSError, RuntimeError, ValueError) as e:
+                self.onnx_degraded = True
+                print(f"⚠️  ONNX backend unavailable for model {version} ({e}); "
+                      f"DEGRADED to joblib models (ids_onnx_degraded = 1)")
+
+        # Precomputed for the vectorized threshold decision
+        self.benign_idx = benign_index(inv_label_map)
+        self.class_thresholds = (
+            threshold_vector(optimal_thresholds, len(inv_label_map))
+            if optimal_thresholds is not None else None
+        )
+
+        # Cascade mode only runs the classifier where IsolationForest flags an outlier
+        self.cascade = None
+        if INFERENCE_MODE == "cascade":
+            try:
+                self.cascade = CascadeScorer(self.ensemble_model, CASCADE_UNCERTAIN_BAND)
+            except ValueError as e:
+                print(f"⚠️  {e}; using full ensemble inference")
+
+    def preprocess(self, features):
+        """Scale all 17 features FIRST, THEN apply feature selection if available"""
+        if self.onnx_preprocess is not None:
+            return self.onnx_preprocess.transform(features)
+
+        X_scaled = self.scaler.transform(features)
+        if self.selected_features_idx is not None:
+            X_scaled = X_scaled[:, self.selected_features_idx]
+        return X_scaled
+
+def bundle_models(bundle):
+    inv_label_map = {v: k for k, v in bundle.label_map.items()}
+    return ActiveModels(bundle.version, bundle.iso_model, bundle.classifier, bundle.scaler,
+                        inv_label_map, bundle.optimal_thresholds, bundle.selected_features_idx)
+
 def load_models():
+    try:
+        bundle = load_bundle(BUNDLE_PATH, mmap=MODEL_BUNDLE_MMAP)
+        print(f"✅ Loaded model bundle {bundle.version} "
+              f"({len(bundle.schema['selected_features'])} features, {len(bundle.schema['classes'])} classes)")
+        return bundle_models(bundle)
+    except BundleError as e:
+        print(f"⚠️  {e}; loading individual model pickles")
     try:
         iso_model = joblib.load(os.path.join(BASE_DIR, "anomaly_model.pkl"))
         ensemble_model = joblib.load(os.path.join(BASE_DIR, "attack_classifier.pkl"))
@@ -42,250 +147,442 @@ def load_models():
         # Invert label map for decoding
         inv_label_map = {v: k for k, v in label_map.items()}
         
-        return iso_model, ensemble_model, scaler, inv_label_map, optimal_thresholds, selected_features_idx
+        return ActiveModels(LEGACY_VERSION, iso_model, ensemble_model, scaler, inv_label_map,
+                            optimal_thresholds, selected_features_idx)
     except FileNotFoundError as e:
         print(f"Error loading models: {e}")
-        return None, None, None, None, None, None
+        return None
+
+BUNDLE_PATH = MODEL_BUNDLE_DIR or os.path.join(BASE_DIR, "model_bundle")
+LEGACY_VERSION = "legacy"
+models = load_models()
+
+# Probe rows scored before a reloaded model goes live
+RELOAD_PROBE = np.zeros((64, len(ALL_FEATURE_COLUMNS)))
 
-iso_model, ensemble_model, scaler, inv_label_map, optimal_thresholds, selected_features_idx = load_models()
+def validate_models(candidate):
+    """Raise ValueError unless ``candidate`` can score this detector's feature vectors."""
+    X = candidate.preprocess(RELOAD_PROBE)
+    outliers = candidate.iso_model.predict(X)
+    proba = candidate.ensemble_model.predict_proba(X)
+    if outliers.shape != (len(RELOAD_PROBE),) or proba.shape != (len(RELOAD_PROBE), len(candidate.inv_label_map)):
+        raise ValueError(f"Unexpected output shapes {outliers.shape} / {proba.shape}")
+    if not np.all(np.isfinite(proba)):
+        raise ValueError("Non-finite class probabilities")
+
+def reload_models(bundle):
+    """BundleWatcher callback: build, validate, then swap the active models."""
+    global models
+    if bundle.schema['all_features'] != list(ALL_FEATURE_COLUMNS):
+        raise BundleError("Bundle was trained on different flow features than this detector extracts")
+    candidate = bundle_models(bundle)
+    validate_models(candidate)
+    previous = models.version if models is not None else None
+    models = candidate
+    register_model_version(candidate.version)
+    model_reloads["ok"].inc()
+    print(f"🔄 Model {previous} -> {candidate.version} swapped in")
+
+def reload_failed(error):
+    model_reloads["failed"].inc()
+    print(f"⚠️  Model reload rejected, keeping {models.version if models else None}: {error}")
+
+# Pooled, rate-limited sender; repeats per (source, attack) are coalesced
+alert_dispatcher = TelegramDispatcher(
+    BOT_TOKEN, CHAT_ID,
+    on_send=lambda ok, seconds: stage_seconds["alert_send"].observe(seconds)
+)
 
 def send_telegram_alert(src_ip, dest_ip, attack_type, reason):
-    try:
-        message = (
-            f"PacketEyePro Alert\n"
-            f"Time: {datetime.datetime.now():%Y-%m-%d %H:%M:%S}\n"
-            f"Type: {attack_type}\n"
-            f"Source: {src_ip}\n"
-            f"Destination: {dest_ip}\n"
-            f"Reason: {reason}"
-        )
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        requests.post(url, data={"chat_id": CHAT_ID, "text": message}, timeout=3)
-    except Exception:
-        pass
-
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", ""),
-        database=os.getenv("DB_NAME", "packeteye")
+    message = (
+        f"PacketEyePro Alert\n"
+        f"Time: {datetime.datetime.now():%Y-%m-%d %H:%M:%S}\n"
+        f"Type: {attack_type}\n"
+        f"Source: {src_ip}\n"
+        f"Destination: {dest_ip}\n"
+        f"Reason: {reason}"
     )
+    alert_dispatcher.submit(message, key=(src_ip, attack_type))
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS packets (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        timestamp DATETIME,
-        src_ip VARCHAR(45),
-        dest_ip VARCHAR(45),
-        protocol VARCHAR(10),
-        length INT,
-        flags INT,
-        status VARCHAR(20),
-        reason VARCHAR(255),
-        attack_type VARCHAR(50)
-    )
-    """)
-    conn.commit()
-    conn.close()
+# Warn if schema migrations (python schema.py --migrate) are pending, then a
+# long-lived pooled writer: rows are committed in bulk by size or time
+check_schema()
+detection_writer = DetectionWriter(
+    columns=DETECTION_COLUMNS,
+    on_flush=lambda rows, seconds: stage_seconds["db_write"].observe(seconds),
+    normal_sample_rate=normal_sample_rate()
+)
+
+# Flow storage: one summary row per ended flow instead of every normal packet
+STORE_FLOWS = STORAGE_MODE == "flows"
+flow_writer = DetectionWriter(table="flows", columns=FLOW_COLUMNS) if STORE_FLOWS else None
 
-init_db()
+# Wakes Testing/telegram_alert_service.py as soon as anomaly rows are committed
+doorbell = Doorbell(ALERT_DOORBELL_HOST, ALERT_DOORBELL_PORT) if ALERT_DOORBELL_PORT else None
 
-ALL_FEATURE_COLUMNS = [
-    'Destination Port','Flow Duration','Total Fwd Packets','Total Backward Packets',
-    'Total Length of Fwd Packets','Total Length of Bwd Packets',
-    'Fwd Packet Length Mean','Bwd Packet Length Mean','Flow Packets/s',
-    'FIN Flag Count','SYN Flag Count','RST Flag Count','PSH Flag Count',
-    'ACK Flag Count','URG Flag Count','CWE Flag Count','ECE Flag Count'
-]
+def store_flows(records):
+    """FlowTable on_expire callback: queue one flows row per ended flow."""
+    m = models
+    labels = m.inv_label_map if m is not None else {}
+    rows = []
+    for r in records:
+        rows.append((
+            datetime.datetime.fromtimestamp(r.start), datetime.datetime.fromtimestamp(r.last_seen),
+            int_to_ip(r.ip_a), int_to_ip(r.ip_b), r.fwd_packets, r.bwd_packets,
+            r.fwd_bytes, r.bwd_bytes, r.attack_packets,
+            r.max_score if np.isfinite(r.max_score) else None,
+            labels.get(r.verdict, "Unknown") if r.verdict >= 0 else "BENIGN",
+            r.reason, m.version if m is not None else None
+        ))
+    flow_writer.write_many(rows)
 
 # Track flows for real feature extraction
-flow_stats = {}
+flow_table = FlowTable(
+    max_flows=FLOW_MAX_FLOWS,
+    idle_timeout=FLOW_IDLE_TIMEOUT,
+    active_timeout=FLOW_ACTIVE_TIMEOUT,
+    on_expire=store_flows if STORE_FLOWS else None
+)
 
-def extract_features(packet):
+def extract_features(packet, out):
+    """
+    Update the flow table with ``packet`` and write its 17 features into the
+    ``out`` row. Returns (src_ip, dest_ip, proto, length, flags, flow_id) or
+    None for non-IP packets.
+    """
     if not packet.haslayer(IP):
         return None
 
+    ip = packet[IP]
+    tcp = packet[TCP] if packet.haslayer(TCP) else None
     length = len(packet)
-    flags = int(packet[TCP].flags) if packet.haslayer(TCP) else 0
-    src_ip = packet[IP].src
-    dest_ip = packet[IP].dst
-    flow_key = tuple(sorted([src_ip, dest_ip]))
+    flags = int(tcp.flags) if tcp is not None else 0
+    dport = tcp.dport if tcp is not None else 0
 
     now = datetime.datetime.now().timestamp()
-    if flow_key not in flow_stats:
-        flow_stats[flow_key] = {'start': now, 'fwd': 0, 'bwd': 0, 'len_fwd': 0, 'len_bwd': 0}
-    
-    stats = flow_stats[flow_key]
-    duration = max(1, int((now - stats['start']) * 1000000)) # in microseconds
-    
-    if src_ip == flow_key[0]:
-        stats['fwd'] += 1
-        stats['len_fwd'] += length
-    else:
-        stats['bwd'] += 1
-        stats['len_bwd'] += length
-
-    return {
-        'Destination Port': packet[TCP].dport if packet.haslayer(TCP) else 0,
-        'Flow Duration': duration, 
-        'Total Fwd Packets': stats['fwd'],
-        'Total Backward Packets': stats['bwd'],
-        'Total Length of Fwd Packets': stats['len_fwd'],
-        'Total Length of Bwd Packets': stats['len_bwd'],
-        'Fwd Packet Length Mean': stats['len_fwd'] / max(1, stats['fwd']),
-        'Bwd Packet Length Mean': stats['len_bwd'] / max(1, stats['bwd']),
-        'Flow Packets/s': (stats['fwd'] + stats['bwd']) / max(0.001, (now - stats['start'])),
-        'FIN Flag Count': flags & 0x01,
-        'SYN Flag Count': (flags & 0x02) >> 1,
-        'RST Flag Count': (flags & 0x04) >> 2,
-        'PSH Flag Count': (flags & 0x08) >> 3,
-        'ACK Flag Count': (flags & 0x10) >> 4,
-        'URG Flag Count': (flags & 0x20) >> 5,
-        'CWE Flag Count': 0,
-        'ECE Flag Count': (flags & 0x40) >> 6,
-    }
-
-# Packet batch buffer for efficient inference
-packet_buffer = []
-BATCH_SIZE = 10  # Process packets in batches
-last_inference_time = datetime.datetime.now()
+    flow_id = flow_table.update(ip_to_int(ip.src), ip_to_int(ip.dst), length, flags, dport, now, out)
+    return ip.src, ip.dst, ip.proto, length, flags, flow_id
 
 def process_packet(packet):
-    global packet_buffer, last_inference_time
-    
-    if not iso_model:
+    """Capture callback: feature extraction only, inference runs elsewhere."""
+    if models is None:
         return
 
     try:
-        if not packet.haslayer(IP):
-            return
-
-        src_ip = packet[IP].src
-        dest_ip = packet[IP].dst
-        proto = packet[IP].proto
-        length = len(packet)
-        flags = int(packet[TCP].flags) if packet.haslayer(TCP) else 0
-        timestamp = datetime.datetime.now()
-
-        features = extract_features(packet)
-        if not features:
-            return
-
-        # Add to batch buffer
-        packet_buffer.append({
-            'features': features,
-            'src_ip': src_ip,
-            'dest_ip': dest_ip,
-            'proto': proto,
-            'length': length,
-            'flags': flags,
-            'timestamp': timestamp
-        })
-        
-        # Process batch when buffer is full or timeout
-        time_since_last = (datetime.datetime.now() - last_inference_time).total_seconds()
-        
-        if len(packet_buffer) >= BATCH_SIZE or time_since_last > 1.0:
-            process_batch()
-            last_inference_time = datetime.datetime.now()
+        with stage_seconds["features"].time():
+            pipeline.submit(packet)
+    except Exception:
+        capture_errors.inc()
 
+def capture_features(packet, out):
+    meta = extract_features(packet, out)
+    if meta is None:
+        return None
+    src_ip, dest_ip, proto, length, flags, flow_id = meta
+    return src_ip, dest_ip, proto, length, flags, datetime.datetime.now(), flow_id
+
+def capture_parsed(record, out):
+    """Raw-capture counterpart of capture_features for one parsed header record."""
+    src, dst, proto, length, flags, dport, ts = record
+    flow_id = flow_table.update(src, dst, length, flags, dport, ts, out)
+    return int_to_ip(src), int_to_ip(dst), proto, length, flags, datetime.datetime.fromtimestamp(ts), flow_id
+
+def process_frames(parsed, timestamps):
+    """Feed a ParsedBatch from the raw capture path into the pipeline."""
+    if models is None:
+        return
+
+    idx = np.flatnonzero(parsed.valid)
+    if not len(idx):
+        return
+    # Destination port is taken from TCP only, as in extract_features
+    dport = np.where(parsed.proto[idx] == PROTO_TCP, parsed.dport[idx], 0)
+    records = zip(
+        parsed.src[idx].tolist(), parsed.dst[idx].tolist(), parsed.proto[idx].tolist(),
+        parsed.length[idx].tolist(), parsed.flags[idx].tolist(), dport.tolist(),
+        timestamps[idx].tolist()
+    )
+    try:
+        with stage_seconds["features"].time():
+            pipeline.submit_many(records, extract=capture_parsed)
     except Exception:
-        pass
+        capture_errors.inc()
 
-def process_batch():
-    """Optimized batch processing for real-time inference"""
-    global packet_buffer
-    
-    if not packet_buffer:
+def capture_raw(iface=None):
+    """Batched raw capture loop (no scapy dissection on the hot path)."""
+    capture = RawCapture(iface, batch_frames=CAPTURE_BATCH_FRAMES)
+    try:
+        while True:
+            n = capture.read_batch()
+            if n:
+                with stage_seconds["parse"].time():
+                    parsed = capture.parse(n)
+                process_frames(parsed, capture.timestamps[:n])
+    finally:
+        capture.close()
+
+def capture_pcap(paths):
+    """
+    Offline mode: stream pcap/pcapng files as fast as the pipeline allows.
+    Flow features use each packet's capture timestamp, so re-scoring the
+    same files is reproducible.
+    """
+    if models is None:
+        print("❌ No models loaded; train or publish a model bundle before scoring capture files")
         return
+
+    capture = PcapCapture(paths, batch_frames=CAPTURE_BATCH_FRAMES)
+    start = time.perf_counter()
+    try:
+        while not capture.done:
+            n = capture.read_batch()
+            if n:
+                with stage_seconds["parse"].time():
+                    parsed = capture.parse(n)
+                process_frames(parsed, capture.timestamps[:n])
+    finally:
+        capture.close()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        span = (capture.last_ts - capture.first_ts) if capture.frames else 0.0
+        print(
+            f"📊 Read {capture.frames} packets from {len(paths)} file(s) in {elapsed:.1f}s "
+            f"({capture.frames / elapsed:,.0f} pkts/s, traffic span {span:.1f}s)"
+        )
+
+def process_batch(block):
+    """Optimized batch inference for one FeatureBlock; returns (rows, alerts, anomalies)"""
+    batch = block.meta
+    # One model version for the whole batch, even if a reload lands meanwhile
+    m = models
+    with stage_seconds["scale"].time():
+        X_scaled = m.preprocess(block.features[:len(batch)])
     
-    batch = packet_buffer.copy()
-    packet_buffer = []
+    # Batch anomaly detection (decision_function < 0 is exactly predict() == -1)
+    with stage_seconds["isolation_forest"].time():
+        decision = m.iso_model.decision_function(X_scaled)
+        anomaly_scores = np.where(decision < 0, -1, 1)
     
-    try:
-        # Extract features from batch
-        features_list = [item['features'] for item in batch]
-        df_batch = pd.DataFrame(features_list, columns=ALL_FEATURE_COLUMNS)
-        
-        # Batch scaling FIRST (on all 17 features)
-        X_scaled = scaler.transform(df_batch)
-        
-        # THEN apply feature selection if available
-        if selected_features_idx is not None:
-            X_scaled = X_scaled[:, selected_features_idx]
-        
-        # Batch anomaly detection
-        anomaly_scores = iso_model.predict(X_scaled)
-        
-        # Batch classification with probability thresholds
-        if optimal_thresholds is not None:
-            y_proba = ensemble_model.predict_proba(X_scaled)
-            predictions = []
-            
-            for proba in y_proba:
-                predicted_class = np.argmax(proba)
-                max_proba = np.max(proba)
-                
-                # Apply per-class threshold
-                threshold = optimal_thresholds.get(predicted_class, 0.5)
-                if max_proba < threshold:
-                    # Low confidence - predict as BENIGN
-                    benign_idx = list(inv_label_map.values()).index('BENIGN') if 'BENIGN' in inv_label_map.values() else 0
-                    predictions.append(benign_idx)
-                else:
-                    predictions.append(predicted_class)
+    # Batch classification with per-class probability thresholds
+    with stage_seconds["ensemble"].time():
+        if m.cascade is not None:
+            predictions = m.cascade.predict(X_scaled, anomaly_scores == -1, m.class_thresholds, m.benign_idx)
+        elif m.class_thresholds is not None:
+            y_proba = m.ensemble_model.predict_proba(X_scaled)
+            predictions = apply_thresholds(y_proba, m.class_thresholds, m.benign_idx)
         else:
-            predictions = ensemble_model.predict(X_scaled)
-        
-        # Process results
-        conn = get_db_connection()
-        cursor = conn.cursor()
+            predictions = m.ensemble_model.predict(X_scaled)
+
+    if STORE_FLOWS:
+        attacks = np.where((anomaly_scores == -1) & (predictions != m.benign_idx), predictions, -1)
+        flow_table.record_verdicts([meta[6] for meta in batch], -decision, attacks)
+    
+    # Process results
+    rows = []
+    alerts = []
+    for i, (src_ip, dest_ip, proto, length, flags, timestamp, _flow_id) in enumerate(batch):
+        anomaly_score = anomaly_scores[i]
+        pred_idx = predictions[i]
+        attack_type = m.inv_label_map.get(pred_idx, "Unknown")
         
-        for i, item in enumerate(batch):
-            anomaly_score = anomaly_scores[i]
-            pred_idx = predictions[i]
-            attack_type = inv_label_map.get(pred_idx, "Unknown")
-            
-            status = "Normal"
-            reason = ""
-            
-            if anomaly_score == -1:
-                if attack_type == "BENIGN":
-                    status = "Normal"
-                    reason = "Background Noise (Filtered)"
-                else:
-                    status = "Anomaly"
-                    reason = f"Classified as {attack_type}"
-                    
-                    if attack_type in ALERT_ATTACKS:
-                        send_telegram_alert(item['src_ip'], item['dest_ip'], attack_type, reason)
-            
-            # Insert to database
-            cursor.execute("""
-                INSERT INTO packets
-                (timestamp, src_ip, dest_ip, protocol, length, flags, status, reason, attack_type)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                item['timestamp'], item['src_ip'], item['dest_ip'], str(item['proto']),
-                item['length'], item['flags'], status, reason, attack_type
-            ))
+        status = "Normal"
+        reason = ""
         
-        conn.commit()
-        conn.close()
+        if anomaly_score == -1:
+            if attack_type == "BENIGN":
+                status = "Normal"
+                reason = "Background Noise (Filtered)"
+            else:
+                status = "Anomaly"
+                reason = f"Classified as {attack_type}"
+                
+                if attack_type in ALERT_ATTACKS:
+                    alerts.append((src_ip, dest_ip, attack_type, reason))
         
-        # Print summary
-        anomalies = sum(1 for s in anomaly_scores if s == -1)
-        if anomalies > 0:
-            print(f"[{datetime.datetime.now()}] Processed batch: {len(batch)} packets, {anomalies} anomalies detected")
+        rows.append((
+            timestamp, src_ip, dest_ip, str(proto),
+            length, flags, status, reason, attack_type, m.version
+        ))
     
-    except Exception as e:
-        print(f"Batch processing error: {e}")
-        pass
+    anomalies = int(np.count_nonzero(anomaly_scores == -1))
+    return rows, alerts, anomalies
+
+def write_results(result):
+    """Sink stage: persist rows and deliver alerts off the capture thread."""
+    rows, alerts, anomalies = result
+    packets_total.inc(len(rows))
+    batches_total.inc()
+    anomalies_total.inc(anomalies)
+    alerts_total.inc(len(alerts))
+
+    # Alerts first: they only go to the dispatcher queue, and a failing
+    # database write below must not cost the batch its alerts
+    for alert in alerts:
+        send_telegram_alert(*alert)
+
+    # Queue for the bulk writer (committed by size or time)
+    detection_writer.write_many(rows)
+
+    # Anomalies are committed now rather than on the next timed flush, so
+    # the alert service can read them as soon as the doorbell rings
+    if doorbell is not None and anomalies and any(row[6] == "Anomaly" for row in rows):
+        detection_writer.flush()
+        doorbell.ring()
+
+    # Print summary
+    if anomalies > 0:
+        print(f"[{datetime.datetime.now()}] Processed batch: {len(rows)} packets, {anomalies} anomalies detected")
+        print_flow_stats()
+        print_cascade_stats()
+
+pipeline = DetectionPipeline(
+    extract=capture_features,
+    score=process_batch,
+    sink=write_results,
+    batcher=AdaptiveBatcher(PIPELINE_MIN_BATCH, PIPELINE_MAX_BATCH, PIPELINE_LATENCY_TARGET),
+    feature_queue_size=PIPELINE_FEATURE_QUEUE_SIZE,
+    sink_queue_size=PIPELINE_SINK_QUEUE_SIZE,
+    inference_workers=PIPELINE_INFERENCE_WORKERS
+)
+
+def register_model_version(version):
+    """ids_model_info{version} is 1 for the active model, 0 for ones swapped out."""
+    REGISTRY.gauge("ids_model_info", "Model version scoring packets (1 = active)", {"version": version},
+                   fn=lambda: int(models is not None and models.version == version))
+
+def register_component_metrics():
+    """Scrape-time views of counters the flow table, pipeline and sinks already keep."""
+    REGISTRY.gauge("ids_flow_table_size", "Live flows", fn=lambda: flow_table.size)
+    REGISTRY.gauge("ids_flow_table_capacity", "Maximum live flows", fn=lambda: flow_table.capacity)
+    for reason in ("idle", "active", "lru"):
+        REGISTRY.callback_counter("ids_flows_evicted_total", "Flows ended by timeout or evicted",
+                                  lambda reason=reason: flow_table.evicted[reason], {"reason": reason})
+    for name in ("inference", "sink"):
+        stage = getattr(pipeline, name)
+        REGISTRY.gauge("ids_queue_depth", "Items waiting in a pipeline queue",
+                       {"stage": name}, fn=stage.queue.qsize)
+        REGISTRY.callback_counter("ids_dropped_total", "Items dropped because a queue was full",
+                                  lambda stage=stage: stage.dropped, {"stage": name})
+        REGISTRY.callback_counter("ids_errors_total", "Exceptions caught and skipped",
+                                  lambda stage=stage: stage.errors, {"where": name})
+    REGISTRY.callback_counter("ids_dropped_total", "Items dropped because a queue was full",
+                              lambda: pipeline.capture_dropped, {"stage": "capture"})
+    REGISTRY.callback_counter("ids_sink_dropped_packets_total", "Scored packets in batches the sink queue dropped",
+                              lambda: pipeline.sink_dropped_rows)
+    REGISTRY.gauge("ids_batch_size", "Current adaptive batch size", fn=lambda: pipeline.batcher.size)
+    REGISTRY.callback_counter("ids_db_rows_written_total", "Rows committed to the database",
+                              lambda: detection_writer.rows_written)
+    REGISTRY.callback_counter("ids_db_rows_sampled_out_total", "Normal packet rows skipped by sampling",
+                              lambda: detection_writer.rows_sampled_out)
+    if flow_writer is not None:
+        REGISTRY.callback_counter("ids_db_flows_written_total", "Flow summary rows committed to the database",
+                                  lambda: flow_writer.rows_written)
+    REGISTRY.callback_counter("ids_alerts_sent_total", "Telegram messages delivered",
+                              lambda: alert_dispatcher.sent)
+    REGISTRY.gauge("ids_onnx_degraded", "1 when INFERENCE_BACKEND is onnx but the active model runs on joblib",
+                   fn=lambda: int(models is not None and models.onnx_degraded))
+    if models is not None:
+        register_model_version(models.version)
+
+register_component_metrics()
+
+def print_flow_stats():
+    stats = flow_table.stats()
+    print(
+        f"   Flows: {stats['flows']}/{stats['capacity']} live | evicted "
+        f"idle={stats['evicted_idle']} active={stats['evicted_active']} lru={stats['evicted_lru']}"
+    )
+
+def print_cascade_stats():
+    cascade = models.cascade if models is not None else None
+    if cascade is None:
+        return
+    stats = cascade.stats()
+    print(
+        f"   Cascade: {stats['rows']} rows | LightGBM {stats['lgb_rows']} ({stats['lgb_rate']:.1%}) | "
+        f"SVM {stats['svm_rows']} ({stats['svm_rate']:.1%} of LightGBM)"
+    )
+
+def print_pipeline_stats():
+    stats = pipeline.stats()
+    capture = stats['capture']
+    print(f"   Capture: {capture['processed']} packets, {capture['dropped']} dropped")
+    for name in ('inference', 'sink'):
+        stage = stats[name]
+        print(
+            f"   {name.capitalize()}: depth {stage['depth']}/{stage['maxsize']} | "
+            f"processed {stage['processed']} | dropped {stage['dropped']}"
+            + (f" ({stage['dropped_rows']} packets)" if 'dropped_rows' in stage else "")
+            + f" | errors {stage['errors']}"
+        )
+    batching = stats['batching']
+    print(
+        f"   Batching: size {batching['size']} | mean {batching['mean_batch']:.1f} max {batching['max_batch']} "
+        f"over {batching['batches']} batches | queue delay p50 {batching['queue_delay_p50_ms']:.1f} ms "
+        f"p95 {batching['queue_delay_p95_ms']:.1f} ms | timer flushes {batching['timer_flushes']}"
+    )
 
 if __name__ == "__main__":
-    print("PacketEyePro Active. Press Ctrl+C to stop.")
-    sniff(prn=process_packet, store=False)
+    parser = argparse.ArgumentParser(description="PacketEyePro real-time detector")
+    parser.add_argument("--pcap", nargs="+", metavar="FILE",
+                        help="Score pcap/pcapng files offline instead of a live interface")
+    parser.add_argument("--iface", default=CAPTURE_INTERFACE, help="Interface for live capture")
+    args = parser.parse_args()
+
+    if args.pcap:
+        # Offline input waits for queue space instead of dropping batches
+        # and batches for throughput rather than latency
+        pipeline.lossless = True
+        pipeline.batcher.latency_target = None
+        pipeline.batcher.size = pipeline.batcher.max_size
+        print(f"PacketEyePro offline: scoring {len(args.pcap)} capture file(s).")
+    else:
+        print("PacketEyePro Active. Press Ctrl+C to stop.")
+    if METRICS_ENABLED:
+        try:
+            start_http_server(METRICS_PORT, METRICS_HOST)
+            print(f"📈 Metrics at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint unavailable: {e}")
+    # New bundles are loaded and validated off the capture path, then swapped
+    # in; without models yet, the first published bundle starts detection
+    watcher = None
+    if MODEL_RELOAD_INTERVAL:
+        watcher = BundleWatcher(BUNDLE_PATH, reload_models, models.version if models is not None else None,
+                                MODEL_RELOAD_INTERVAL, on_error=reload_failed, mmap=MODEL_BUNDLE_MMAP)
+        watcher.start()
+        if models is None:
+            print(f"⏳ No models loaded; waiting for a model bundle at {BUNDLE_PATH}")
+    # Daily partitions ahead of time, expired ones dropped
+    maintenance = None
+    if DB_MAINTENANCE_INTERVAL:
+        maintenance = MaintenanceJob(get_backend(), DB_MAINTENANCE_INTERVAL,
+                                     DB_RETENTION_DAYS, DB_PARTITION_DAYS_AHEAD)
+        maintenance.start()
+    flow_table.start_sweeper(FLOW_SWEEP_INTERVAL)
+    pipeline.start()
+    try:
+        if args.pcap:
+            capture_pcap(args.pcap)
+        elif CAPTURE_BACKEND == "raw":
+            capture_raw(args.iface)
+        else:
+            sniff(prn=process_packet, store=False, iface=args.iface)
+    finally:
+        # Drain in-flight batches before the writer's final commit
+        if watcher is not None:
+            watcher.stop()
+        if maintenance is not None:
+            maintenance.stop()
+        pipeline.stop()
+        flow_table.stop_sweeper()
+        detection_writer.close()
+        if flow_writer is not None:
+            # Store the flows still live at shutdown, with their final verdicts
+            flow_table.drain()
+            flow_writer.close()
+        alert_dispatcher.close()
+        if doorbell is not None:
+            doorbell.close()
+        print_flow_stats()
+        print_pipeline_stats()
+        print_cascade_stats()
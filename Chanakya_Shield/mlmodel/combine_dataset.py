@@ -1,43 +1,120 @@
-import os
-import pandas as pd
+"""
+Combine the CICIDS2017 day files into one dataset.
+
+Every CSV is parsed by a worker process and streamed, chunk by chunk, into
+its own Parquet part with the same harmonised columns (dataset_cache.py).
+The parts together form CICIDS2017_full.parquet/. Each worker only holds
+one chunk at a time, so peak memory depends on --workers and the chunk
+size, not on how many day files there are.
+
+    python combine_dataset.py --workers 4
+    python combine_dataset.py --csv     # also write CICIDS2017_full.csv
+"""
+
+import argparse
 import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from dataset_cache import COMBINED_COLUMNS, COMBINED_CSV, COMBINED_PARQUET, iter_dataset, write_parquet
+from perf import peak_rss_mb
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_DIR = os.path.join(BASE_DIR, "..", "datasets", "CICIDS2017.csv")
-OUTPUT_FILE = os.path.join(BASE_DIR, "..", "datasets", "CICIDS2017_full.csv")
 
-print("Combining CICIDS2017 CSV files...")
 
-# Get all CSV files
-csv_files = glob.glob(os.path.join(DATASET_DIR, "*.csv"))
-print(f"Found {len(csv_files)} CSV files")
+def convert(source, part):
+    """Worker: one day file -> one Parquet part; returns (rows, labels, peak RSS MiB)."""
+    rows, labels = write_parquet(source, part, COMBINED_COLUMNS)
+    return rows, labels, peak_rss_mb()
+
 
-# Combine all CSV files
-df_list = []
-for file in csv_files:
-    print(f"Reading: {os.path.basename(file)}")
+def combine(csv_files, out_dir=COMBINED_PARQUET, workers=None):
+    """Write the parts to a staging directory and swap it in; returns (rows, labels)."""
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    staging = tempfile.mkdtemp(prefix=".combine-", dir=parent)
+    os.chmod(staging, 0o755)
+    total_rows = 0
+    labels = Counter()
+    peak = 0.0
     try:
-        df = pd.read_csv(file, encoding='utf-8', encoding_errors='ignore')
-        df_list.append(df)
-        print(f"  ✅ Loaded {len(df)} rows")
-    except Exception as e:
-        print(f"  ❌ Error: {e}")
-
-# Concatenate all dataframes
-if df_list:
-    combined_df = pd.concat(df_list, ignore_index=True)
-    
-    # Clean column names
-    combined_df.columns = combined_df.columns.str.strip()
-    
-    # Save combined dataset
-    combined_df.to_csv(OUTPUT_FILE, index=False)
-    print(f"\n✅ Combined dataset saved to: {OUTPUT_FILE}")
-    print(f"   Total rows: {len(combined_df)}")
-    print(f"   Total columns: {len(combined_df.columns)}")
-    
-    if 'Label' in combined_df.columns:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(convert, path, os.path.join(staging, f"part-{i:04d}.parquet")): path
+                       for i, path in enumerate(csv_files)}
+            for future in as_completed(futures):
+                name = os.path.basename(futures[future])
+                try:
+                    rows, file_labels, worker_peak = future.result()
+                except Exception as e:
+                    print(f"  ❌ {name}: {e}")
+                    continue
+                total_rows += rows
+                labels.update(file_labels)
+                peak = max(peak, worker_peak or 0.0)
+                print(f"  ✅ {name}: {rows:,} rows")
+
+        if not total_rows:
+            raise ValueError("No data loaded!")
+        old = None
+        if os.path.exists(out_dir):
+            old = f"{out_dir}.old-{os.getpid()}"
+            os.rename(out_dir, old)
+        os.rename(staging, out_dir)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    print(f"💾 Peak worker RSS {peak:.0f} MiB, combiner {peak_rss_mb():.0f} MiB")
+    return total_rows, labels
+
+
+def write_csv(parts_dir, csv_path):
+    """Stream the combined parts into one CSV, one batch at a time."""
+    tmp = f"{csv_path}.{os.getpid()}.tmp"
+    header = True
+    with open(tmp, "w", newline="") as f:
+        for chunk in iter_dataset(parts_dir, 100_000):
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+    os.replace(tmp, csv_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Combine CICIDS2017 CSV files",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--input", default=DATASET_DIR, help="Directory with the day CSVs")
+    parser.add_argument("--output", default=COMBINED_PARQUET, help="Parquet dataset directory")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--csv", nargs="?", const=COMBINED_CSV, help="Also write a combined CSV")
+    args = parser.parse_args()
+
+    print("Combining CICIDS2017 CSV files...")
+
+    # Get all CSV files
+    csv_files = sorted(glob.glob(os.path.join(args.input, "*.csv")))
+    print(f"Found {len(csv_files)} CSV files")
+    if not csv_files:
+        print("❌ No data loaded!")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    total_rows, labels = combine(csv_files, args.output, args.workers)
+    print(f"\n✅ Combined dataset saved to: {args.output} ({time.perf_counter() - start:.1f}s)")
+    print(f"   Total rows: {total_rows}")
+    print(f"   Total columns: {len(COMBINED_COLUMNS)}")
+
+    if args.csv:
+        write_csv(args.output, args.csv)
+        print(f"✅ Combined CSV saved to: {args.csv}")
+
+    if labels:
         print(f"\n   Label distribution:")
-        print(combined_df['Label'].value_counts())
-else:
-    print("❌ No data loaded!")
+        for label, count in labels.most_common():
+            print(f"   {label:<30} {count}")
@@ -0,0 +1,120 @@
+"""
+Side-by-side comparison of the exact RBF SVC ensemble member against the
+approximate-kernel members (Nystroem / random Fourier features).
+
+Reports test accuracy, macro F1, training time and per-batch
+predict_proba latency. The exact SVC is trained on at most
+--rbf-max-samples rows (its training time is quadratic); the approximate
+members use the whole training split.
+
+    python compare_svm_members.py
+    python compare_svm_members.py --members rbf nystroem --rbf-max-samples 50000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from kernel_approx import SVM_MEMBERS, make_svm_member
+from config import SVM_APPROX_COMPONENTS
+from dataset_cache import load_dataset, training_dataset
+
+# Combined Parquet parts (combine_dataset.py) or CICIDS2017_full.csv
+DATA_PATH = training_dataset()
+
+FEATURES = [
+    'Destination Port','Flow Duration','Total Fwd Packets','Total Backward Packets',
+    'Total Length of Fwd Packets','Total Length of Bwd Packets',
+    'Fwd Packet Length Mean','Bwd Packet Length Mean','Flow Packets/s',
+    'FIN Flag Count','SYN Flag Count','RST Flag Count','PSH Flag Count',
+    'ACK Flag Count','URG Flag Count','CWE Flag Count','ECE Flag Count'
+]
+LATENCY_BATCHES = (10, 1000)
+LATENCY_REPEATS = 20
+
+
+def load_xy(path):
+    df = load_dataset(path, columns=FEATURES + ['Label'])
+    df['Label'] = df['Label'].astype(object)
+    available = [c for c in FEATURES if c in df.columns]
+    df = df[available + ['Label']].replace([np.inf, -np.inf], np.nan).dropna()
+    df[available] = df[available].clip(-1e6, 1e6)
+    counts = df['Label'].value_counts()
+    df = df[df['Label'].isin(counts[counts >= 10].index)]
+    labels = df['Label'].astype("category")
+    return df[available].values, labels.cat.codes.values, labels.cat.categories.tolist()
+
+
+def batch_latency_ms(model, X, batch_size):
+    batch = X[:batch_size]
+    model.predict_proba(batch)  # warm-up
+    times = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        model.predict_proba(batch)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--members", nargs="+", default=list(SVM_MEMBERS), choices=SVM_MEMBERS)
+    parser.add_argument("--rbf-max-samples", type=int, default=150000)
+    parser.add_argument("--n-components", type=int, default=SVM_APPROX_COMPONENTS)
+    args = parser.parse_args()
+
+    print("📥 Loading dataset...")
+    X, y, categories = load_xy(args.data)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_test = scaler.transform(X_test)
+    print(f"✅ {len(X_train)} train / {len(X_test)} test rows, {len(categories)} classes\n")
+
+    results = []
+    for kind in args.members:
+        X_fit, y_fit = X_train, y_train
+        if kind == "rbf" and len(X_fit) > args.rbf_max_samples:
+            X_fit, _, y_fit, _ = train_test_split(
+                X_fit, y_fit, train_size=args.rbf_max_samples, random_state=42, stratify=y_fit
+            )
+
+        model = make_svm_member(kind, class_weight='balanced', n_components=args.n_components)
+        print(f"🚀 Training '{kind}' on {len(X_fit)} rows...")
+        start = time.perf_counter()
+        model.fit(X_fit, y_fit)
+        train_s = time.perf_counter() - start
+
+        y_pred = model.predict(X_test)
+        row = {
+            'member': kind,
+            'train_rows': len(X_fit),
+            'train_s': train_s,
+            'accuracy': accuracy_score(y_test, y_pred),
+            'macro_f1': f1_score(y_test, y_pred, average='macro', zero_division=0),
+        }
+        for batch_size in LATENCY_BATCHES:
+            row[f'latency_ms_{batch_size}'] = batch_latency_ms(model, X_test, batch_size)
+        results.append(row)
+
+    print(f"\n{'='*92}")
+    header = f"{'member':<10}{'train rows':>12}{'train s':>10}{'accuracy':>10}{'macro F1':>10}"
+    header += "".join(f"{f'ms/batch {b}':>16}" for b in LATENCY_BATCHES)
+    print(header)
+    print(f"{'-'*92}")
+    for row in results:
+        line = (f"{row['member']:<10}{row['train_rows']:>12}{row['train_s']:>10.1f}"
+                f"{row['accuracy']*100:>9.2f}%{row['macro_f1']:>10.4f}")
+        line += "".join(f"{row[f'latency_ms_{b}']:>16.3f}" for b in LATENCY_BATCHES)
+        print(line)
+    print(f"{'='*92}")
+
+
+if __name__ == "__main__":
+    main()
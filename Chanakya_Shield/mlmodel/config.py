@@ -10,3 +10,83 @@ QUANTUM_NUM_READS = 100
 # Clustering
 QUANTUM_CLUSTER_EPS = 0.3
 QUANTUM_CLUSTER_MIN_SAMPLES = 5
+
+# ===== Flow Tracking =====
+FLOW_MAX_FLOWS = 65536        # Hard cap on live flows (LRU eviction beyond)
+FLOW_IDLE_TIMEOUT = 15.0      # Seconds without packets before a flow ends
+FLOW_ACTIVE_TIMEOUT = 120.0   # Maximum flow lifetime (CICFlowMeter default)
+FLOW_SWEEP_INTERVAL = 1.0     # Background expiry period in seconds
+
+# ===== Capture =====
+# "scapy": sniff() with full scapy dissection per packet
+# "raw": batched raw frames + vectorized header parser (packet_parser.py);
+# faster, opt-in (needs root or CAP_NET_RAW, IPv4 only)
+CAPTURE_BACKEND = "scapy"
+CAPTURE_INTERFACE = None      # None = all interfaces
+CAPTURE_BATCH_FRAMES = 256    # Frames read per batch
+
+# ===== Detection Pipeline =====
+PIPELINE_FEATURE_QUEUE_SIZE = 256   # Batches waiting for inference
+PIPELINE_SINK_QUEUE_SIZE = 256      # Scored batches waiting for DB/alerts
+PIPELINE_INFERENCE_WORKERS = 1
+PIPELINE_MIN_BATCH = 8              # Adaptive batch size bounds (packets)
+PIPELINE_MAX_BATCH = 1024
+PIPELINE_LATENCY_TARGET = 0.2       # Seconds from first packet in a batch to scored
+
+# ===== Storage =====
+# "packets": one packets row per scored packet
+# "flows": one flows row per ended flow; packets rows only for anomalies
+# plus a random sample of normal traffic
+STORAGE_MODE = "packets"
+STORAGE_NORMAL_SAMPLE_RATE = 0.01   # Normal packet rows kept in "flows" mode
+
+# ===== Database =====
+DB_RETENTION_DAYS = 30          # Daily partitions older than this are dropped
+DB_PARTITION_DAYS_AHEAD = 7     # Partitions created in advance
+DB_MAINTENANCE_INTERVAL = 3600  # Seconds between retention runs in analysis.py (0 = off)
+
+# ===== Metrics =====
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"    # Prometheus text endpoint: http://127.0.0.1:9108/metrics
+METRICS_PORT = 9108
+
+# ===== Alerts =====
+ALERT_DOORBELL_HOST = "127.0.0.1"  # analysis.py wakes the alert service over UDP after committing anomalies
+ALERT_DOORBELL_PORT = 9109         # 0 = off (the service falls back to polling)
+ALERT_FEED_PAGE_SIZE = 500         # Anomaly rows per page read by the alert service
+ALERT_POLL_INTERVAL = 5.0          # Seconds between polls when no doorbell rings
+ALERT_DELIVERY_TIMEOUT = 30.0      # Seconds the alert service waits for a page's alerts before re-reading it
+
+# ===== Inference =====
+# Versioned bundle published by train_model.py and train_classifier.py
+# (None = mlmodel/model_bundle); without one the individual *.pkl files are loaded
+MODEL_BUNDLE_DIR = None
+MODEL_BUNDLE_MMAP = True              # Memory-map model arrays (shared page cache across processes)
+MODEL_RELOAD_INTERVAL = 5.0           # Seconds between checks for a retrained bundle (0 = no hot reload)
+
+# "full": ensemble.predict_proba on every packet
+# "cascade": IsolationForest -> LightGBM on outliers -> SVM only when unsure.
+# Opt-in: inliers become BENIGN unclassified, and rows outside the band are
+# decided on LightGBM-only probabilities while the per-class thresholds were
+# tuned on the blended ensemble output
+INFERENCE_MODE = "full"
+CASCADE_UNCERTAIN_BAND = (0.2, 0.9)   # LightGBM max-probability range sent to the SVM
+
+# "joblib": sklearn/LightGBM objects; "onnx": onnxruntime graphs written by
+# export_onnx.py (falls back to joblib if they are missing)
+INFERENCE_BACKEND = "joblib"
+ONNX_THREADS = 0                      # onnxruntime intra-op threads (0 = runtime default)
+
+# ===== Training =====
+# SVM ensemble member: "rbf" (exact SVC, quadratic training, needs the
+# 150k-row downsample), "nystroem" or "rff" (approximate kernel + linear
+# model, linear in the row count)
+SVM_MEMBER = "rbf"
+SVM_APPROX_COMPONENTS = 500
+# Stratified downsample for the approximate members. SMOTE then raises every
+# class to the largest per-class count, so without a cap the balanced
+# training set would be the full-corpus benign count times every class
+SVM_APPROX_MAX_SAMPLES = 1_500_000
+# Persist preprocessing stages (cleaning, sampling, SMOTE, scaling) as
+# memory-mapped .npy arrays so repeated runs skip straight to fitting
+MATRIX_CACHE = True
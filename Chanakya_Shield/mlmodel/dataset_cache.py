@@ -0,0 +1,311 @@
+"""
+Parquet cache of the CICIDS2017 CSVs, keyed by content hash and pruned to the
+columns the scripts use (pyarrow optional).
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from flow_table import ALL_FEATURE_COLUMNS
+from perf import peak_rss_mb
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "..", "datasets", ".cache")
+COMBINED_CSV = os.path.join(BASE_DIR, "..", "datasets", "CICIDS2017_full.csv")
+COMBINED_PARQUET = os.path.join(BASE_DIR, "..", "datasets", "CICIDS2017_full.parquet")
+INDEX_FILE = "index.json"
+CACHE_FORMAT = 2
+CSV_CHUNK_ROWS = 100_000
+
+LABEL_COLUMNS = ("Label", "label", "Attack", "attack", "Class", "class", "attack_cat", "AttackType", "target")
+META_COLUMNS = ("Src IP", "Source IP", "Dst IP", "Destination IP", "Protocol", "Timestamp", "Time")
+CACHED_COLUMNS = tuple(ALL_FEATURE_COLUMNS) + LABEL_COLUMNS + META_COLUMNS
+
+# Spellings that differ between CICIDS2017 releases -> the names used here
+COLUMN_ALIASES = {"Source IP": "Src IP", "Destination IP": "Dst IP", "Time": "Timestamp",
+                  **{name: "Label" for name in LABEL_COLUMNS if name != "Label"}}
+# Fixed schema of the combined dataset (combine_dataset.py)
+COMBINED_COLUMNS = tuple(ALL_FEATURE_COLUMNS) + ("Label", "Src IP", "Dst IP", "Protocol", "Timestamp")
+
+# float32 is exact for ports, flag and packet counts; durations and byte
+# totals keep 7 significant digits
+FEATURE_DTYPE = np.float32
+INT_COLUMNS = {"Protocol": np.int16}
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _ARROW_TYPES = {'feature': pa.float32(), 'int': pa.int16(), 'text': pa.string()}
+except ImportError:
+    pa = pq = None
+
+
+def _kind(column):
+    if column in ALL_FEATURE_COLUMNS:
+        return "feature"
+    if column in INT_COLUMNS:
+        return "int"
+    return "text"
+
+
+def compact(df, text_dtype="category"):
+    """Cast the cached columns of ``df`` (in place) to their compact dtypes."""
+    for column in df.columns:
+        kind = _kind(column)
+        if kind == "feature":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(FEATURE_DTYPE)
+        elif kind == "int":
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype(INT_COLUMNS[column])
+        else:
+            df[column] = df[column].astype(text_dtype)
+    return df
+
+
+def harmonise(chunk, columns=None):
+    """
+    Strip and unify the column names of a CSV chunk (CICIDS headers carry
+    stray spaces, e.g. " Destination Port"). With ``columns`` the result has
+    exactly those columns in that order, missing ones empty.
+    """
+    chunk.columns = [COLUMN_ALIASES.get(c, c) for c in chunk.columns.str.strip()]
+    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+    return chunk if columns is None else chunk.reindex(columns=list(columns))
+
+
+def _read_csv(path, chunksize=None):
+    wanted = set(CACHED_COLUMNS)
+    reader = pd.read_csv(path, usecols=lambda c: c.strip() in wanted, chunksize=chunksize,
+                         encoding="utf-8", encoding_errors="ignore", low_memory=False)
+    chunks = reader if chunksize else [reader]
+    for chunk in chunks:
+        yield harmonise(chunk)
+
+
+def write_parquet(source, dest, columns=None):
+    """
+    Stream CSV ``source`` into the Parquet file ``dest`` one chunk at a
+    time (via a temp file renamed into place). ``columns`` fixes the schema,
+    so parts written from different CSVs form one dataset. Returns
+    (rows, {label: count}).
+    """
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    writer = None
+    rows = 0
+    labels = Counter()
+    try:
+        for chunk in _read_csv(source, CSV_CHUNK_ROWS):
+            if writer is None and not any(c in chunk.columns for c in ALL_FEATURE_COLUMNS):
+                raise ValueError(f"No feature columns in {source}")
+            if columns is not None:
+                chunk = chunk.reindex(columns=list(columns))
+            if writer is None:
+                schema = pa.schema([(c, _ARROW_TYPES[_kind(c)]) for c in chunk.columns])
+                writer = pq.ParquetWriter(tmp, schema)
+            if "Label" in chunk.columns:
+                labels.update(chunk["Label"].value_counts().to_dict())
+            # Text is written as plain strings (Parquet dictionary-encodes
+            # them itself); categoricals are rebuilt on read
+            table = pa.Table.from_pandas(compact(chunk, text_dtype="string"), schema=schema,
+                                         preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+        if writer is None:
+            raise ValueError(f"No rows in {source}")
+        writer.close()
+        writer = None
+        os.replace(tmp, dest)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return rows, dict(labels)
+
+
+def _sha256(path, chunk=1 << 22):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """Parquet cache directory with an index of source-file hashes."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def source_hash(self, source):
+        """sha256 of ``source``; reused from the index while size and mtime are unchanged."""
+        source = os.path.abspath(source)
+        st = os.stat(source)
+        index = self._load_index()
+        entry = index.get(source)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        digest = _sha256(source)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index[source] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        self._save_index(index)
+        return digest
+
+    def path_for(self, source):
+        stem = os.path.splitext(os.path.basename(source))[0]
+        digest = self.source_hash(source)
+        return os.path.join(self.cache_dir, f"{stem}-{digest[:16]}-v{CACHE_FORMAT}.parquet")
+
+    def build(self, source, cache_path):
+        """Convert ``source`` into ``cache_path``; returns the row count."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        rows, _ = write_parquet(source, cache_path)
+        return rows
+
+    def ensure(self, source):
+        """Path of the cache file for ``source``, building it on first use."""
+        cache_path = self.path_for(source)
+        if not os.path.exists(cache_path):
+            start = time.perf_counter()
+            print(f"📦 Building dataset cache for {os.path.basename(source)}...")
+            rows = self.build(source, cache_path)
+            print(f"✅ Cached {rows:,} rows in {time.perf_counter() - start:.1f}s "
+                  f"({os.path.getsize(cache_path) / 1e6:.1f} MB): {cache_path}")
+        return cache_path
+
+
+_warned = False
+
+
+def _no_cache(reason):
+    global _warned
+    if not _warned:
+        print(f"⚠️  {reason}; reading the CSV directly (columns pruned, compact dtypes)")
+        _warned = True
+
+
+def _is_parquet(source):
+    return os.path.isdir(source) or str(source).endswith(".parquet")
+
+
+def _parquet_files(source):
+    """Part files of a Parquet dataset directory (or the file itself), in order."""
+    if not os.path.isdir(source):
+        return [source]
+    files = sorted(glob.glob(os.path.join(source, "*.parquet")))
+    if not files:
+        raise FileNotFoundError(f"No Parquet parts in {source}")
+    return files
+
+
+def _sources(source, cache_dir, use_cache):
+    """Parquet files to read for ``source``, or None to read the CSV itself."""
+    if _is_parquet(source):
+        if pq is None:
+            raise ImportError(f"pyarrow is required to read {source}")
+        return _parquet_files(source)
+    if use_cache and pq is not None:
+        return [DatasetCache(cache_dir).ensure(source)]
+    if use_cache:
+        _no_cache("pyarrow is not installed")
+    return None
+
+
+def parquet_parts(source, cache_dir=CACHE_DIR):
+    """Parquet files holding ``source``, building the cache if it is a CSV."""
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet access")
+    return _sources(source, cache_dir, use_cache=True)
+
+
+def _read_kwargs(cache_path, columns):
+    names = pq.read_schema(cache_path).names
+    present = names if columns is None else [c for c in columns if c in names]
+    return {'columns': present, 'read_dictionary': [c for c in present if _kind(c) == "text"]}
+
+
+def load_dataset(source, columns=None, cache_dir=CACHE_DIR, use_cache=True):
+    """
+    DataFrame of ``source`` restricted to ``columns`` (default: every cached
+    column present in the file). Requested columns the file lacks are skipped.
+    ``source`` is a CSV (read through the cache) or a Parquet file or
+    directory of parts, such as the combined dataset.
+    """
+    files = _sources(source, cache_dir, use_cache)
+    if files is not None:
+        kwargs = _read_kwargs(files[0], columns)
+        return pa.concat_tables([pq.read_table(f, **kwargs) for f in files]).to_pandas()
+
+    df = pd.concat([compact(chunk, text_dtype=object) for chunk in _read_csv(source, CSV_CHUNK_ROWS)],
+                   ignore_index=True)
+    df = compact(df)
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+def iter_dataset(source, chunksize, columns=None, cache_dir=CACHE_DIR, use_cache=True):
+    """Like load_dataset, but yields DataFrames of up to ``chunksize`` rows."""
+    files = _sources(source, cache_dir, use_cache)
+    if files is not None:
+        kwargs = _read_kwargs(files[0], columns)
+        for path in files:
+            parquet = pq.ParquetFile(path, read_dictionary=kwargs['read_dictionary'])
+            for batch in parquet.iter_batches(batch_size=chunksize, columns=kwargs['columns']):
+                yield batch.to_pandas()
+        return
+
+    for chunk in _read_csv(source, chunksize):
+        chunk = compact(chunk)
+        yield chunk if columns is None else chunk[[c for c in columns if c in chunk.columns]]
+
+
+def dataset_hash(source, cache_dir=CACHE_DIR):
+    """Content hash of a CSV, Parquet file or parts directory (per-file hashes come from the index)."""
+    cache = DatasetCache(cache_dir)
+    files = _parquet_files(source) if os.path.isdir(source) else [source]
+    if len(files) == 1:
+        return cache.source_hash(files[0])
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(f"{os.path.basename(path)}:{cache.source_hash(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def training_dataset():
+    """The combined dataset: the Parquet parts or CICIDS2017_full.csv, whichever is newer."""
+    present = [path for path in (COMBINED_PARQUET, COMBINED_CSV) if os.path.exists(path)]
+    return max(present, key=os.path.getmtime) if present else COMBINED_CSV
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar cache for CSV datasets and compare load paths")
+    parser.add_argument("csv", nargs="+")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    for source in args.csv:
+        start = time.perf_counter()
+        df = load_dataset(source, cache_dir=args.cache_dir)
+        print(f"📊 {os.path.basename(source)}: {len(df):,} rows x {df.shape[1]} columns, "
+              f"{df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory, "
+              f"loaded in {time.perf_counter() - start:.2f}s (peak RSS {peak_rss_mb():.0f} MiB)")
@@ -0,0 +1,271 @@
+"""Buffered bulk detection writer over a pooled MySQL (or SQLite) connection."""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from config import STORAGE_MODE, STORAGE_NORMAL_SAMPLE_RATE
+from schema import PACKETS_DDL, check  # PACKETS_DDL re-exported for the benchmarks
+
+PACKET_COLUMNS = (
+    "timestamp", "src_ip", "dest_ip", "protocol", "length",
+    "flags", "status", "reason", "attack_type"
+)
+# Live detector rows also record which model version scored them
+DETECTION_COLUMNS = PACKET_COLUMNS + ("model_version",)
+FLOW_COLUMNS = (
+    "first_seen", "last_seen", "src_ip", "dest_ip", "fwd_packets", "bwd_packets",
+    "fwd_bytes", "bwd_bytes", "attack_packets", "max_anomaly_score", "verdict",
+    "end_reason", "model_version"
+)
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+RECONNECT_ATTEMPTS = 5
+MAX_PENDING = 50000  # Oldest rows are dropped beyond this while the DB is down
+
+
+def db_config_from_env():
+    return dict(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "packeteye")
+    )
+
+
+class MySQLBackend:
+    placeholder = "%s"
+    dialect = "mysql"
+
+    def __init__(self, pool_size=4, **config):
+        import mysql.connector
+        from mysql.connector import pooling
+
+        self.transient_errors = (
+            mysql.connector.errors.OperationalError,
+            mysql.connector.errors.InterfaceError,
+            mysql.connector.errors.PoolError,
+        )
+        self.pool = pooling.MySQLConnectionPool(
+            pool_name="packeteye",
+            pool_size=pool_size,
+            pool_reset_session=False,
+            **(config or db_config_from_env())
+        )
+
+    def connect(self):
+        return self.pool.get_connection()
+
+    def release(self, conn):
+        # Returns a pooled connection to the pool
+        conn.close()
+
+    def ddl(self, statement):
+        return statement
+
+
+class SQLiteBackend:
+    placeholder = "?"
+    dialect = "sqlite"
+    transient_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._shared = None
+        if path == ":memory:":
+            # Every connect() must see the same in-memory database
+            self._shared = sqlite3.connect(path, check_same_thread=False)
+
+    def connect(self):
+        if self._shared is not None:
+            return self._shared
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def release(self, conn):
+        if conn is not self._shared:
+            conn.close()
+
+    def ddl(self, statement):
+        return statement.replace("INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide MySQL backend so every writer shares one pool."""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            _default_backend = MySQLBackend(**db_config_from_env())
+        return _default_backend
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (e.g. SQLite for benchmarks) before writers are created."""
+    global _default_backend
+    with _default_lock:
+        _default_backend = backend
+
+
+def normal_sample_rate():
+    """Fraction of "Normal" packet rows kept under the configured STORAGE_MODE."""
+    return STORAGE_NORMAL_SAMPLE_RATE if STORAGE_MODE == "flows" else 1.0
+
+
+def check_schema(backend=None):
+    """Schema version of the database; warns if ``python schema.py --migrate`` is pending."""
+    return check(backend or get_backend())
+
+
+class DetectionWriter:
+    """
+    Buffered bulk writer for one table. Thread-safe. ``on_flush(rows,
+    seconds)`` is called after every successful commit (e.g. for metrics).
+    With ``normal_sample_rate`` below 1, rows whose status is "Normal" are
+    kept with that probability.
+    """
+
+    def __init__(self, backend=None, table="packets", columns=PACKET_COLUMNS,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, on_flush=None,
+                 normal_sample_rate=1.0):
+        self.backend = backend or get_backend()
+        self.table = table
+        self.columns = tuple(columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.rows_written = 0
+        self.flushes = 0
+        self.reconnects = 0
+        self.rows_dropped = 0
+        self.rows_sampled_out = 0
+        self.normal_sample_rate = normal_sample_rate
+        self._status = self.columns.index("status") if "status" in self.columns else None
+
+        marks = ",".join([self.backend.placeholder] * len(self.columns))
+        self._sql = f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES ({marks})"
+        self._pending = []
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_flush = time.monotonic()
+
+        self._stop = threading.Event()
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_loop, name=f"{table}-writer", daemon=True)
+            self._timer.start()
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def write(self, row):
+        """Queue one row (a tuple in ``columns`` order)."""
+        with self._lock:
+            if self.normal_sample_rate < 1 and not self._sampled([row]):
+                return
+            self._pending.append(row)
+            self._bound_pending()
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def write_many(self, rows):
+        with self._lock:
+            if self.normal_sample_rate < 1:
+                rows = self._sampled(rows)
+            self._pending.extend(rows)
+            self._bound_pending()
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        with self._lock:
+            self._flush_locked()
+            self._disconnect()
+
+    # ---------------------------------------------------------
+    # Internals (callers hold the lock)
+    # ---------------------------------------------------------
+    def _sampled(self, rows):
+        if self._status is None:
+            return rows
+        status, rate = self._status, self.normal_sample_rate
+        kept = [row for row in rows if row[status] != "Normal" or random.random() < rate]
+        self.rows_sampled_out += len(rows) - len(kept)
+        return kept
+
+    def _bound_pending(self):
+        """Drop the oldest rows beyond MAX_PENDING (they pile up while the DB is down)."""
+        overflow = len(self._pending) - MAX_PENDING
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.rows_dropped += overflow
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval / 4):
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️ Detection writer flush failed: {e}")
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self.backend.release(self._conn)
+            except Exception:
+                pass
+        self._conn = None
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        rows = self._pending
+        start = time.perf_counter()
+        for attempt in range(RECONNECT_ATTEMPTS):
+            try:
+                if self._conn is None:
+                    self._conn = self.backend.connect()
+                cursor = self._conn.cursor()
+                cursor.executemany(self._sql, rows)
+                self._conn.commit()
+                cursor.close()
+                break
+            except self.backend.transient_errors as e:
+                if attempt == RECONNECT_ATTEMPTS - 1:
+                    # Kept for the next flush, up to MAX_PENDING rows
+                    self._bound_pending()
+                    raise
+                print(f"🔄 Lost DB connection ({e}). Reconnecting...")
+                self.reconnects += 1
+                self._disconnect()
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+            except Exception as e:
+                # A bad row or schema mismatch fails the same way on every
+                # retry, so the batch is dropped instead of blocking the buffer
+                self._pending = []
+                self.rows_dropped += len(rows)
+                print(f"❌ Dropped {len(rows)} {self.table} rows: {e}")
+                try:
+                    self._conn.rollback()
+                except Exception:
+                    pass
+                self._disconnect()
+                raise
+        self._pending = []
+        self.rows_written += len(rows)
+        self.flushes += 1
+        if self.on_flush is not None:
+            self.on_flush(len(rows), time.perf_counter() - start)
@@ -0,0 +1,332 @@
+"""
+Staged detection pipeline: capture -> inference worker(s) -> sink writer,
+joined by bounded queues with adaptive batch sizes.
+"""
+
+import collections
+import queue
+import threading
+import time
+
+import numpy as np
+
+from flow_table import N_FEATURES
+
+_STOP = object()
+
+
+class FeatureBlock:
+    """A batch of packets: preallocated feature rows plus metadata tuples."""
+
+    __slots__ = ("features", "meta", "created", "filled")
+
+    def __init__(self, rows):
+        self.features = np.zeros((rows, N_FEATURES), dtype=np.float64)
+        self.meta = []
+        self.created = 0.0     # monotonic time of the first packet
+        self.filled = False    # pushed because it reached the batch size
+
+    def __len__(self):
+        return len(self.meta)
+
+
+class Stage:
+    """A bounded queue drained by one or more worker threads."""
+
+    def __init__(self, name, handler, maxsize, workers=1):
+        self.name = name
+        self.handler = handler
+        self.queue = queue.Queue(maxsize)
+        self.workers = workers
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def offer(self, item, timeout=None):
+        """Enqueue ``item``; returns False (and counts a drop) if the queue stays full."""
+        try:
+            if timeout is None:
+                self.queue.put_nowait(item)
+            else:
+                self.queue.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            self.count_drop()
+            return False
+
+    def count_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def stop(self):
+        """Let workers drain everything queued so far, then join them."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.handler(item)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"⚠️ {self.name} stage error: {e}")
+            with self._lock:
+                self.processed += 1
+
+    def stats(self):
+        return {
+            'depth': self.queue.qsize(),
+            'maxsize': self.queue.maxsize,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
+
+
+class AdaptiveBatcher:
+    """
+    Chooses the batch size between ``min_size`` and ``max_size``.
+
+    After every scored batch the inference stage reports the oldest
+    packet's queueing delay, the scoring time and whether more batches were
+    already waiting. A backlog means inference is throughput-bound, so the
+    size is doubled (fewer, larger model calls). Without a backlog the size
+    is halved when delay + scoring exceeds ``latency_target``, and doubled
+    when the batch filled up while latency stayed under half the target.
+    Partial batches are flushed once the oldest packet has
+    waited ``max_wait`` (half the target). With ``latency_target=None``
+    (offline input) batches simply grow to ``max_size``.
+    """
+
+    def __init__(self, min_size=8, max_size=1024, latency_target=0.2, history=2048):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.latency_target = latency_target
+        self.size = min_size
+
+        self.batches = 0
+        self.rows = 0
+        self.grows = 0
+        self.shrinks = 0
+        self.timer_flushes = 0
+        self._delays = collections.deque(maxlen=history)
+        self._sizes = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    @property
+    def max_wait(self):
+        return self.latency_target / 2 if self.latency_target else 1.0
+
+    def observe(self, rows, queue_delay, score_time, filled, backlog=0):
+        with self._lock:
+            self.batches += 1
+            self.rows += rows
+            self._delays.append(queue_delay)
+            self._sizes.append(rows)
+
+            latency = queue_delay + score_time
+            if backlog or (filled and (self.latency_target is None
+                                       or latency < self.latency_target / 2)):
+                if self.size < self.max_size:
+                    self.size = min(self.max_size, self.size * 2)
+                    self.grows += 1
+            elif self.latency_target is not None and latency > self.latency_target:
+                if self.size > self.min_size:
+                    self.size = max(self.min_size, self.size // 2)
+                    self.shrinks += 1
+
+    def timer_flush(self):
+        """Count a partial block pushed by the flush timer."""
+        with self._lock:
+            self.timer_flushes += 1
+
+    def stats(self):
+        with self._lock:
+            delays = np.array(self._delays) * 1000 if self._delays else np.zeros(1)
+            return {
+                'size': self.size,
+                'batches': self.batches,
+                'mean_batch': float(np.mean(self._sizes)) if self._sizes else 0.0,
+                'max_batch': int(max(self._sizes)) if self._sizes else 0,
+                'queue_delay_p50_ms': float(np.percentile(delays, 50)),
+                'queue_delay_p95_ms': float(np.percentile(delays, 95)),
+                'grows': self.grows,
+                'shrinks': self.shrinks,
+                'timer_flushes': self.timer_flushes,
+            }
+
+
+class DetectionPipeline:
+    """
+    Wires the capture callback to inference and sink stages.
+
+    ``extract(packet, row)`` writes one feature row and returns a metadata
+    tuple (or None to skip the packet), ``score(block)`` turns a FeatureBlock
+    into a result and ``sink(result)`` persists it.
+    """
+
+    def __init__(self, extract, score, sink, batcher=None, feature_queue_size=256,
+                 sink_queue_size=256, inference_workers=1, sink_timeout=0.5, lossless=False):
+        self.extract = extract
+        self.score = score
+        self.batcher = batcher or AdaptiveBatcher()
+        self.sink_timeout = sink_timeout
+        self.lossless = lossless
+
+        self.captured = 0
+        self.capture_dropped = 0
+        self.sink_dropped_rows = 0   # Scored packets in batches the sink dropped
+
+        self.inference = Stage("inference", self._infer, feature_queue_size, inference_workers)
+        self.sink = Stage("sink", sink, sink_queue_size)
+
+        # Recycled blocks (sized for the largest batch) so steady-state
+        # capture allocates nothing
+        self._free_blocks = collections.deque()
+        self._capture_lock = threading.Lock()
+        self._drop_lock = threading.Lock()
+        self._block = self._new_block()
+        self._timer = None
+        self._stop_timer = threading.Event()
+        self._stopping = threading.Event()
+
+    # ---------------------------------------------------------
+    # Capture (runs on the sniffer thread)
+    # ---------------------------------------------------------
+    def _new_block(self):
+        try:
+            block = self._free_blocks.pop()
+        except IndexError:
+            block = FeatureBlock(self.batcher.max_size)
+        block.meta = []
+        block.filled = False
+        return block
+
+    def _add(self, extract, item):
+        """Extract one item into the current block (caller holds the capture lock)."""
+        block = self._block
+        meta = extract(item, block.features[len(block.meta)])
+        if meta is None:
+            return
+        if not block.meta:
+            block.created = time.monotonic()
+        block.meta.append(meta)
+        self.captured += 1
+        if len(block.meta) >= self.batcher.size:
+            block.filled = True
+            self._push_block()
+
+    def submit(self, packet):
+        with self._capture_lock:
+            self._add(self.extract, packet)
+
+    def submit_many(self, items, extract=None):
+        """
+        Submit a batch of capture records under one lock acquisition.
+        ``extract`` overrides the pipeline's extract function for these items
+        (e.g. pre-parsed header records instead of scapy packets).
+        """
+        extract = extract or self.extract
+        with self._capture_lock:
+            for item in items:
+                self._add(extract, item)
+
+    def _push_block(self):
+        """Hand the current block to inference (caller holds the capture lock)."""
+        block = self._block
+        self._block = self._new_block()
+        if self.lossless:
+            self.inference.queue.put(block)
+        elif not self.inference.offer(block):
+            self.capture_dropped += len(block)
+            self._free_blocks.append(block)
+
+    def _flush_loop(self):
+        """Timer: push a partial block once its oldest packet has waited max_wait."""
+        while not self._stop_timer.is_set():
+            max_wait = self.batcher.max_wait
+            with self._capture_lock:
+                block = self._block
+                if block.meta and time.monotonic() - block.created >= max_wait:
+                    self._push_block()
+                    self.batcher.timer_flush()
+            self._stop_timer.wait(max(0.005, max_wait / 4))
+
+    # ---------------------------------------------------------
+    # Inference and sink
+    # ---------------------------------------------------------
+    def _infer(self, block):
+        start = time.monotonic()
+        rows, filled = len(block), block.filled
+        queue_delay = start - block.created
+        backlog = self.inference.queue.qsize()
+        try:
+            result = self.score(block)
+        finally:
+            self._free_blocks.append(block)
+        self.batcher.observe(rows, queue_delay, time.monotonic() - start, filled, backlog)
+        if result is None:
+            return
+        if not (self.lossless or self._stopping.is_set()):
+            try:
+                # Back-pressure the inference stage briefly before dropping
+                self.sink.queue.put(result, timeout=self.sink_timeout)
+                return
+            except queue.Full:
+                if not self._stopping.is_set():
+                    self.sink.count_drop()
+                    with self._drop_lock:
+                        self.sink_dropped_rows += rows
+                    return
+        # Lossless source or shutting down: wait for the writer
+        self.sink.queue.put(result)
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def start(self):
+        self.sink.start()
+        self.inference.start()
+        self._stop_timer.clear()
+        self._stopping.clear()
+        self._timer = threading.Thread(target=self._flush_loop, name="batch-flush", daemon=True)
+        self._timer.start()
+
+    def stop(self):
+        """Flush the partial block and every queued batch (none are dropped), then stop workers."""
+        self._stopping.set()
+        self._stop_timer.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+        with self._capture_lock:
+            if self._block.meta:
+                # Shutdown must not lose packets: wait for queue space
+                block = self._block
+                self._block = self._new_block()
+                self.inference.queue.put(block)
+        self.inference.stop()
+        self.sink.stop()
+
+    def stats(self):
+        return {
+            'capture': {'processed': self.captured, 'dropped': self.capture_dropped},
+            'inference': self.inference.stats(),
+            'sink': dict(self.sink.stats(), dropped_rows=self.sink_dropped_rows),
+            'batching': self.batcher.stats(),
+        }
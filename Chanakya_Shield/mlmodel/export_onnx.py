@@ -0,0 +1,128 @@
+"""
+Export the joblib models to ONNX (see onnx_backend.py) and check numerical
+parity against the joblib pipeline on real dataset rows.
+
+    python export_onnx.py
+    python export_onnx.py --rows 20000 --out onnx
+"""
+
+import argparse
+import os
+
+import joblib
+import numpy as np
+
+from dataset_cache import iter_dataset, training_dataset
+from model_bundle import BundleError, load_bundle
+from onnx_backend import ONNX_DIR, export_models, load_onnx_models
+from scoring import apply_thresholds, benign_index, threshold_vector
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Combined Parquet parts (combine_dataset.py) or CICIDS2017_full.csv
+DATA_PATH = training_dataset()
+
+FEATURES = [
+    'Destination Port','Flow Duration','Total Fwd Packets','Total Backward Packets',
+    'Total Length of Fwd Packets','Total Length of Bwd Packets',
+    'Fwd Packet Length Mean','Bwd Packet Length Mean','Flow Packets/s',
+    'FIN Flag Count','SYN Flag Count','RST Flag Count','PSH Flag Count',
+    'ACK Flag Count','URG Flag Count','CWE Flag Count','ECE Flag Count'
+]
+
+
+def load_sample(path, rows, n_features):
+    """Raw 17-feature rows from the dataset (random rows if it is missing)."""
+    if os.path.exists(path):
+        df = next(iter_dataset(path, rows * 5, columns=FEATURES), None)
+        if df is not None and all(c in df.columns for c in FEATURES):
+            X = df[FEATURES].astype(np.float64).replace([np.inf, -np.inf], np.nan).dropna().clip(-1e6, 1e6)
+            return X.sample(min(rows, len(X)), random_state=0).values
+    print(f"⚠️  No 17-feature dataset at {path}; checking parity on random rows, "
+          f"which says little about real traffic (pass --data)")
+    return np.abs(np.random.RandomState(0).normal(0, 1000, size=(rows, n_features)))
+
+
+def check_parity(models, onnx_models, X):
+    iso_model, ensemble, scaler, selected_idx, thresholds, benign_idx = models
+    preprocess, onnx_iso, onnx_ensemble = onnx_models
+
+    X_ref = scaler.transform(X)
+    if selected_idx is not None:
+        X_ref = X_ref[:, selected_idx]
+    X_onnx = preprocess.transform(X)
+
+    iso_ref = iso_model.predict(X_ref)
+    iso_onnx = onnx_iso.predict(X_onnx)
+
+    report = {
+        'preprocess max |diff|': float(np.max(np.abs(X_ref - X_onnx))),
+        'iso verdict agreement': float(np.mean(iso_ref == iso_onnx)),
+    }
+    for name, member in ensemble.named_estimators_.items():
+        diff = np.abs(member.predict_proba(X_ref) - onnx_ensemble.named_estimators_[name].predict_proba(X_onnx))
+        report[f'{name} proba max |diff|'] = float(diff.max())
+
+    proba_ref = ensemble.predict_proba(X_ref)
+    proba_onnx = onnx_ensemble.predict_proba(X_onnx)
+    report['ensemble proba max |diff|'] = float(np.max(np.abs(proba_ref - proba_onnx)))
+    report['argmax agreement'] = float(np.mean(proba_ref.argmax(axis=1) == proba_onnx.argmax(axis=1)))
+    if thresholds is not None:
+        report['thresholded agreement'] = float(np.mean(
+            apply_thresholds(proba_ref, thresholds, benign_idx)
+            == apply_thresholds(proba_onnx, thresholds, benign_idx)
+        ))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=ONNX_DIR)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--rows", type=int, default=10000, help="Rows used for the parity check")
+    args = parser.parse_args()
+
+    try:
+        bundle = load_bundle(mmap=False)
+        print(f"📥 Loading model bundle {bundle.version}...")
+        iso_model, ensemble, scaler = bundle.iso_model, bundle.classifier, bundle.scaler
+        label_map, selected_idx = bundle.label_map, bundle.selected_features_idx
+        optimal_thresholds, version = bundle.optimal_thresholds, bundle.version
+    except BundleError:
+        print("📥 Loading joblib models...")
+        iso_model = joblib.load(os.path.join(BASE_DIR, "anomaly_model.pkl"))
+        ensemble = joblib.load(os.path.join(BASE_DIR, "attack_classifier.pkl"))
+        scaler = joblib.load(os.path.join(BASE_DIR, "scaler.pkl"))
+        label_map = joblib.load(os.path.join(BASE_DIR, "attack_labels.pkl"))
+        try:
+            selected_idx = joblib.load(os.path.join(BASE_DIR, "selected_features_idx.pkl"))
+            optimal_thresholds = joblib.load(os.path.join(BASE_DIR, "optimal_thresholds.pkl"))
+        except FileNotFoundError:
+            selected_idx, optimal_thresholds = None, None
+        version = None
+
+    inv_label_map = {v: k for k, v in label_map.items()}
+    thresholds = (threshold_vector(optimal_thresholds, len(inv_label_map))
+                  if optimal_thresholds is not None else None)
+
+    print(f"🔄 Exporting ONNX graphs to {args.out}...")
+    manifest = export_models(iso_model, ensemble, scaler, selected_idx, args.out, model_version=version)
+    print(f"✅ Exported preprocess, iso and members {manifest['exported']}")
+
+    print(f"\n🔍 Checking parity on {args.rows} rows...")
+    X = load_sample(args.data, args.rows, int(scaler.n_features_in_))
+    report = check_parity(
+        (iso_model, ensemble, scaler, selected_idx, thresholds, benign_index(inv_label_map)),
+        load_onnx_models(ensemble, args.out),
+        X,
+    )
+    for name, value in report.items():
+        print(f"   {name:<28} {value:.6g}")
+
+    if report.get('thresholded agreement', report['argmax agreement']) < 0.999:
+        print("⚠️  ONNX predictions differ from joblib on more than 0.1% of rows")
+    else:
+        print("✅ ONNX backend matches the joblib models")
+
+
+if __name__ == "__main__":
+    main()
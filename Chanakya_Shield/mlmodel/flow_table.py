@@ -0,0 +1,430 @@
+"""
+Array-backed flow table for real-time feature extraction, bounded by idle and
+active timeouts and an LRU cap.
+"""
+
+import socket
+import threading
+import time
+
+import numpy as np
+
+ALL_FEATURE_COLUMNS = [
+    'Destination Port','Flow Duration','Total Fwd Packets','Total Backward Packets',
+    'Total Length of Fwd Packets','Total Length of Bwd Packets',
+    'Fwd Packet Length Mean','Bwd Packet Length Mean','Flow Packets/s',
+    'FIN Flag Count','SYN Flag Count','RST Flag Count','PSH Flag Count',
+    'ACK Flag Count','URG Flag Count','CWE Flag Count','ECE Flag Count'
+]
+N_FEATURES = len(ALL_FEATURE_COLUMNS)
+
+# Order of the per-flow flag counter columns (TCP flag bit -> column)
+FLAG_NAMES = ('FIN', 'SYN', 'RST', 'PSH', 'ACK', 'URG', 'ECE')
+
+# Defaults follow CICFlowMeter: flows end after 120 s in total; idle flows
+# are closed much earlier so scans do not pin slots
+IDLE_TIMEOUT = 15.0
+ACTIVE_TIMEOUT = 120.0
+MAX_FLOWS = 65536
+SWEEP_INTERVAL = 1.0
+
+# Fraction of the table evicted at once when it is full. Evicting in bulk
+# keeps the O(capacity) LRU scan off the per-packet path during floods.
+LRU_EVICT_FRACTION = 1 / 64
+SWEEP_CHUNK = 1024
+
+_EMPTY = -1
+_NO_VERDICT = -1
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+_KEY_MASK = 0xFFFFFFFFFFFFFFFF
+_FIB_MULT = 0x9E3779B97F4A7C15  # 2^64 / golden ratio (Fibonacci hashing)
+
+
+def ip_to_int(ip):
+    """Dotted IPv4 string -> unsigned 32-bit int."""
+    return int.from_bytes(socket.inet_aton(ip), "big")
+
+
+def int_to_ip(value):
+    """Unsigned 32-bit int -> dotted IPv4 string."""
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+class FlowRecord:
+    """
+    Summary of one ended flow. ``ip_a`` is the lower address of the pair
+    (the "forward" side). ``verdict`` is the class index of the last packet
+    classified as an attack (-1 if none) and ``max_score`` the highest
+    anomaly score seen (-inf if no packet was scored).
+    """
+
+    __slots__ = ("flow_id", "ip_a", "ip_b", "start", "last_seen", "fwd_packets", "bwd_packets",
+                 "fwd_bytes", "bwd_bytes", "attack_packets", "verdict", "max_score", "reason")
+
+    def __init__(self, flow_id, ip_a, ip_b, start, last_seen, fwd_packets, bwd_packets,
+                 fwd_bytes, bwd_bytes, attack_packets, verdict, max_score, reason):
+        self.flow_id = flow_id
+        self.ip_a = ip_a
+        self.ip_b = ip_b
+        self.start = start
+        self.last_seen = last_seen
+        self.fwd_packets = fwd_packets
+        self.bwd_packets = bwd_packets
+        self.fwd_bytes = fwd_bytes
+        self.bwd_bytes = bwd_bytes
+        self.attack_packets = attack_packets
+        self.verdict = verdict
+        self.max_score = max_score
+        self.reason = reason
+
+
+class FlowTable:
+    """
+    Bidirectional flow table keyed by the unordered (ip_a, ip_b) pair.
+
+    The lower address of the pair is the "forward" side, so both directions
+    of a conversation share one slot. All public methods are thread-safe.
+
+    ``on_expire(records)`` is called with a list of FlowRecords outside the
+    lock, from whichever thread ended the flows (capture or sweeper).
+    """
+
+    def __init__(self, max_flows=MAX_FLOWS, idle_timeout=IDLE_TIMEOUT,
+                 active_timeout=ACTIVE_TIMEOUT, on_expire=None):
+        self.capacity = max_flows
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.on_expire = on_expire
+        self.size = 0
+        self.evicted = {'idle': 0, 'active': 0, 'lru': 0}
+        self._ended = []
+        self._next_serial = 1
+
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+
+        # Flow clock: the latest packet timestamp, extrapolated by wall time
+        # so expiry works for both live capture and faster-than-real-time
+        # replays
+        self.clock = 0.0
+        self._clock_wall = time.monotonic()
+
+        # Keep the index at most half full so probe chains stay short
+        index_bits = max(4, (max_flows * 2 - 1).bit_length())
+        self._shift = 64 - index_bits
+        self._mask = (1 << index_bits) - 1
+        self._index_keys = np.zeros(1 << index_bits, dtype=np.uint64)
+        self._index_slots = np.full(1 << index_bits, _EMPTY, dtype=np.int32)
+
+        self._free = np.arange(max_flows - 1, -1, -1, dtype=np.int32)
+        self._n_free = max_flows
+
+        self.live = np.zeros(max_flows, dtype=bool)
+        self.keys = np.zeros(max_flows, dtype=np.uint64)
+        self.start = np.zeros(max_flows, dtype=np.float64)
+        self.last_seen = np.zeros(max_flows, dtype=np.float64)
+        self.fwd_packets = np.zeros(max_flows, dtype=np.int64)
+        self.bwd_packets = np.zeros(max_flows, dtype=np.int64)
+        self.fwd_bytes = np.zeros(max_flows, dtype=np.int64)
+        self.bwd_bytes = np.zeros(max_flows, dtype=np.int64)
+        self.flag_counts = np.zeros((max_flows, len(FLAG_NAMES)), dtype=np.int64)
+
+        # Flow ids are (serial << 32) | slot, so a verdict for a flow whose
+        # slot has since been reused is recognised and ignored
+        self.flow_ids = np.zeros(max_flows, dtype=np.int64)
+        self.attack_packets = np.zeros(max_flows, dtype=np.int64)
+        self.verdict = np.full(max_flows, _NO_VERDICT, dtype=np.int16)
+        self.max_score = np.full(max_flows, -np.inf, dtype=np.float64)
+
+    # ---------------------------------------------------------
+    # Open-addressed index
+    # ---------------------------------------------------------
+    def _probe_start(self, key):
+        return ((key * _FIB_MULT) & _KEY_MASK) >> self._shift
+
+    def _index_find(self, key):
+        """Index position holding ``key``, or the empty position ending its chain."""
+        i = self._probe_start(key)
+        while self._index_slots[i] != _EMPTY and self._index_keys[i] != key:
+            i = (i + 1) & self._mask
+        return i
+
+    def _index_delete(self, i):
+        """Backward-shift deletion: no tombstones, chains stay contiguous."""
+        mask = self._mask
+        j = i
+        while True:
+            j = (j + 1) & mask
+            if self._index_slots[j] == _EMPTY:
+                break
+            home = self._probe_start(int(self._index_keys[j]))
+            # Entry at j may move to i only if i lies cyclically in [home, j)
+            if (j > i and (home <= i or home > j)) or (j < i and home <= i and home > j):
+                self._index_keys[i] = self._index_keys[j]
+                self._index_slots[i] = self._index_slots[j]
+                i = j
+        self._index_slots[i] = _EMPTY
+
+    def lookup(self, key):
+        """Slot of ``key`` or -1 if the flow is not tracked."""
+        with self._lock:
+            return int(self._index_slots[self._index_find(key)])
+
+    # ---------------------------------------------------------
+    # Slot management (callers hold the lock)
+    # ---------------------------------------------------------
+    def _reset_slot(self, slot, key, now):
+        self.flow_ids[slot] = (self._next_serial << _SLOT_BITS) | slot
+        self._next_serial += 1
+        self.live[slot] = True
+        self.keys[slot] = key
+        self.start[slot] = now
+        self.last_seen[slot] = now
+        self.fwd_packets[slot] = 0
+        self.bwd_packets[slot] = 0
+        self.fwd_bytes[slot] = 0
+        self.bwd_bytes[slot] = 0
+        self.flag_counts[slot] = 0
+        self.attack_packets[slot] = 0
+        self.verdict[slot] = _NO_VERDICT
+        self.max_score[slot] = -np.inf
+
+    def _end(self, slot, reason):
+        """Queue the flow in ``slot`` for on_expire before it is reset or released."""
+        if self.on_expire is None:
+            return
+        ip_a, ip_b = divmod(int(self.keys[slot]), 1 << 32)
+        self._ended.append(FlowRecord(
+            int(self.flow_ids[slot]), ip_a, ip_b, float(self.start[slot]), float(self.last_seen[slot]),
+            int(self.fwd_packets[slot]), int(self.bwd_packets[slot]),
+            int(self.fwd_bytes[slot]), int(self.bwd_bytes[slot]),
+            int(self.attack_packets[slot]), int(self.verdict[slot]), float(self.max_score[slot]), reason,
+        ))
+
+    def _deliver(self):
+        """Hand queued records to on_expire; callers must not hold the lock."""
+        if not self._ended:
+            return
+        with self._lock:
+            records, self._ended = self._ended, []
+        if records:
+            self.on_expire(records)
+
+    def _release(self, slot):
+        self._index_delete(self._index_find(int(self.keys[slot])))
+        self.live[slot] = False
+        self._free[self._n_free] = slot
+        self._n_free += 1
+        self.size -= 1
+
+    def _evict_lru(self):
+        live_slots = np.flatnonzero(self.live)
+        n = max(1, int(len(live_slots) * LRU_EVICT_FRACTION))
+        oldest = live_slots[np.argpartition(self.last_seen[live_slots], n - 1)[:n]]
+        for slot in oldest:
+            self._end(int(slot), 'lru')
+            self._release(int(slot))
+        self.evicted['lru'] += n
+
+    def _slot_for(self, key, now):
+        i = self._index_find(key)
+        slot = int(self._index_slots[i])
+        if slot != _EMPTY:
+            # A packet after a timeout starts a new flow in the same slot
+            if now - self.last_seen[slot] > self.idle_timeout:
+                self.evicted['idle'] += 1
+                self._end(slot, 'idle')
+                self._reset_slot(slot, key, now)
+            elif now - self.start[slot] > self.active_timeout:
+                self.evicted['active'] += 1
+                self._end(slot, 'active')
+                self._reset_slot(slot, key, now)
+            return slot
+
+        # New flow
+        if self._n_free == 0:
+            self._evict_lru()
+            i = self._index_find(key)
+        self._n_free -= 1
+        slot = int(self._free[self._n_free])
+        self.size += 1
+        self._index_keys[i] = key
+        self._index_slots[i] = slot
+        self._reset_slot(slot, key, now)
+        return slot
+
+    # ---------------------------------------------------------
+    # Hot path
+    # ---------------------------------------------------------
+    def update(self, src, dst, length, flags, dport, now, out):
+        """
+        Account one packet and write its 17 features into ``out``.
+
+        ``src``/``dst`` are IPv4 addresses as ints, ``now`` is a POSIX
+        timestamp in seconds and ``out`` is a writable row of length
+        N_FEATURES. Returns the flow id (see record_verdicts).
+        """
+        if src <= dst:
+            key = (src << 32) | dst
+            forward = True
+        else:
+            key = (dst << 32) | src
+            forward = False
+
+        with self._lock:
+            if now > self.clock:
+                self.clock = now
+                self._clock_wall = time.monotonic()
+
+            slot = self._slot_for(key, now)
+            self.last_seen[slot] = now
+
+            if forward:
+                fwd = int(self.fwd_packets[slot]) + 1
+                len_fwd = int(self.fwd_bytes[slot]) + length
+                self.fwd_packets[slot] = fwd
+                self.fwd_bytes[slot] = len_fwd
+                bwd = int(self.bwd_packets[slot])
+                len_bwd = int(self.bwd_bytes[slot])
+            else:
+                bwd = int(self.bwd_packets[slot]) + 1
+                len_bwd = int(self.bwd_bytes[slot]) + length
+                self.bwd_packets[slot] = bwd
+                self.bwd_bytes[slot] = len_bwd
+                fwd = int(self.fwd_packets[slot])
+                len_fwd = int(self.fwd_bytes[slot])
+
+            fin = flags & 0x01
+            syn = (flags & 0x02) >> 1
+            rst = (flags & 0x04) >> 2
+            psh = (flags & 0x08) >> 3
+            ack = (flags & 0x10) >> 4
+            urg = (flags & 0x20) >> 5
+            ece = (flags & 0x40) >> 6
+            if flags:
+                self.flag_counts[slot] += (fin, syn, rst, psh, ack, urg, ece)
+
+            elapsed = now - float(self.start[slot])
+            flow_id = int(self.flow_ids[slot])
+
+        if self._ended:
+            self._deliver()
+
+        out[:] = (
+            dport,
+            max(1, int(elapsed * 1000000)),  # in microseconds
+            fwd,
+            bwd,
+            len_fwd,
+            len_bwd,
+            len_fwd / max(1, fwd),
+            len_bwd / max(1, bwd),
+            (fwd + bwd) / max(0.001, elapsed),
+            fin, syn, rst, psh, ack, urg,
+            0,  # CWE is not observable from headers
+            ece,
+        )
+        return flow_id
+
+    def record_verdicts(self, flow_ids, scores, attacks):
+        """
+        Fold scored packets back into their flows: ``scores`` are anomaly
+        scores (higher = more anomalous) and ``attacks`` the predicted class
+        index of packets classified as attacks, -1 otherwise. Packets whose
+        flow has already ended are ignored.
+        """
+        flow_ids = np.asarray(flow_ids, dtype=np.int64)
+        slots = flow_ids & _SLOT_MASK
+        scores = np.asarray(scores, dtype=np.float64)
+        attacks = np.asarray(attacks)
+        with self._lock:
+            current = self.live[slots] & (self.flow_ids[slots] == flow_ids)
+            np.maximum.at(self.max_score, slots[current], scores[current])
+            attacked = current & (attacks >= 0)
+            if attacked.any():
+                np.add.at(self.attack_packets, slots[attacked], 1)
+                # Later packets of the batch win for a repeated slot
+                self.verdict[slots[attacked]] = attacks[attacked]
+
+    # ---------------------------------------------------------
+    # Expiry
+    # ---------------------------------------------------------
+    def current_time(self):
+        return self.clock + (time.monotonic() - self._clock_wall)
+
+    def expire(self, now=None):
+        """
+        Drop flows past their idle or active timeout. Candidates are found
+        without the lock; removal happens in chunks of SWEEP_CHUNK slots,
+        re-checking each slot, so update() is only ever blocked briefly.
+        Returns the number of flows expired.
+        """
+        if now is None:
+            now = self.current_time()
+        idle = self.live & (self.last_seen < now - self.idle_timeout)
+        active = self.live & (self.start < now - self.active_timeout)
+        candidates = np.flatnonzero(idle | active)
+
+        expired = 0
+        for chunk_start in range(0, len(candidates), SWEEP_CHUNK):
+            with self._lock:
+                for slot in candidates[chunk_start:chunk_start + SWEEP_CHUNK]:
+                    slot = int(slot)
+                    if not self.live[slot]:
+                        continue
+                    if self.last_seen[slot] < now - self.idle_timeout:
+                        self.evicted['idle'] += 1
+                        self._end(slot, 'idle')
+                    elif self.start[slot] < now - self.active_timeout:
+                        self.evicted['active'] += 1
+                        self._end(slot, 'active')
+                    else:
+                        continue  # refreshed since the scan
+                    self._release(slot)
+                    expired += 1
+            self._deliver()
+        return expired
+
+    def drain(self):
+        """End every live flow (e.g. at shutdown) so on_expire sees all of them."""
+        with self._lock:
+            for slot in np.flatnonzero(self.live):
+                self._end(int(slot), 'shutdown')
+                self._release(int(slot))
+        self._deliver()
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        """Expire timed-out flows every ``interval`` seconds in a daemon thread."""
+        if self._sweeper is not None:
+            return
+        self._stop_sweeper.clear()
+
+        def sweep():
+            while not self._stop_sweeper.wait(interval):
+                self.expire()
+
+        self._sweeper = threading.Thread(target=sweep, name="flow-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        if self._sweeper is None:
+            return
+        self._stop_sweeper.set()
+        self._sweeper.join()
+        self._sweeper = None
+
+    def stats(self):
+        """Live flow count, capacity and cumulative evictions by cause."""
+        with self._lock:
+            return {
+                'flows': self.size,
+                'capacity': self.capacity,
+                'evicted_idle': self.evicted['idle'],
+                'evicted_active': self.evicted['active'],
+                'evicted_lru': self.evicted['lru'],
+            }
+
+    def __len__(self):
+        return self.size
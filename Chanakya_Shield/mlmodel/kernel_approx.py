@@ -0,0 +1,99 @@
+"""Approximate-kernel (Nystroem / random Fourier features) replacement for the RBF SVC member."""
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import SGDClassifier
+from sklearn.svm import SVC
+from sklearn.utils.class_weight import compute_class_weight
+
+SVM_MEMBERS = ("rbf", "nystroem", "rff")
+
+
+class ApproxKernelClassifier(ClassifierMixin, BaseEstimator):
+    def __init__(self, kernel_map="nystroem", n_components=500, gamma="scale",
+                 alpha=1e-5, epochs=5, batch_size=50000, class_weight=None,
+                 random_state=42):
+        self.kernel_map = kernel_map
+        self.n_components = n_components
+        self.gamma = gamma
+        self.alpha = alpha
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.class_weight = class_weight
+        self.random_state = random_state
+
+    def _transform(self, X):
+        return self.feature_map_.transform(np.asarray(X, dtype=np.float64))
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        rng = np.random.RandomState(self.random_state)
+
+        # Same definition as SVC(gamma='scale')
+        gamma = self.gamma
+        if gamma == "scale":
+            var = X.var()
+            gamma = 1.0 / (X.shape[1] * var) if var > 0 else 1.0
+
+        if self.kernel_map == "nystroem":
+            self.feature_map_ = Nystroem(kernel="rbf", gamma=gamma,
+                                         n_components=min(self.n_components, len(X)),
+                                         random_state=self.random_state)
+        elif self.kernel_map == "rff":
+            self.feature_map_ = RBFSampler(gamma=gamma, n_components=self.n_components,
+                                           random_state=self.random_state)
+        else:
+            raise ValueError(f"Unknown kernel_map {self.kernel_map!r}; use 'nystroem' or 'rff'")
+        # Nystroem only needs landmark rows; RBFSampler only the input width
+        self.feature_map_.fit(X[rng.choice(len(X), size=min(len(X), 20000), replace=False)])
+
+        self.classes_, class_index = np.unique(y, return_inverse=True)
+        sample_weight = np.ones(len(y))
+        if self.class_weight is not None:
+            if self.class_weight == "balanced":
+                weights = compute_class_weight("balanced", classes=self.classes_, y=y)
+                weight_of = dict(zip(self.classes_, weights))
+            else:
+                weight_of = self.class_weight
+            # One lookup per class, broadcast to the rows
+            sample_weight = np.array([weight_of.get(c, 1.0) for c in self.classes_])[class_index]
+
+        self.linear_ = SGDClassifier(loss="log_loss", alpha=self.alpha,
+                                     random_state=self.random_state)
+        for _ in range(self.epochs):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), self.batch_size):
+                idx = order[start:start + self.batch_size]
+                self.linear_.partial_fit(self._transform(X[idx]), y[idx],
+                                         classes=self.classes_, sample_weight=sample_weight[idx])
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def decision_function(self, X):
+        return self.linear_.decision_function(self._transform(X))
+
+    def predict_proba(self, X):
+        return self.linear_.predict_proba(self._transform(X))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def make_svm_member(kind="rbf", class_weight=None, n_components=500):
+    """Ensemble member for ``kind`` in SVM_MEMBERS (exact RBF SVC by default)."""
+    if kind == "rbf":
+        return SVC(
+            kernel='rbf',
+            C=10.0,
+            gamma='scale',
+            probability=True,
+            random_state=42,
+            cache_size=500,
+            class_weight=class_weight
+        )
+    if kind in ("nystroem", "rff"):
+        return ApproxKernelClassifier(kernel_map=kind, n_components=n_components,
+                                      class_weight=class_weight)
+    raise ValueError(f"Unknown SVM member {kind!r}; choose from {SVM_MEMBERS}")
@@ -0,0 +1,323 @@
+"""
+Out-of-core training on the full corpus (train_model.py --out-of-core): row
+groups stream into a LightGBM Dataset, the other models fit on a sample.
+"""
+
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import lightgbm as lgb
+import numpy as np
+import pyarrow.parquet as pq
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from dataset_cache import parquet_parts
+from flow_table import ALL_FEATURE_COLUMNS
+from kernel_approx import make_svm_member
+from model_bundle import BUNDLE_DIR, save_bundle
+from perf import memory_mb, peak_rss_mb
+from pipeline.quantum_pipeline import apply_quantum_feature_selection
+from scoring import tune_thresholds
+
+SAMPLE_ROWS = 200_000
+HOLDOUT_ROWS = 50_000         # Rows kept out of training for threshold tuning
+HOLDOUT_MAX_FRACTION = 0.2    # ... at most this share of a small dataset
+MIN_SAMPLE_PER_CLASS = 1000   # Rare attacks are kept in the sample up to this count
+NUM_BOOST_ROUND = 300
+
+# Same model as the in-memory LGBMClassifier (n_estimators = NUM_BOOST_ROUND)
+LGB_PARAMS = {
+    'objective': 'multiclass',
+    'learning_rate': 0.05,
+    'max_depth': 30,
+    'num_leaves': 50,
+    'min_data_in_leaf': 10,
+    'feature_fraction': 0.8,
+    'lambda_l1': 0.1,
+    'lambda_l2': 0.1,
+    'seed': 42,
+    'num_threads': 0,
+    'verbose': -1,
+}
+
+
+class BoosterClassifier(ClassifierMixin, BaseEstimator):
+    """predict_proba() front end for a trained multiclass lgb.Booster."""
+
+    def __init__(self, booster=None, classes=None):
+        self.booster = booster
+        self.classes = classes
+
+    @property
+    def classes_(self):
+        return np.asarray(self.classes)
+
+    @property
+    def n_features_in_(self):
+        return self.booster.num_feature()
+
+    def predict_proba(self, X):
+        return self.booster.predict(np.asarray(X, dtype=np.float64))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class SoftVotingEnsemble:
+    """
+    Weighted soft vote over already-fitted members, with the attributes of
+    a fitted VotingClassifier that CascadeScorer and export_onnx.py use.
+    """
+
+    def __init__(self, members, weights, classes):
+        self.estimators = list(members.items())
+        self.named_estimators_ = dict(members)
+        self.weights = list(weights)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = next(iter(members.values())).n_features_in_
+
+    def predict_proba(self, X):
+        total = None
+        for (_, member), weight in zip(self.estimators, self.weights):
+            proba = weight * member.predict_proba(X)
+            total = proba if total is None else total + proba
+        return total / sum(self.weights)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class StageLog:
+    """Wall time, RSS and peak RSS per training stage."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        print(f"\n▶️  {name}")
+        start = time.perf_counter()
+        yield
+        entry = {
+            'stage': name,
+            'seconds': time.perf_counter() - start,
+            'rss_mb': (memory_mb() or {}).get('rss'),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        self.stages.append(entry)
+        print(f"⏱️  {name}: {entry['seconds']:.1f}s | RSS {entry['rss_mb'] or 0:.0f} MiB | "
+              f"peak {entry['peak_rss_mb'] or 0:.0f} MiB")
+
+    def summary(self):
+        print(f"\n{'stage':<12}{'seconds':>10}{'RSS MiB':>10}{'peak MiB':>10}")
+        for entry in self.stages:
+            print(f"{entry['stage']:<12}{entry['seconds']:>10.1f}{entry['rss_mb'] or 0:>10.0f}"
+                  f"{entry['peak_rss_mb'] or 0:>10.0f}")
+        print(f"{'total':<12}{sum(e['seconds'] for e in self.stages):>10.1f}")
+
+
+def _clean(table):
+    """(float64 features, labels) of a row group, dropping rows with inf/NaN like the in-memory path."""
+    X = np.column_stack([table.column(c).to_numpy(zero_copy_only=False) for c in ALL_FEATURE_COLUMNS])
+    X = X.astype(np.float64)
+    label = table.column("Label")
+    labels = label.to_numpy(zero_copy_only=False)
+    valid = np.isfinite(X).all(axis=1) & label.is_valid().to_numpy(zero_copy_only=False)
+    return X[valid], labels[valid]
+
+
+def _encode(labels, label_map):
+    """int32 codes of ``labels``: one label_map lookup per distinct label, not per row."""
+    uniques, inverse = np.unique(labels, return_inverse=True)
+    return np.array([label_map[label] for label in uniques.tolist()], dtype=np.int32)[inverse]
+
+
+class _RowGroups:
+    """
+    Cleaned row groups of the Parquet parts, optionally passed through
+    ``transform``, with a one-slot cache for sequential access.
+    """
+
+    COLUMNS = list(ALL_FEATURE_COLUMNS) + ["Label"]
+
+    def __init__(self, files, transform=None):
+        self.files = files
+        self.transform = transform
+        self.groups = [(path, i) for path in files for i in range(pq.ParquetFile(path).num_row_groups)]
+        self.total_rows = sum(pq.ParquetFile(path).metadata.num_rows for path in files)
+        self._key = None
+        self._data = None
+        self._files = {}
+
+    def read(self, index):
+        """Cleaned (X, labels) of row group ``index``; only the last one is kept in memory."""
+        if self._key != index:
+            path, group = self.groups[index]
+            if path not in self._files:
+                self._files[path] = pq.ParquetFile(path)
+            X, labels = _clean(self._files[path].read_row_group(group, columns=self.COLUMNS))
+            if self.transform is not None:
+                X = self.transform(X)
+            self._data = (X, labels)
+            self._key = index
+        return self._data
+
+
+class RowGroupSequence(lgb.Sequence):
+    """
+    One row group as an lgb.Sequence. LightGBM samples rows for its bin
+    boundaries in order, then pushes every group in batches, so the shared
+    one-slot cache reads each row group about twice in total.
+    """
+
+    batch_size = 65536
+
+    def __init__(self, row_groups, index, length):
+        self.row_groups = row_groups
+        self.index = index
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        X = self.row_groups.read(self.index)[0]
+        if isinstance(idx, list):
+            idx = np.asarray(idx)
+        return X[idx]
+
+
+def train_out_of_core(source, bundle_dir=BUNDLE_DIR, svm_member="nystroem", svm_components=500,
+                      sample_rows=SAMPLE_ROWS, num_boost_round=NUM_BOOST_ROUND, k=15,
+                      holdout_rows=HOLDOUT_ROWS):
+    log = StageLog()
+    rng = np.random.default_rng(42)
+
+    with log.stage("scan"):
+        row_groups = _RowGroups(parquet_parts(source))
+        keep_p = min(1.0, sample_rows / max(row_groups.total_rows, 1))
+        holdout_p = min(HOLDOUT_MAX_FRACTION, holdout_rows / max(row_groups.total_rows, 1))
+        scaler = StandardScaler()
+        counts = Counter()
+        lengths, group_labels, group_holdout, sample_X, sample_y = [], [], [], [], []
+        holdout_X, holdout_y = [], []
+        for index in range(len(row_groups.groups)):
+            X, labels = row_groups.read(index)
+            lengths.append(len(X))
+            group_labels.append(labels)
+            held = rng.random(len(X)) < holdout_p
+            group_holdout.append(held)
+            if not len(X):
+                continue
+            scaler.partial_fit(X)
+            holdout_X.append(X[held].astype(np.float32))
+            holdout_y.append(labels[held])
+            # Uniform sample, topped up with rare classes until they reach
+            # MIN_SAMPLE_PER_CLASS; held-out rows are never trained on
+            keep = (rng.random(len(X)) < keep_p) & ~held
+            for label in np.unique(labels):
+                rows = np.flatnonzero((labels == label) & ~held)
+                room = MIN_SAMPLE_PER_CLASS - counts[label]
+                if room > 0:
+                    keep[rows[:room]] = True
+                counts[label] += len(rows)
+            sample_X.append(X[keep].astype(np.float32))
+            sample_y.append(labels[keep])
+        sample_X = np.concatenate(sample_X).astype(np.float64)
+        sample_y = np.concatenate(sample_y)
+        holdout_X = np.concatenate(holdout_X).astype(np.float64)
+        holdout_y = np.concatenate(holdout_y)
+        print(f"📊 {sum(lengths):,} clean rows in {len(lengths)} row groups, "
+              f"sample {len(sample_X):,} rows, held out {len(holdout_X):,}, {len(counts)} classes")
+
+    with log.stage("select"):
+        rf_selector = RandomForestClassifier(n_estimators=50, random_state=42, n_jobs=-1)
+        rf_selector.fit(sample_X, sample_y)
+        corr_matrix = np.corrcoef(sample_X, rowvar=False)
+        selected_indices = apply_quantum_feature_selection(sample_X, rf_selector.feature_importances_,
+                                                           corr_matrix, k=k)
+        if not selected_indices:
+            selected_indices = list(range(sample_X.shape[1]))
+        selected_indices = [int(i) for i in selected_indices]
+        # Like analysis.py: scale all 17 features, then select
+        X_sample = scaler.transform(sample_X)[:, selected_indices]
+        del rf_selector, sample_X
+        print(f"✅ Selected {len(selected_indices)} features; scaler fit on all {int(scaler.n_samples_seen_):,} rows")
+
+    with log.stage("isoforest"):
+        iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42, n_jobs=-1)
+        iso_forest.fit(X_sample)
+
+    # Label order of first appearance, as y.unique() in the in-memory path
+    label_map = {}
+    for labels in group_labels:
+        uniques, first = np.unique(labels, return_index=True)
+        for label in uniques[np.argsort(first)].tolist():
+            label_map.setdefault(label, len(label_map))
+
+    with log.stage("dataset"):
+        y = np.concatenate([_encode(labels, label_map) for labels in group_labels])
+        weight = np.concatenate([(~held).astype(np.float32) for held in group_holdout])
+        del group_labels, group_holdout
+        scaled_groups = _RowGroups(row_groups.files, lambda X: scaler.transform(X)[:, selected_indices])
+        sequences = [RowGroupSequence(scaled_groups, index, length)
+                     for index, length in enumerate(lengths) if length]
+        params = dict(LGB_PARAMS, num_class=len(label_map))
+        train_set = lgb.Dataset(sequences, label=y, weight=weight, params=params, free_raw_data=True)
+        train_set.construct()
+        print(f"✅ LightGBM Dataset: {train_set.num_data():,} rows x {train_set.num_feature()} features (binned)")
+
+    with log.stage("lightgbm"):
+        booster = lgb.train(params, train_set, num_boost_round=num_boost_round)
+        lgb_member = BoosterClassifier(booster, classes=list(range(len(label_map))))
+        del train_set
+
+    with log.stage("svm"):
+        # The exact RBF SVC cannot train on the corpus; use the approximate kernel
+        svm_kind = "nystroem" if svm_member == "rbf" else svm_member
+        y_sample = _encode(sample_y, label_map)
+        svm_classifier = make_svm_member(svm_kind, n_components=svm_components)
+        svm_classifier.fit(X_sample, y_sample)
+        print(f"✅ SVM member: {svm_kind} on {len(X_sample):,} sampled rows")
+
+    with log.stage("thresholds"):
+        ensemble_classifier = SoftVotingEnsemble({'lgb': lgb_member, 'svm': svm_classifier}, [2, 1],
+                                                 classes=lgb_member.classes_)
+        optimal_thresholds = {}
+        if len(holdout_X):
+            y_proba = ensemble_classifier.predict_proba(scaler.transform(holdout_X)[:, selected_indices])
+            optimal_thresholds = tune_thresholds(_encode(holdout_y, label_map), y_proba)
+        categories = list(label_map)
+        print(f"📊 Optimal thresholds per class ({len(holdout_X):,} held-out rows):")
+        for idx, threshold in optimal_thresholds.items():
+            print(f"   {categories[idx]}: {threshold:.2f}")
+
+    with log.stage("save"):
+        components = {
+            'iso_model': iso_forest,
+            'classifier': ensemble_classifier,
+            'scaler': scaler,
+            'label_map': label_map,
+            'optimal_thresholds': optimal_thresholds,
+            'selected_features_idx': selected_indices,
+        }
+        training = {
+            'trainer': "train_model --out-of-core",
+            'dataset': os.path.basename(os.path.normpath(source)),
+            'rows': int(sum(lengths)),
+            'sample_rows': int(len(X_sample)),
+            'holdout_rows': int(len(holdout_X)),
+            'svm_member': svm_kind,
+            'num_boost_round': num_boost_round,
+        }
+        # Stage timings go into the manifest; the save stage itself is not included
+        manifest = save_bundle(components, ALL_FEATURE_COLUMNS, bundle_dir,
+                               training=dict(training, stages=list(log.stages)))
+        print(f"✅ Published model bundle {manifest['version']}: {bundle_dir}")
+
+    log.summary()
+    return manifest
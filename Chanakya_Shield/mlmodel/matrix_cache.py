@@ -0,0 +1,140 @@
+"""
+Stage-keyed cache of preprocessed training matrices: .npy files written once
+and memory-mapped on later runs (``python matrix_cache.py`` lists entries).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from dataset_cache import CACHE_DIR, dataset_hash
+
+MATRIX_CACHE_DIR = os.path.join(CACHE_DIR, "matrices")
+MATRIX_FORMAT = 1
+META_FILE = "meta.json"
+OBJECTS_FILE = "objects.pkl"
+
+
+def _is_matrix(value):
+    return isinstance(value, np.ndarray) and value.dtype.kind in "biufc"
+
+
+class MatrixCache:
+    """Stage outputs of one dataset, chained in the order the stages run."""
+
+    def __init__(self, source, cache_dir=MATRIX_CACHE_DIR, enabled=True):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.enabled = enabled
+        self.dataset = dataset_hash(source) if enabled else None
+        self.report = []
+        self._upstream = None
+
+    def _key(self, name, params):
+        blob = json.dumps({'format': MATRIX_FORMAT, 'dataset': self.dataset, 'upstream': self._upstream,
+                           'stage': name, 'params': params}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _load(self, path):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        result = {}
+        if os.path.exists(os.path.join(path, OBJECTS_FILE)):
+            result.update(joblib.load(os.path.join(path, OBJECTS_FILE)))
+        for name in meta['arrays']:
+            result[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        return meta, result
+
+    def _save(self, path, name, params, seconds, result):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{name}-", dir=self.cache_dir)
+        try:
+            arrays = [k for k, v in result.items() if _is_matrix(v)]
+            for k in arrays:
+                np.save(os.path.join(staging, f"{k}.npy"), result[k])
+            objects = {k: v for k, v in result.items() if k not in arrays}
+            if objects:
+                joblib.dump(objects, os.path.join(staging, OBJECTS_FILE))
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump({'stage': name, 'params': params, 'seconds': seconds,
+                           'created': time.time(), 'arrays': arrays}, f, indent=2, default=str)
+            os.rename(staging, path)
+        except OSError:
+            # Another run stored the same stage first, or the disk is full;
+            # either way this run already has its result
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def stage(self, name, params, compute):
+        """
+        Output of stage ``name``: loaded (memory-mapped) from the cache, or
+        ``compute()`` - a dict of arrays and objects - run and stored.
+        """
+        start = time.perf_counter()
+        if not self.enabled:
+            result = compute()
+            self.report.append({'stage': name, 'status': "off", 'seconds': time.perf_counter() - start,
+                                'saved': 0.0})
+            return result
+
+        key = self._key(name, params)
+        self._upstream = key
+        path = os.path.join(self.cache_dir, f"{name}-{key[:16]}")
+        if os.path.exists(os.path.join(path, META_FILE)):
+            try:
+                meta, result = self._load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️  {name}: unreadable cache entry ({e}); recomputing")
+                shutil.rmtree(path, ignore_errors=True)
+                return self._compute(name, params, compute, path, start)
+            seconds = time.perf_counter() - start
+            saved = max(meta['seconds'] - seconds, 0.0)
+            print(f"♻️  {name}: cache hit in {seconds:.2f}s (saved {saved:.1f}s)")
+            self.report.append({'stage': name, 'status': "hit", 'seconds': seconds, 'saved': saved})
+            return result
+        return self._compute(name, params, compute, path, start)
+
+    def _compute(self, name, params, compute, path, start):
+        result = compute()
+        seconds = time.perf_counter() - start
+        self._save(path, name, params, seconds, result)
+        print(f"🧮 {name}: cache miss, computed in {seconds:.1f}s")
+        self.report.append({'stage': name, 'status': "miss", 'seconds': seconds, 'saved': 0.0})
+        return result
+
+    def summary(self):
+        if not self.report:
+            return
+        print(f"\n{'stage':<12}{'cache':>8}{'seconds':>10}{'saved s':>10}")
+        for entry in self.report:
+            print(f"{entry['stage']:<12}{entry['status']:>8}{entry['seconds']:>10.2f}{entry['saved']:>10.1f}")
+        hits = sum(entry['status'] == "hit" for entry in self.report)
+        print(f"⏱️  {hits}/{len(self.report)} stages from cache, "
+              f"{sum(entry['saved'] for entry in self.report):.1f}s saved")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or clear the preprocessed-matrix cache")
+    parser.add_argument("--cache-dir", default=MATRIX_CACHE_DIR)
+    parser.add_argument("--clear", action="store_true", help="Delete every cached stage")
+    args = parser.parse_args()
+
+    entries = sorted(e for e in os.listdir(args.cache_dir) if not e.startswith(".")) \
+        if os.path.isdir(args.cache_dir) else []
+    total = 0
+    for entry in entries:
+        path = os.path.join(args.cache_dir, entry)
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        total += size
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        print(f"{entry:<32}{size / 1e6:>10.1f} MB{meta['seconds']:>10.1f}s to compute")
+    print(f"📦 {len(entries)} cached stages, {total / 1e6:.1f} MB in {args.cache_dir}")
+    if args.clear and entries:
+        shutil.rmtree(args.cache_dir)
+        print("🗑️  Cleared")
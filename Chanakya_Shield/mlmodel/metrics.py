@@ -0,0 +1,162 @@
+"""Minimal Prometheus-style metrics registry and /metrics endpoint for the live sniffer."""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds: 10 µs .. 10 s
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Gauge:
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        yield name, labels, self.fn() if self.fn is not None else self.value
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            yield f"{name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, count
+
+
+class Registry:
+    """Metric families by name; each family holds one metric per label set."""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.setdefault(name, {'type': kind, 'help': help_text, 'metrics': {}})
+            if family['type'] != kind:
+                raise ValueError(f"Metric {name} already registered as a {family['type']}")
+            metric = family['metrics'].get(key)
+            if metric is None:
+                metric = family['metrics'][key] = factory()
+            return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self._get("counter", name, help_text, labels, Counter)
+
+    def gauge(self, name, help_text, labels=None, fn=None):
+        """A gauge; with ``fn`` its value is read from the callback at scrape time."""
+        return self._get("gauge", name, help_text, labels, lambda: Gauge(fn))
+
+    def callback_counter(self, name, help_text, fn, labels=None):
+        """A counter whose value is owned elsewhere and read from ``fn``."""
+        return self._get("counter", name, help_text, labels, lambda: Gauge(fn))
+
+    def histogram(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS):
+        return self._get("histogram", name, help_text, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            families = [(name, dict(f, metrics=dict(f['metrics']))) for name, f in self._families.items()]
+        for name, family in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, metric in family['metrics'].items():
+                try:
+                    for sample, labels, value in metric.samples(name, dict(key)):
+                        lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+                except Exception as e:
+                    lines.append(f"# {name}{_format_labels(dict(key))} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port=9108, host="127.0.0.1", registry=REGISTRY):
+    """Serve ``registry`` on http://host:port/metrics from a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
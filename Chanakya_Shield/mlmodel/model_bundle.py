@@ -0,0 +1,388 @@
+"""
+Versioned, memory-mappable model bundle: one directory per training run,
+published by an atomic CURRENT pointer and hot-reloaded by BundleWatcher.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = os.path.join(BASE_DIR, "model_bundle")
+MODELS_FILE = "models.joblib"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+FORMAT_VERSION = 1
+# Versions kept on disk: the live one and the one before it, so a reader
+# that resolved CURRENT just before a publish can still open its files
+KEEP_VERSIONS = 2
+
+COMPONENTS = ("iso_model", "classifier", "scaler", "label_map",
+              "optimal_thresholds", "selected_features_idx")
+# Per-component pickles read by analysis.py without a bundle and by replay_from_csv.py
+LEGACY_FILES = {
+    'iso_model': "anomaly_model.pkl",
+    'classifier': "attack_classifier.pkl",
+    'scaler': "scaler.pkl",
+    'label_map': "attack_labels.pkl",
+    'optimal_thresholds': "optimal_thresholds.pkl",
+    'selected_features_idx': "selected_features_idx.pkl",
+}
+
+
+class BundleError(ValueError):
+    """The bundle is missing, corrupt or internally inconsistent."""
+
+
+def _sha256(path, chunk=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _library_versions():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'joblib': joblib.__version__}
+    for module in ("sklearn", "lightgbm"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+def feature_schema(all_features, selected_idx, label_map):
+    selected_idx = [int(i) for i in selected_idx] if selected_idx is not None else None
+    return {
+        'all_features': list(all_features),
+        'selected_idx': selected_idx,
+        'selected_features': ([all_features[i] for i in selected_idx]
+                              if selected_idx is not None else list(all_features)),
+        'classes': [name for name, _ in sorted(label_map.items(), key=lambda item: item[1])],
+    }
+
+
+def validate(components, schema):
+    """Raise BundleError if the components disagree with each other or the schema."""
+    n_all = len(schema['all_features'])
+    n_selected = len(schema['selected_features'])
+    scaler, iso_model, classifier = components['scaler'], components['iso_model'], components['classifier']
+
+    if getattr(scaler, "n_features_in_", n_all) != n_all:
+        raise BundleError(f"Scaler expects {scaler.n_features_in_} features, schema has {n_all}")
+    for name, model in (("IsolationForest", iso_model), ("classifier", classifier)):
+        n_in = getattr(model, "n_features_in_", n_selected)
+        if n_in != n_selected:
+            raise BundleError(f"{name} expects {n_in} features, schema selects {n_selected}")
+    if schema['selected_idx'] is not None and any(not 0 <= i < n_all for i in schema['selected_idx']):
+        raise BundleError("Selected feature index out of range")
+    n_classes = len(getattr(classifier, "classes_", schema['classes']))
+    if n_classes != len(schema['classes']):
+        raise BundleError(f"Classifier has {n_classes} classes, label map has {len(schema['classes'])}")
+
+
+def _version_dirs(path):
+    """Version directory names under ``path``, oldest first."""
+    try:
+        entries = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    return sorted(e for e in entries
+                  if not e.startswith(".") and os.path.isfile(os.path.join(path, e, MANIFEST_FILE)))
+
+
+def _version_name(path, created):
+    """Unused version name under ``path``; names sort by creation time."""
+    version = created.strftime("%Y%m%d-%H%M%S-%f")
+    for n in range(1000):
+        name = version if n == 0 else f"{version}-{n}"
+        if not os.path.exists(os.path.join(path, name)):
+            return name
+    raise BundleError(f"No free version name for {version} in {path}")
+
+
+def _publish(path, name, attempts=10):
+    """Point CURRENT at version ``name``; os.replace makes the switch atomic."""
+    fd, tmp = tempfile.mkstemp(prefix=f".{CURRENT_FILE}-", dir=path)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(name + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(attempts):
+            try:
+                os.replace(tmp, os.path.join(path, CURRENT_FILE))
+                return
+            except PermissionError:
+                # Windows refuses while a reader has CURRENT open; readers hold it only briefly
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05)
+    except Exception:
+        os.remove(tmp)
+        raise
+
+
+def _current_version(path):
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def bundle_path(path=BUNDLE_DIR):
+    """Directory holding the live bundle's files: the version CURRENT names, else ``path`` itself."""
+    name = _current_version(path)
+    if name is not None:
+        return os.path.join(path, name)
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    raise BundleError(f"No model bundle at {path}")
+
+
+def collect_garbage(path=BUNDLE_DIR, keep=KEEP_VERSIONS):
+    """
+    Delete all but the newest ``keep`` versions (the live one always stays),
+    the flat-layout files of a migrated bundle and leftovers of the old
+    rename-based publish. Returns ``(removed, leftovers)``; a leftover is
+    ``(name, error)`` for anything that could not be deleted yet, typically
+    a version a running detector still has mapped on Windows.
+    """
+    current = _current_version(path)
+    if current is None:
+        return [], []
+    older = [name for name in _version_dirs(path) if name != current]
+    stale = [os.path.join(path, name) for name in older[:max(len(older) - (keep - 1), 0)]]
+    stale += [os.path.join(path, name) for name in (MODELS_FILE, MANIFEST_FILE)
+              if os.path.isfile(os.path.join(path, name))]
+    parent, base = os.path.split(os.path.abspath(path))
+    stale += [os.path.join(parent, e) for e in os.listdir(parent)
+              if e.startswith(f"{base}.old-") or e.startswith(".bundle-")]
+
+    removed, leftovers = [], []
+    for target in stale:
+        try:
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            else:
+                os.remove(target)
+        except OSError as e:
+            leftovers.append((os.path.basename(target), e))
+        else:
+            removed.append(os.path.basename(target))
+    return removed, leftovers
+
+
+def save_bundle(components, all_features, out_dir=BUNDLE_DIR, training=None):
+    """
+    Validate and write ``components`` (a dict with the COMPONENTS keys) as a
+    new version under ``out_dir``, publish it and collect old versions.
+    Returns the manifest.
+    """
+    missing = [name for name in COMPONENTS if name not in components]
+    if missing:
+        raise BundleError(f"Missing components: {missing}")
+    schema = feature_schema(all_features, components['selected_features_idx'], components['label_map'])
+    validate(components, schema)
+
+    os.makedirs(out_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=out_dir)
+    try:
+        models_path = os.path.join(staging, MODELS_FILE)
+        joblib.dump({name: components[name] for name in COMPONENTS}, models_path, compress=0)
+
+        created = datetime.datetime.now()
+        version = _version_name(out_dir, created)
+        manifest = {
+            'format': FORMAT_VERSION,
+            'version': version,
+            'created': created.isoformat(timespec="microseconds"),
+            'libraries': _library_versions(),
+            'schema': schema,
+            'training': training or {},
+            'files': {MODELS_FILE: {'sha256': _sha256(models_path),
+                                    'bytes': os.path.getsize(models_path)}},
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        # Fails rather than merging if another run took the same name meanwhile
+        os.rename(staging, os.path.join(out_dir, version))
+    except Exception:
+        # Never published, so nothing has it mapped
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _publish(out_dir, version)
+
+    _, leftovers = collect_garbage(out_dir)
+    for name, e in leftovers:
+        print(f"⚠️  Old model bundle {name} not removed yet ({e}); retried on the next publish")
+    return manifest
+
+
+def read_manifest(path=BUNDLE_DIR):
+    try:
+        with open(os.path.join(bundle_path(path), MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise BundleError(f"No model bundle at {path}")
+
+
+class ModelBundle:
+    """Loaded bundle: the components as attributes plus the manifest."""
+
+    def __init__(self, manifest, components):
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.schema = manifest['schema']
+        self.iso_model = components['iso_model']
+        self.classifier = components['classifier']
+        self.scaler = components['scaler']
+        self.label_map = components['label_map']
+        self.optimal_thresholds = components['optimal_thresholds']
+        self.selected_features_idx = components['selected_features_idx']
+
+
+def load_bundle(path=BUNDLE_DIR, mmap=True, verify=True):
+    """
+    Load a bundle; with ``mmap`` the NumPy arrays are memory-mapped.
+    ``verify`` checks the sha256 checksums before unpickling.
+
+    The mapping is copy-on-write rather than read-only: libsvm's predict
+    rejects read-only buffers, and as nothing writes to the arrays their
+    pages stay shared with the file cache.
+    """
+    path = bundle_path(path)
+    manifest = read_manifest(path)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')}")
+
+    models_path = os.path.join(path, MODELS_FILE)
+    if verify:
+        for name, info in manifest['files'].items():
+            file_path = os.path.join(path, name)
+            if not os.path.exists(file_path) or _sha256(file_path) != info['sha256']:
+                raise BundleError(f"Checksum mismatch for {name}")
+
+    components = joblib.load(models_path, mmap_mode="c" if mmap else None)
+    validate(components, manifest['schema'])
+    return ModelBundle(manifest, components)
+
+
+class BundleWatcher:
+    """
+    Calls ``on_change(bundle)`` from a daemon thread whenever a bundle with a
+    new version is published at ``path``. save_bundle() switches CURRENT
+    only once the version directory is complete, so a changed CURRENT means
+    a complete new bundle. Bundles that fail to load are passed to
+    ``on_error(exc)`` and skipped until CURRENT changes again. After a swap
+    the watcher retries collecting old versions, which on Windows can only
+    be deleted once no process has them mapped.
+    """
+
+    def __init__(self, path, on_change, current_version=None, interval=5.0, on_error=None, mmap=True):
+        self.path = path
+        self.on_change = on_change
+        self.on_error = on_error
+        self.version = current_version
+        self.interval = interval
+        self.mmap = mmap
+        self._seen = self._signature()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        try:
+            path = bundle_path(self.path)
+            st = os.stat(os.path.join(path, MANIFEST_FILE))
+        except (OSError, BundleError):
+            return None
+        return path, st.st_ino, st.st_mtime_ns, st.st_size
+
+    def check(self):
+        """Load and hand over the bundle if it changed; returns True on a swap."""
+        signature = self._signature()
+        if signature is None or signature == self._seen:
+            return False
+        self._seen = signature
+        try:
+            if read_manifest(self.path).get('version') == self.version:
+                return False
+            bundle = load_bundle(self.path, mmap=self.mmap)
+            self.on_change(bundle)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            return False
+        self.version = bundle.version
+        try:
+            collect_garbage(self.path)
+        except OSError:
+            pass
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="bundle-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def bundle_from_pickles(base_dir=BASE_DIR, out_dir=BUNDLE_DIR):
+    """Build a bundle from the legacy per-component pickles."""
+    from flow_table import ALL_FEATURE_COLUMNS
+
+    components = {name: joblib.load(os.path.join(base_dir, file)) for name, file in LEGACY_FILES.items()}
+    return save_bundle(components, ALL_FEATURE_COLUMNS, out_dir, training={'source': 'legacy pickles'})
+
+
+def write_legacy_pickles(components, base_dir=BASE_DIR):
+    """Write the per-component pickles from the same objects as a bundle; returns their paths."""
+    paths = []
+    for name, file in LEGACY_FILES.items():
+        paths.append(os.path.join(base_dir, file))
+        joblib.dump(components[name], paths[-1])
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model bundle tools")
+    parser.add_argument("--from-pickles", action="store_true", help="Bundle the legacy *.pkl files")
+    parser.add_argument("--gc", action="store_true", help="Delete old versions no process has mapped")
+    parser.add_argument("--path", default=BUNDLE_DIR)
+    args = parser.parse_args()
+
+    if args.gc:
+        removed, leftovers = collect_garbage(args.path)
+        for name in removed:
+            print(f"🗑️  Removed {name}")
+        for name, e in leftovers:
+            print(f"⚠️  {name} still in use: {e}")
+    if args.from_pickles:
+        manifest = bundle_from_pickles(out_dir=args.path)
+        print(f"✅ Bundle {manifest['version']} written to {args.path}")
+    bundle = load_bundle(args.path)
+    print(f"📦 Bundle {bundle.version}: {len(bundle.schema['selected_features'])}/"
+          f"{len(bundle.schema['all_features'])} features, classes {bundle.schema['classes']}")
+    for name, info in bundle.manifest['files'].items():
+        print(f"   {name}: {info['bytes'] / 1e6:.1f} MB sha256 {info['sha256'][:16]}…")
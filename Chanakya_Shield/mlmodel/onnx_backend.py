@@ -0,0 +1,241 @@
+"""
+ONNX export and onnxruntime inference for the scoring pipeline
+(onnx, onnxruntime, skl2onnx and onnxmltools are only needed for this backend).
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ONNX_DIR = os.path.join(BASE_DIR, "onnx")
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 2   # Per-version graph directories kept: the active model and the one before
+TARGET_OPSET = 15
+ML_OPSET = 3
+IR_VERSION = 8   # loadable by onnxruntime >= 1.10
+
+
+# =========================================================
+# Export
+# =========================================================
+def build_preprocess_graph(scaler, selected_idx=None):
+    """(X - mean) / scale, then optional column selection, as one float32 graph."""
+    from onnx import TensorProto, helper, numpy_helper
+
+    n_features = int(scaler.n_features_in_)
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    initializers = [
+        numpy_helper.from_array(mean.astype(np.float32), "mean"),
+        numpy_helper.from_array(scale.astype(np.float32), "scale"),
+    ]
+    nodes = [
+        helper.make_node("Sub", ["X", "mean"], ["centered"]),
+        helper.make_node("Div", ["centered", "scale"], ["scaled"]),
+    ]
+    n_out = n_features
+    if selected_idx is not None:
+        initializers.append(numpy_helper.from_array(np.asarray(selected_idx, dtype=np.int64), "selected"))
+        nodes.append(helper.make_node("Gather", ["scaled", "selected"], ["Y"], axis=1))
+        n_out = len(selected_idx)
+    else:
+        nodes.append(helper.make_node("Identity", ["scaled"], ["Y"]))
+
+    graph = helper.make_graph(
+        nodes, "preprocess",
+        [helper.make_tensor_value_info("X", TensorProto.FLOAT, [None, n_features])],
+        [helper.make_tensor_value_info("Y", TensorProto.FLOAT, [None, n_out])],
+        initializers,
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", TARGET_OPSET)],
+                             ir_version=IR_VERSION)
+
+
+def _convert_sklearn(model, n_features, options=None):
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    return convert_sklearn(
+        model,
+        initial_types=[("X", FloatTensorType([None, n_features]))],
+        options=options,
+        target_opset={"": TARGET_OPSET, "ai.onnx.ml": ML_OPSET},
+    )
+
+
+def _convert_member(name, model, n_features):
+    """ONNX graph for one ensemble member, or None if it has no converter."""
+    from sklearn.svm import SVC
+
+    if name == "lgb":
+        from onnxmltools import convert_lightgbm
+        from onnxmltools.convert.common.data_types import FloatTensorType
+
+        return convert_lightgbm(
+            model,
+            initial_types=[("X", FloatTensorType([None, n_features]))],
+            zipmap=False,
+            target_opset=TARGET_OPSET,
+        )
+    if isinstance(model, SVC):
+        return _convert_sklearn(model, n_features, {id(model): {"zipmap": False}})
+    return None
+
+
+def export_models(iso_model, ensemble, scaler, selected_idx=None, out_dir=ONNX_DIR, model_version=None):
+    """Write the graphs and manifest to ``out_dir``; returns the manifest."""
+    import onnx
+
+    os.makedirs(out_dir, exist_ok=True)
+    n_selected = len(selected_idx) if selected_idx is not None else int(scaler.n_features_in_)
+
+    onnx.save(build_preprocess_graph(scaler, selected_idx), os.path.join(out_dir, "preprocess.onnx"))
+    onnx.save(_convert_sklearn(iso_model, n_selected), os.path.join(out_dir, "iso.onnx"))
+
+    names = [name for name, _ in ensemble.estimators]
+    exported = []
+    for name, member in ensemble.named_estimators_.items():
+        graph = _convert_member(name, member, n_selected)
+        if graph is None:
+            print(f"⚠️  No ONNX converter for member '{name}' ({type(member).__name__}); it stays on joblib")
+            continue
+        onnx.save(graph, os.path.join(out_dir, f"{name}.onnx"))
+        exported.append(name)
+
+    manifest = {
+        "n_features": int(scaler.n_features_in_),
+        "n_selected": n_selected,
+        "n_classes": len(ensemble.classes_),
+        "members": names,
+        "weights": list(ensemble.weights) if ensemble.weights is not None else [1] * len(names),
+        "exported": exported,
+        "model_version": model_version,
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# =========================================================
+# Runtime
+# =========================================================
+def _session(path, threads=0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.log_severity_level = 3  # IsolationForest graph declares a fixed label shape
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class _OnnxModel:
+    def __init__(self, path, threads=0):
+        self.session = _session(path, threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def _run(self, X):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(X, dtype=np.float32)})
+
+
+class OnnxPreprocessor(_OnnxModel):
+    """Scaler + feature selection in one call."""
+
+    def transform(self, X):
+        return self._run(X)[0]
+
+
+class OnnxIsolationForest(_OnnxModel):
+    def predict(self, X):
+        return self._run(X)[0].ravel()
+
+    def decision_function(self, X):
+        return self._run(X)[1].ravel()
+
+
+class OnnxClassifier(_OnnxModel):
+    def predict_proba(self, X):
+        outputs = self._run(X)
+        # Converters emit (label, probabilities)
+        return np.asarray(outputs[-1], dtype=np.float64)
+
+
+class OnnxEnsemble:
+    """Soft-voting ensemble over ONNX (or joblib fallback) members."""
+
+    def __init__(self, members, weights):
+        self.estimators = [(name, member) for name, member in members.items()]
+        self.named_estimators_ = dict(members)
+        self.weights = list(weights)
+
+    def predict_proba(self, X):
+        total = None
+        for (_, member), weight in zip(self.estimators, self.weights):
+            proba = weight * member.predict_proba(X)
+            total = proba if total is None else total + proba
+        return total / sum(self.weights)
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+
+def load_onnx_models(joblib_ensemble=None, model_dir=ONNX_DIR, threads=0, model_version=None):
+    """
+    (preprocessor, iso_model, ensemble) backed by onnxruntime. Members that
+    were not exported are taken from ``joblib_ensemble``. With
+    ``model_version``, graphs exported from a different bundle are refused.
+    """
+    with open(os.path.join(model_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    exported_from = manifest.get("model_version")
+    if model_version and exported_from and exported_from != model_version:
+        raise RuntimeError(f"ONNX graphs were exported from model {exported_from}, not {model_version}")
+
+    members = {}
+    for name in manifest["members"]:
+        if name in manifest["exported"]:
+            members[name] = OnnxClassifier(os.path.join(model_dir, f"{name}.onnx"), threads)
+        elif joblib_ensemble is not None:
+            members[name] = joblib_ensemble.named_estimators_[name]
+        else:
+            raise FileNotFoundError(f"Member '{name}' was not exported and no joblib ensemble was given")
+
+    return (
+        OnnxPreprocessor(os.path.join(model_dir, "preprocess.onnx"), threads),
+        OnnxIsolationForest(os.path.join(model_dir, "iso.onnx"), threads),
+        OnnxEnsemble(members, manifest["weights"]),
+    )
+
+
+def _prune_versions(onnx_dir, keep=KEEP_VERSIONS):
+    versions = sorted(entry for entry in os.listdir(onnx_dir)
+                      if os.path.isfile(os.path.join(onnx_dir, entry, MANIFEST)))
+    for entry in versions[:-keep]:
+        try:
+            shutil.rmtree(os.path.join(onnx_dir, entry))
+        except OSError as e:
+            print(f"⚠️  Old ONNX graphs {entry} not removed: {e}")
+
+
+def load_or_export_models(iso_model, ensemble, scaler, selected_idx=None, model_version=None,
+                          onnx_dir=ONNX_DIR, threads=0):
+    """
+    load_onnx_models() for ``model_version``: the graphs export_onnx.py wrote
+    to ``onnx_dir`` if they come from that model, else ``onnx_dir/<version>``,
+    exported first when missing.
+    """
+    try:
+        return load_onnx_models(ensemble, onnx_dir, threads, model_version)
+    except (OSError, RuntimeError):
+        if not model_version:
+            raise
+    version_dir = os.path.join(onnx_dir, model_version)
+    if not os.path.exists(os.path.join(version_dir, MANIFEST)):
+        # The manifest is written last, so its presence marks a complete export
+        export_models(iso_model, ensemble, scaler, selected_idx, version_dir, model_version)
+        _prune_versions(onnx_dir)
+    return load_onnx_models(ensemble, version_dir, threads, model_version)
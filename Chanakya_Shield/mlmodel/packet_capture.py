@@ -0,0 +1,163 @@
+"""Batched raw-frame capture (live interface or pcap files) for packet_parser.py."""
+
+import socket
+import time
+
+import numpy as np
+
+from packet_parser import ETH_P_IP, LINKTYPE_ETHERNET, LINKTYPE_RAW, SNAP_BYTES, parse_headers
+
+# Link header the cooked socket strips, added back so ``lengths`` are frame
+# lengths as scapy reports them (keyed by ARPHRD_* hardware type)
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+LINK_HEADER_BYTES = {ARPHRD_ETHER: 14, ARPHRD_LOOPBACK: 14}
+RECV_BUFFER = 8 * 1024 * 1024
+BATCH_FRAMES = 256
+POLL_TIMEOUT = 0.1
+
+
+class FrameBatch:
+    """
+    Preallocated batch of frame headers. read_batch() fills ``buffer``/
+    ``lengths``/``captured``/``timestamps`` and returns the frame count.
+    """
+
+    def __init__(self, batch_frames=BATCH_FRAMES):
+        self.linktype = LINKTYPE_ETHERNET
+        self.batch_frames = batch_frames
+        self.buffer = np.zeros((batch_frames, SNAP_BYTES), dtype=np.uint8)
+        self.lengths = np.zeros(batch_frames, dtype=np.int64)
+        self.captured = np.zeros(batch_frames, dtype=np.int64)
+        self.timestamps = np.zeros(batch_frames, dtype=np.float64)
+        self.frames = 0
+
+    def parse(self, n):
+        """Parse the first ``n`` frames of the last batch."""
+        return parse_headers(self.buffer[:n], self.lengths[:n], self.linktype, self.captured[:n])
+
+    def _store(self, n, data, wirelen, ts):
+        size = min(len(data), SNAP_BYTES)
+        self.buffer[n, :size] = np.frombuffer(data, dtype=np.uint8, count=size)
+        self.lengths[n] = wirelen
+        self.captured[n] = size
+        self.timestamps[n] = ts
+
+
+class RawCapture(FrameBatch):
+    """Live capture from an interface (all interfaces if ``iface`` is None)."""
+
+    def __init__(self, iface=None, batch_frames=BATCH_FRAMES, timeout=POLL_TIMEOUT):
+        super().__init__(batch_frames)
+        self.timeout = timeout
+        self._rows = [memoryview(row) for row in self.buffer]
+
+        if hasattr(socket, "AF_PACKET"):
+            self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(ETH_P_IP))
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+            if iface:
+                self._sock.bind((iface, ETH_P_IP))
+            self.linktype = LINKTYPE_RAW
+            self._l2 = None
+        else:
+            from scapy.all import conf
+            self._sock = None
+            self._l2 = conf.L2listen(iface=iface)
+
+    def read_batch(self):
+        """Wait up to ``timeout`` for the first frame, then drain what is queued."""
+        if self._l2 is not None:
+            return self._read_scapy()
+
+        # Rows are not zeroed: the parser never trusts bytes beyond ``captured``
+        sock = self._sock
+        n = 0
+        sock.settimeout(self.timeout)
+        try:
+            while n < self.batch_frames:
+                length, address = sock.recvfrom_into(self._rows[n], SNAP_BYTES, socket.MSG_TRUNC)
+                self.lengths[n] = length + LINK_HEADER_BYTES.get(address[3], 0)
+                self.captured[n] = min(length, SNAP_BYTES)
+                self.timestamps[n] = time.time()
+                n += 1
+                if n == 1:
+                    sock.setblocking(False)
+        except (socket.timeout, BlockingIOError):
+            pass
+        self.frames += n
+        return n
+
+    def _read_scapy(self):
+        n = 0
+        deadline = time.monotonic() + self.timeout
+        while n < self.batch_frames and time.monotonic() < deadline:
+            _, data, ts = self._l2.recv_raw()
+            if data is None:
+                continue
+            self._store(n, data, len(data), ts or time.time())
+            n += 1
+        self.frames += n
+        return n
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+        if self._l2 is not None:
+            self._l2.close()
+
+
+class PcapCapture(FrameBatch):
+    """
+    Streams pcap/pcapng files in order. read_batch() returns 0 once every
+    file is exhausted (``done`` is then True). A batch never mixes link
+    types, so pcapng files with several interfaces parse correctly.
+    """
+
+    def __init__(self, paths, batch_frames=BATCH_FRAMES):
+        super().__init__(batch_frames)
+        self.paths = list(paths)
+        self.done = False
+        self.first_ts = None
+        self.last_ts = None
+        self._packets = self._iter_packets()
+        self._pending = None
+
+    def _iter_packets(self):
+        from scapy.utils import RawPcapReader
+
+        for path in self.paths:
+            with RawPcapReader(path) as reader:
+                divisor = 1e9 if getattr(reader, "nano", False) else 1e6
+                file_linktype = getattr(reader, "linktype", LINKTYPE_ETHERNET)
+                for data, meta in reader:
+                    if hasattr(meta, "sec"):
+                        yield file_linktype, data, meta.wirelen, meta.sec + meta.usec / divisor
+                    else:  # pcapng
+                        ts = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+                        yield meta.linktype, data, meta.wirelen, ts
+
+    def read_batch(self):
+        n = 0
+        while n < self.batch_frames:
+            record = self._pending or next(self._packets, None)
+            self._pending = None
+            if record is None:
+                self.done = True
+                break
+            linktype, data, wirelen, ts = record
+            if n and linktype != self.linktype:
+                self._pending = record
+                break
+            self.linktype = linktype
+            self._store(n, data, wirelen, ts)
+            n += 1
+
+        if n:
+            if self.first_ts is None:
+                self.first_ts = float(self.timestamps[0])
+            self.last_ts = float(self.timestamps[n - 1])
+        self.frames += n
+        return n
+
+    def close(self):
+        self._packets.close()
@@ -0,0 +1,132 @@
+"""Vectorized Ethernet/VLAN/IPv4/TCP/UDP header parser for batches of raw frames."""
+
+import numpy as np
+
+# pcap / DLT link-layer types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101            # bare IPv4/IPv6 packets
+LINKTYPE_LINUX_SLL = 113      # "any" interface cooked capture
+
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+MAX_VLAN_TAGS = 2
+
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+# Ethernet (14) + 2 VLAN tags (8) + max IPv4 header (60) + TCP up to flags (14)
+SNAP_BYTES = 96
+
+
+class ParsedBatch:
+    """Header fields of a batch of frames as parallel NumPy arrays."""
+
+    __slots__ = ("valid", "src", "dst", "proto", "length", "flags", "sport", "dport")
+
+    def __init__(self, valid, src, dst, proto, length, flags, sport, dport):
+        self.valid = valid        # bool: IPv4 frame with a complete header
+        self.src = src            # uint32 IPv4 addresses
+        self.dst = dst
+        self.proto = proto        # uint8 IP protocol
+        self.length = length      # int64 original frame length
+        self.flags = flags        # uint16 TCP flags incl. NS (0 for non-TCP)
+        self.sport = sport        # uint16 TCP/UDP ports (0 otherwise)
+        self.dport = dport
+
+    def __len__(self):
+        return len(self.valid)
+
+
+def _u16(buf, rows, offset):
+    return (buf[rows, offset].astype(np.uint16) << 8) | buf[rows, offset + 1]
+
+
+def _u32(buf, rows, offset):
+    return ((buf[rows, offset].astype(np.uint32) << 24)
+            | (buf[rows, offset + 1].astype(np.uint32) << 16)
+            | (buf[rows, offset + 2].astype(np.uint32) << 8)
+            | buf[rows, offset + 3])
+
+
+def parse_headers(buf, lengths, linktype=LINKTYPE_ETHERNET, captured=None):
+    """
+    Parse a batch held in ``buf`` (n x SNAP_BYTES uint8, one frame per row).
+    ``lengths`` are the original frame lengths and ``captured`` the number
+    of bytes actually present per row (defaults to min(length, SNAP_BYTES));
+    bytes past ``captured`` may be left over from an earlier frame and are
+    never used.
+    """
+    n = len(buf)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if captured is None:
+        captured = np.minimum(lengths, SNAP_BYTES)
+    rows = np.arange(n)
+
+    if linktype == LINKTYPE_ETHERNET:
+        l3 = np.full(n, 14, dtype=np.int64)
+        ethertype = np.where(captured >= 14, _u16(buf, rows, 12), 0)
+        for _ in range(MAX_VLAN_TAGS):
+            # A tag only counts if the ethertype behind it was captured
+            tagged = ((ethertype == ETH_P_8021Q) | (ethertype == ETH_P_8021AD)) & (captured >= l3 + 4)
+            if not tagged.any():
+                break
+            l3 += tagged * 4
+            ethertype = np.where(tagged, _u16(buf, rows, l3 - 2), ethertype)
+        valid = ethertype == ETH_P_IP
+    elif linktype == LINKTYPE_LINUX_SLL:
+        l3 = np.full(n, 16, dtype=np.int64)
+        valid = (captured >= 16) & (_u16(buf, rows, 14) == ETH_P_IP)
+    elif linktype == LINKTYPE_RAW:
+        l3 = np.zeros(n, dtype=np.int64)
+        valid = np.ones(n, dtype=bool)
+    else:
+        raise ValueError(f"Unsupported link type {linktype}")
+
+    # IPv4 header
+    version_ihl = buf[rows, l3]
+    ihl = (version_ihl & 0x0F).astype(np.int64) * 4
+    valid &= ((version_ihl >> 4) == 4) & (ihl >= 20) & (captured >= l3 + 20)
+
+    proto = buf[rows, l3 + 9]
+    first_fragment = (_u16(buf, rows, l3 + 6) & 0x1FFF) == 0
+    src = _u32(buf, rows, l3 + 12)
+    dst = _u32(buf, rows, l3 + 16)
+
+    # Transport header (TCP needs 14 bytes for the flags, UDP 4 for the ports)
+    l4 = l3 + ihl
+    tcp = valid & first_fragment & (proto == PROTO_TCP) & (captured >= l4 + 14)
+    udp = valid & first_fragment & (proto == PROTO_UDP) & (captured >= l4 + 4)
+    has_ports = tcp | udp
+    l4 = np.where(has_ports, l4, 0)   # keep indices inside the row
+
+    sport = np.where(has_ports, _u16(buf, rows, l4), 0).astype(np.uint16)
+    dport = np.where(has_ports, _u16(buf, rows, l4 + 2), 0).astype(np.uint16)
+    flags = np.where(
+        tcp, ((buf[rows, l4 + 12].astype(np.uint16) & 0x01) << 8) | buf[rows, l4 + 13], 0
+    ).astype(np.uint16)
+
+    return ParsedBatch(valid, src, dst, proto, lengths, flags, sport, dport)
+
+
+def pack_frames(frames):
+    """List of raw frames (bytes-like) -> (SNAP_BYTES matrix, lengths, captured)."""
+    n = len(frames)
+    lengths = np.fromiter(map(len, frames), dtype=np.int64, count=n)
+    joined = b"".join(bytes(f[:SNAP_BYTES]).ljust(SNAP_BYTES, b"\0") for f in frames)
+    buf = np.frombuffer(joined, dtype=np.uint8).reshape(n, SNAP_BYTES)
+    return buf, lengths, np.minimum(lengths, SNAP_BYTES)
+
+
+def parse_batch(frames, linktype=LINKTYPE_ETHERNET, wire_lengths=None):
+    """
+    Parse a list of raw frames. ``wire_lengths`` overrides the frame lengths
+    when the frames were truncated at capture time (pcap snaplen).
+    """
+    if not frames:
+        empty = np.zeros(0, dtype=np.int64)
+        return ParsedBatch(empty.astype(bool), empty, empty, empty, empty, empty, empty, empty)
+    buf, lengths, captured = pack_frames(frames)
+    if wire_lengths is not None:
+        lengths = np.asarray(wire_lengths, dtype=np.int64)
+    return parse_headers(buf, lengths, linktype, captured)
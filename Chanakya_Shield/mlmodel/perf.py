@@ -0,0 +1,86 @@
+"""
+Lightweight measurement helpers for benchmarks: peak RSS, latency
+percentiles and cumulative per-stage timers.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def memory_mb(pid="self"):
+    """
+    Current {'rss': .., 'pss': ..} of a process in MiB from Linux smaps_rollup.
+    PSS splits shared pages between the processes mapping them, so summing
+    it over workers gives their real combined footprint. None if unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    except OSError:
+        return None
+    return {key: int(fields[name].split()[0]) / 1024
+            for key, name in (("rss", "Rss"), ("pss", "Pss")) if name in fields}
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """{'p50': .., 'p95': .., 'p99': ..} of ``values`` (zeros if empty)."""
+    if len(values) == 0:
+        return {f"p{p}": 0.0 for p in points}
+    result = np.percentile(np.asarray(values, dtype=np.float64), points)
+    return {f"p{p}": float(v) for p, v in zip(points, result)}
+
+
+class StageTimers:
+    """Thread-safe cumulative wall time and call counts per named stage."""
+
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def wrap(self, stage, func):
+        """``func`` with every call timed under ``stage``."""
+        def timed(*args, **kwargs):
+            with self.time(stage):
+                return func(*args, **kwargs)
+        return timed
+
+    def summary(self):
+        with self._lock:
+            return {
+                stage: {'seconds': total, 'calls': self.calls[stage],
+                        'ms_per_call': total / self.calls[stage] * 1000}
+                for stage, total in self.totals.items()
+            }
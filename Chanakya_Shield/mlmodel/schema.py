@@ -0,0 +1,368 @@
+"""
+Versioned schema migrations and partition retention for the detection database
+(``python schema.py --migrate`` as a deploy step).
+"""
+
+import argparse
+import datetime
+import threading
+
+PACKETS_DDL = """
+CREATE TABLE IF NOT EXISTS packets (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    timestamp DATETIME,
+    src_ip VARCHAR(45),
+    dest_ip VARCHAR(45),
+    protocol VARCHAR(10),
+    length INT,
+    flags INT,
+    status VARCHAR(20),
+    reason VARCHAR(255),
+    attack_type VARCHAR(50),
+    model_version VARCHAR(32)
+)
+"""
+
+FLOWS_DDL = """
+CREATE TABLE IF NOT EXISTS flows (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    first_seen DATETIME,
+    last_seen DATETIME,
+    src_ip VARCHAR(45),
+    dest_ip VARCHAR(45),
+    fwd_packets INT,
+    bwd_packets INT,
+    fwd_bytes BIGINT,
+    bwd_bytes BIGINT,
+    attack_packets INT,
+    max_anomaly_score DOUBLE,
+    verdict VARCHAR(50),
+    end_reason VARCHAR(10),
+    model_version VARCHAR(32)
+)
+"""
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    description VARCHAR(255),
+    applied_at DATETIME
+)
+"""
+
+# Columns older deployments may lack (sniffer.py created packets without
+# attack_type; model_version arrived with hot reload)
+PACKETS_LATE_COLUMNS = {
+    'status': "VARCHAR(20)",
+    'reason': "VARCHAR(255)",
+    'attack_type': "VARCHAR(50)",
+    'model_version': "VARCHAR(32)",
+}
+
+INDEXES = {
+    'packets': {
+        'idx_packets_status_id': ("status", "id"),
+        'idx_packets_timestamp': ("timestamp",),
+        'idx_packets_attack_time': ("attack_type", "timestamp"),
+    },
+    'flows': {
+        'idx_flows_last_seen': ("last_seen",),
+        'idx_flows_verdict_time': ("verdict", "last_seen"),
+    },
+}
+
+# Table -> DATETIME column it is partitioned and expired by
+PARTITIONED = {
+    'packets': "timestamp",
+    'flows': "last_seen",
+}
+
+RETENTION_DAYS = 30
+PARTITION_DAYS_AHEAD = 7
+LOCK_NAME = "packeteye_schema"
+HISTORY_PARTITION = "p_history"
+FUTURE_PARTITION = "p_future"
+
+
+# ---------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------
+def _columns(cursor, table):
+    cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+    cursor.fetchall()
+    return {d[0].lower() for d in cursor.description}
+
+
+def _indexes(cursor, backend, table):
+    if backend.dialect == "mysql":
+        cursor.execute(f"SHOW INDEX FROM {table}")
+        return {row[2] for row in cursor.fetchall()}
+    cursor.execute(f"PRAGMA index_list({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _to_days(day):
+    """MySQL TO_DAYS() of a date."""
+    return day.toordinal() + 365
+
+
+def _from_days(days):
+    return datetime.date.fromordinal(days - 365)
+
+
+def _partitions(cursor, table):
+    """[(name, upper bound in TO_DAYS or None for MAXVALUE)] in order; empty if unpartitioned."""
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (table,)
+    )
+    return [(name, None if bound == "MAXVALUE" else int(bound)) for name, bound in cursor.fetchall()]
+
+
+def _day_partitions(first_day, last_day):
+    """Partition clauses holding one day each, ``first_day`` .. ``last_day`` inclusive."""
+    clauses = []
+    day = first_day
+    while day <= last_day:
+        clauses.append(f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ({_to_days(day + datetime.timedelta(days=1))})")
+        day += datetime.timedelta(days=1)
+    return clauses
+
+
+# ---------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------
+def _create_tables(cursor, backend):
+    cursor.execute(backend.ddl(PACKETS_DDL))
+    cursor.execute(backend.ddl(FLOWS_DDL))
+    existing = _columns(cursor, "packets")
+    for column, column_type in PACKETS_LATE_COLUMNS.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE packets ADD COLUMN {column} {column_type}")
+
+
+def _create_indexes(cursor, backend):
+    for table, indexes in INDEXES.items():
+        existing = _indexes(cursor, backend, table)
+        for name, columns in indexes.items():
+            if name not in existing:
+                cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+
+
+def _partition_tables(cursor, backend):
+    if backend.dialect != "mysql":
+        return
+    today = datetime.date.today()
+    for table, column in PARTITIONED.items():
+        if _partitions(cursor, table):
+            continue
+        # Every unique key must contain the partitioning column; rows without
+        # a time cannot be placed, so it becomes NOT NULL
+        cursor.execute(f"UPDATE {table} SET {column} = NOW() WHERE {column} IS NULL")
+        cursor.execute(
+            f"ALTER TABLE {table} MODIFY id BIGINT NOT NULL AUTO_INCREMENT, "
+            f"MODIFY {column} DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, {column})"
+        )
+        clauses = (
+            [f"PARTITION {HISTORY_PARTITION} VALUES LESS THAN ({_to_days(today)})"]
+            + _day_partitions(today, today + datetime.timedelta(days=PARTITION_DAYS_AHEAD))
+            + [f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE"]
+        )
+        cursor.execute(f"ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS({column})) ({', '.join(clauses)})")
+
+
+MIGRATIONS = (
+    (1, "packets and flows tables", _create_tables),
+    (2, "indexes for alert polling and dashboard time/attack filters", _create_indexes),
+    (3, "daily range partitions (MySQL)", _partition_tables),
+)
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    row = cursor.fetchone()
+    return (row[0] or 0) if row else 0
+
+
+def check(backend):
+    """
+    Schema version of the database, warning if it is behind LATEST_VERSION.
+    Only SQLite, which no other process shares, is migrated here.
+    """
+    if backend.dialect != "mysql":
+        return migrate(backend)
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        try:
+            version = current_version(cursor)
+        except Exception:   # No schema_version table yet
+            conn.rollback()
+            version = 0
+    finally:
+        backend.release(conn)
+    if version < LATEST_VERSION:
+        print(f"⚠️  Database schema is at v{version}, latest is v{LATEST_VERSION}; "
+              f"run `python mlmodel/schema.py --migrate`")
+    return version
+
+
+def migrate(backend):
+    """Apply pending migrations; returns the schema version afterwards."""
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        if backend.dialect == "mysql":
+            cursor.execute("SELECT GET_LOCK(%s, 60)", (LOCK_NAME,))
+            cursor.fetchall()
+        try:
+            cursor.execute(backend.ddl(SCHEMA_VERSION_DDL))
+            version = current_version(cursor)
+            for number, description, apply in MIGRATIONS:
+                if number <= version:
+                    continue
+                apply(cursor, backend)
+                cursor.execute(
+                    f"INSERT INTO schema_version (version, description, applied_at) "
+                    f"VALUES ({backend.placeholder}, {backend.placeholder}, {backend.placeholder})",
+                    (number, description, datetime.datetime.now())
+                )
+                conn.commit()
+                print(f"🗄️  Schema migrated to v{number}: {description}")
+                version = number
+            conn.commit()
+            return version
+        finally:
+            if backend.dialect == "mysql":
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+    finally:
+        backend.release(conn)
+
+
+# ---------------------------------------------------------
+# Retention
+# ---------------------------------------------------------
+def maintain(backend, retention_days=RETENTION_DAYS, days_ahead=PARTITION_DAYS_AHEAD, today=None):
+    """
+    Create partitions up to ``days_ahead`` days from now and drop those
+    holding only rows older than ``retention_days``. Returns
+    {table: {'added': n, 'dropped': n}} (dropped counts rows on SQLite).
+    """
+    today = today or datetime.date.today()
+    cutoff = today - datetime.timedelta(days=retention_days)
+    report = {}
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        for table, column in PARTITIONED.items():
+            if backend.dialect != "mysql":
+                cursor.execute(f"DELETE FROM {table} WHERE {column} < {backend.placeholder}",
+                               (datetime.datetime.combine(cutoff, datetime.time()),))
+                report[table] = {'added': 0, 'dropped': cursor.rowcount}
+                conn.commit()
+                continue
+
+            partitions = _partitions(cursor, table)
+            if not partitions:
+                continue
+            bounds = [bound for _, bound in partitions if bound is not None]
+
+            # New days are split off the MAXVALUE partition; after a long
+            # outage the first new partition also covers the gap
+            added = 0
+            first_missing = max(_from_days(max(bounds)), cutoff) if bounds else today
+            last_wanted = today + datetime.timedelta(days=days_ahead)
+            if first_missing <= last_wanted:
+                clauses = _day_partitions(first_missing, last_wanted)
+                cursor.execute(
+                    f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO "
+                    f"({', '.join(clauses)}, PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)"
+                )
+                added = len(clauses)
+
+            expired = [name for name, bound in partitions
+                       if bound is not None and bound <= _to_days(cutoff)]
+            if expired:
+                cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+            report[table] = {'added': added, 'dropped': len(expired)}
+    finally:
+        backend.release(conn)
+    return report
+
+
+class MaintenanceJob:
+    """Runs maintain() now and then every ``interval`` seconds from a daemon thread."""
+
+    def __init__(self, backend, interval=3600.0, retention_days=RETENTION_DAYS,
+                 days_ahead=PARTITION_DAYS_AHEAD):
+        self.backend = backend
+        self.interval = interval
+        self.retention_days = retention_days
+        self.days_ahead = days_ahead
+        self.runs = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            report = maintain(self.backend, self.retention_days, self.days_ahead)
+            self.runs += 1
+            for table, changes in report.items():
+                if changes['added'] or changes['dropped']:
+                    print(f"🗄️  {table}: +{changes['added']} partitions, {changes['dropped']} expired dropped")
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Database maintenance failed: {e}")
+
+    def _run(self):
+        self.run_once()
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    from db_writer import get_backend
+
+    parser = argparse.ArgumentParser(description="Detection database schema and retention")
+    parser.add_argument("--migrate", action="store_true", help="Apply pending migrations, then run maintenance")
+    parser.add_argument("--maintain", action="store_true",
+                        help="Create upcoming partitions and drop expired ones")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--days-ahead", type=int, default=PARTITION_DAYS_AHEAD)
+    args = parser.parse_args()
+
+    backend = get_backend()
+    if args.migrate:
+        migrate(backend)
+    if args.migrate or args.maintain:
+        print(f"🗄️  Maintenance: {maintain(backend, args.retention_days, args.days_ahead)}")
+
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        print(f"✅ Schema version {current_version(cursor)} (latest {LATEST_VERSION})")
+        if backend.dialect == "mysql":
+            for table in PARTITIONED:
+                partitions = _partitions(cursor, table)
+                days = [name for name, _ in partitions if name.startswith("p2")]
+                print(f"   {table}: {len(partitions)} partitions"
+                      + (f", days {days[0][1:]} .. {days[-1][1:]}" if days else ""))
+    finally:
+        backend.release(conn)
@@ -0,0 +1,132 @@
+"""
+Shared scoring helpers for training-time evaluation and live inference.
+"""
+
+import threading
+
+import numpy as np
+
+
+def threshold_vector(optimal_thresholds, n_classes, default=0.5):
+    """Per-class threshold dict ({class_idx: threshold}) -> dense float array."""
+    thresholds = np.full(n_classes, default, dtype=np.float64)
+    for class_idx, threshold in optimal_thresholds.items():
+        if 0 <= int(class_idx) < n_classes:
+            thresholds[int(class_idx)] = threshold
+    return thresholds
+
+
+def tune_thresholds(y_true, y_proba, candidates=np.arange(0.3, 0.9, 0.05)):
+    """
+    Per-class threshold dict ({class_idx: threshold}) maximizing each class's
+    one-vs-rest F1 on held-out rows, as train_classifier.py tunes them.
+    """
+    from sklearn.metrics import f1_score
+
+    optimal_thresholds = {}
+    for class_idx in range(y_proba.shape[1]):
+        y_binary = (y_true == class_idx).astype(int)
+        best_f1, best_threshold = 0, 0.5
+        for threshold in candidates:
+            f1 = f1_score(y_binary, (y_proba[:, class_idx] >= threshold).astype(int), zero_division=0)
+            if f1 > best_f1:
+                best_f1, best_threshold = f1, float(threshold)
+        optimal_thresholds[class_idx] = best_threshold
+    return optimal_thresholds
+
+
+def benign_index(class_names, benign_label="BENIGN"):
+    """
+    Index of the benign class. ``class_names`` is either a list ordered by
+    class index or an {index: name} dict; falls back to 0.
+    """
+    items = class_names.items() if isinstance(class_names, dict) else enumerate(class_names)
+    for idx, name in items:
+        if name == benign_label:
+            return int(idx)
+    return 0
+
+
+def apply_thresholds(y_proba, thresholds, benign_idx):
+    """
+    Vectorized per-class threshold decision: argmax, gather each row's class
+    threshold and fall back to ``benign_idx`` where confidence is below it.
+    """
+    predictions = np.argmax(y_proba, axis=1)
+    confidence = np.take_along_axis(y_proba, predictions[:, None], axis=1)[:, 0]
+    predictions[confidence < thresholds[predictions]] = benign_idx
+    return predictions
+
+
+class CascadeScorer:
+    """
+    Staged alternative to ensemble.predict_proba() on every row:
+
+      1. IsolationForest verdicts come in as ``outliers``; inliers are
+         labelled benign without touching the classifier.
+      2. LightGBM scores the outliers only.
+      3. The SVM runs only on rows whose LightGBM confidence falls inside
+         the uncertain band; those rows get the exact soft-vote blend the
+         VotingClassifier would have produced.
+
+    Predictions are class indices, as with apply_thresholds().
+    """
+
+    def __init__(self, ensemble, uncertain_band=(0.2, 0.9)):
+        members = dict(getattr(ensemble, "named_estimators_", {}))
+        self.lgb = members.get("lgb")
+        self.svm = members.get("svm")
+        if self.lgb is None:
+            raise ValueError("Cascade mode needs a VotingClassifier with an 'lgb' member")
+
+        weights = getattr(ensemble, "weights", None) or [1] * len(ensemble.estimators)
+        names = [name for name, _ in ensemble.estimators]
+        self.lgb_weight = float(weights[names.index("lgb")])
+        self.svm_weight = float(weights[names.index("svm")]) if self.svm is not None else 0.0
+        self.low, self.high = uncertain_band
+
+        self.rows = 0
+        self.lgb_rows = 0
+        self.svm_rows = 0
+        self._lock = threading.Lock()
+
+    def predict(self, X, outliers, thresholds, benign_idx):
+        predictions = np.full(len(X), benign_idx, dtype=np.int64)
+        outlier_idx = np.flatnonzero(outliers)
+        svm_count = 0
+
+        if len(outlier_idx):
+            X_out = X[outlier_idx]
+            y_proba = self.lgb.predict_proba(X_out)
+
+            if self.svm is not None:
+                confidence = y_proba.max(axis=1)
+                uncertain = np.flatnonzero((confidence >= self.low) & (confidence < self.high))
+                svm_count = len(uncertain)
+                if svm_count:
+                    svm_proba = self.svm.predict_proba(X_out[uncertain])
+                    y_proba[uncertain] = (
+                        self.lgb_weight * y_proba[uncertain] + self.svm_weight * svm_proba
+                    ) / (self.lgb_weight + self.svm_weight)
+
+            if thresholds is not None:
+                predictions[outlier_idx] = apply_thresholds(y_proba, thresholds, benign_idx)
+            else:
+                predictions[outlier_idx] = np.argmax(y_proba, axis=1)
+
+        with self._lock:
+            self.rows += len(X)
+            self.lgb_rows += len(outlier_idx)
+            self.svm_rows += svm_count
+        return predictions
+
+    def stats(self):
+        """Cumulative rows reaching each stage and the pass-through rates."""
+        with self._lock:
+            return {
+                'rows': self.rows,
+                'lgb_rows': self.lgb_rows,
+                'svm_rows': self.svm_rows,
+                'lgb_rate': self.lgb_rows / self.rows if self.rows else 0.0,
+                'svm_rate': self.svm_rows / self.lgb_rows if self.lgb_rows else 0.0,
+            }
@@ -1,15 +1,21 @@
-import sys, os
+import argparse
+import sys, os, time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import VotingClassifier
-from sklearn.svm import SVC
+from sklearn.ensemble import IsolationForest, VotingClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report
 import lightgbm as lgb
 import joblib
+from scoring import apply_thresholds, benign_index, threshold_vector, tune_thresholds
+from kernel_approx import make_svm_member
+from model_bundle import BUNDLE_DIR, LEGACY_FILES, BundleError, load_bundle, save_bundle, write_legacy_pickles
+from config import SVM_MEMBER, SVM_APPROX_COMPONENTS, SVM_APPROX_MAX_SAMPLES, MATRIX_CACHE
+from dataset_cache import load_dataset, training_dataset
+from matrix_cache import MatrixCache
 
 try:
     from imblearn.over_sampling import SMOTE
@@ -19,16 +25,24 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "imbalanced-learn"])
     from imblearn.over_sampling import SMOTE
 
+parser = argparse.ArgumentParser(description="Train the attack classifier and tune its per-class thresholds")
+parser.add_argument("--fit-isoforest", action="store_true",
+                    help="Fit a new IsolationForest on the selected features instead of reusing the deployed one "
+                         "(replaces anomaly_model.pkl)")
+args = parser.parse_args()
+
 # =========================================================
 # Load dataset (ROBUST PATH)
 # =========================================================
 print("📥 Loading labeled dataset (CICIDS2017)...")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "..", "datasets", "CICIDS2017_full.csv")
+# Combined Parquet parts (combine_dataset.py) or CICIDS2017_full.csv
+DATA_PATH = training_dataset()
 
-df = pd.read_csv(DATA_PATH)
-df.columns = df.columns.str.strip()
+# Preprocessing stages below are cached as memory-mapped .npy arrays keyed
+# by the dataset hash and stage parameters (matrix_cache.py)
+cache = MatrixCache(DATA_PATH, enabled=MATRIX_CACHE)
 
 # =========================================================
 # Feature list
@@ -41,68 +55,93 @@ features = [
     'ACK Flag Count','URG Flag Count','CWE Flag Count','ECE Flag Count'
 ]
 
-available = [c for c in features if c in df.columns]
-print(f"✅ Using {len(available)} features.")
-
-# =========================================================
-# Detect label column
-# =========================================================
-label_col = None
-for c in df.columns:
-    if c.lower() in ["label", "attack_cat", "attacktype", "class", "target"]:
-        label_col = c
-        break
-
-if not label_col:
-    raise ValueError("❌ Label column not found!")
-
-print(f"✅ Label column: {label_col}")
-
-# =========================================================
-# Cleaning
-# =========================================================
-df = df[available + [label_col]].copy()
-df.replace([np.inf, -np.inf], np.nan, inplace=True)
-df.dropna(inplace=True)
-df[available] = df[available].clip(-1e6, 1e6)
-
-print(f"✅ Cleaned dataset shape: {df.shape}")
-
-# =========================================================
-# Dataset Preparation with Real-World Distribution
-# =========================================================
 # Strategy: Train on balanced, validate on real-world imbalanced
-MAX_SAMPLES = 150000
-if len(df) > MAX_SAMPLES:
-    # Stratified sampling to maintain class distribution
-    df = df.groupby(label_col, group_keys=False).apply(
-        lambda x: x.sample(min(len(x), MAX_SAMPLES // df[label_col].nunique() * 2), random_state=42)
-    ).reset_index(drop=True)
-
-# Remove classes with too few samples (minimum 10 for statistical validity)
-class_counts = df[label_col].value_counts()
-valid_classes = class_counts[class_counts >= 10].index
-df = df[df[label_col].isin(valid_classes)]
+# The exact RBF SVC trains in quadratic time and needs a small downsample;
+# the approximate members get a larger one, which also bounds what SMOTE
+# generates (every class is raised to the largest per-class count)
+MAX_SAMPLES = 150000 if SVM_MEMBER == "rbf" else SVM_APPROX_MAX_SAMPLES
+CLIP = 1e6
+MIN_CLASS_SAMPLES = 10
+
+def load_and_clean():
+    # Parquet cache: only the 17 features, label and metadata with compact dtypes
+    df = load_dataset(DATA_PATH)
+
+    available = [c for c in features if c in df.columns]
+    print(f"✅ Using {len(available)} features.")
+
+    # =========================================================
+    # Detect label column
+    # =========================================================
+    label_col = None
+    for c in df.columns:
+        if c.lower() in ["label", "attack_cat", "attacktype", "class", "target"]:
+            label_col = c
+            break
+
+    if not label_col:
+        raise ValueError("❌ Label column not found!")
+
+    print(f"✅ Label column: {label_col}")
+    # Plain labels, so the category codes below only cover classes that survive filtering
+    df[label_col] = df[label_col].astype(object)
+
+    # =========================================================
+    # Cleaning
+    # =========================================================
+    df = df[available + [label_col]].copy()
+    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    df.dropna(inplace=True)
+    df[available] = df[available].clip(-CLIP, CLIP)
+
+    print(f"✅ Cleaned dataset shape: {df.shape}")
+
+    # =========================================================
+    # Dataset Preparation with Real-World Distribution
+    # =========================================================
+    if MAX_SAMPLES and len(df) > MAX_SAMPLES:
+        # Stratified sampling to maintain class distribution (a concat rather
+        # than groupby.apply, which drops the label column on pandas >= 3)
+        per_class = MAX_SAMPLES // df[label_col].nunique() * 2
+        df = pd.concat([group.sample(min(len(group), per_class), random_state=42)
+                        for _, group in df.groupby(label_col)], ignore_index=True)
+
+    # Remove classes with too few samples (minimum 10 for statistical validity)
+    class_counts = df[label_col].value_counts()
+    valid_classes = class_counts[class_counts >= MIN_CLASS_SAMPLES].index
+    df = df[df[label_col].isin(valid_classes)]
+
+    print(f"📉 Dataset size after filtering: {df.shape}")
+    print(f"📊 Original class distribution:\n{df[label_col].value_counts()}\n")
+
+    # Encode labels early for proper stratification
+    df[label_col] = df[label_col].astype("category")
+    return {
+        'X': df[available].values,
+        'y': df[label_col].cat.codes.astype(int).values,
+        'available': available,
+        'categories': df[label_col].cat.categories.tolist(),
+    }
+
+clean = cache.stage("clean", {'features': features, 'clip': CLIP, 'max_samples': MAX_SAMPLES,
+                              'min_class_samples': MIN_CLASS_SAMPLES}, load_and_clean)
+available = clean['available']
+categories = clean['categories']
+label_map = {name: idx for idx, name in enumerate(categories)}
 
-print(f"📉 Dataset size after filtering: {df.shape}")
-print(f"📊 Original class distribution:\n{df[label_col].value_counts()}\n")
+X = clean['X']
+y = clean['y']
 
 # Split BEFORE balancing to preserve real-world test distribution
 from sklearn.model_selection import train_test_split as tts
 
-# Encode labels early for proper stratification
-df[label_col] = df[label_col].astype("category")
-df["Label_Code"] = df[label_col].cat.codes
-categories = df[label_col].cat.categories.tolist()
-label_map = {name: idx for idx, name in enumerate(categories)}
-
-X = df[available].values
-y = df["Label_Code"].astype(int).values
-
 # First split: 80% train (will be balanced), 20% test (kept imbalanced - real-world)
-X_train_full, X_test_real, y_train_full, y_test_real = tts(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
+split = cache.stage("split", {'test_size': 0.2, 'random_state': 42}, lambda: dict(zip(
+    ("X_train_full", "X_test_real", "y_train_full", "y_test_real"),
+    tts(X, y, test_size=0.2, random_state=42, stratify=y)
+)))
+X_train_full, X_test_real = split["X_train_full"], split["X_test_real"]
+y_train_full, y_test_real = split["y_train_full"], split["y_test_real"]
 
 print(f"✅ Real-world test set preserved: {len(X_test_real)} samples (imbalanced)")
 print(f"   This simulates actual network traffic distribution\n")
@@ -124,7 +163,10 @@ for idx, weight in class_weight_dict.items():
 # Apply SMOTE for intelligent oversampling (better than random resampling)
 print("\n🔄 Applying SMOTE to balance training data...")
 smote = SMOTE(random_state=42, k_neighbors=5)
-X_train_balanced, y_train_balanced = smote.fit_resample(X_train_full, y_train_full)
+balanced = cache.stage("smote", {'k_neighbors': 5, 'random_state': 42}, lambda: dict(zip(
+    ("X", "y"), smote.fit_resample(X_train_full, y_train_full)
+)))
+X_train_balanced, y_train_balanced = balanced["X"], balanced["y"]
 
 print(f"✅ Training set balanced: {len(X_train_balanced)} samples")
 unique, counts = np.unique(y_train_balanced, return_counts=True)
@@ -133,12 +175,19 @@ print(f"   Balanced distribution: {dict(zip([categories[i] for i in unique], cou
 # =========================================================
 # Feature Scaling
 # =========================================================
-scaler = StandardScaler()
-X_train = scaler.fit_transform(X_train_balanced)
-X_test = scaler.transform(X_test_real)
+def scale():
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train_balanced)
+    return {'X_train': X_train, 'X_test': scaler.transform(X_test_real), 'scaler': scaler}
+
+scaled = cache.stage("scale", {'scaler': "standard"}, scale)
+scaler = scaled['scaler']
+X_train = scaled['X_train']
+X_test = scaled['X_test']
 
 y_train = y_train_balanced
 y_test = y_test_real
+cache.summary()
 
 # =========================================================
 # Feature Importance Analysis & Selection
@@ -173,6 +222,37 @@ TOP_K_FEATURES = 12  # Optimized feature count
 top_features_idx = importance_df.head(TOP_K_FEATURES).index.tolist()
 selected_features = [feature_names[i] for i in top_features_idx]
 
+# =========================================================
+# Anomaly model: this script trains the classifier only, so the bundle
+# reuses the deployed IsolationForest (live bundle, else anomaly_model.pkl).
+# It must score the same features; fail before the long ensemble fit if not
+# =========================================================
+def deployed_isoforest():
+    """(IsolationForest, its selected feature indices) from the live bundle or the pickles."""
+    try:
+        bundle = load_bundle(BUNDLE_DIR, mmap=False)
+        if bundle.schema['all_features'] == available:
+            return bundle.iso_model, bundle.selected_features_idx
+    except BundleError:
+        pass
+    try:
+        return (joblib.load(os.path.join(BASE_DIR, LEGACY_FILES['iso_model'])),
+                joblib.load(os.path.join(BASE_DIR, LEGACY_FILES['selected_features_idx'])))
+    except FileNotFoundError:
+        return None, None
+
+iso_model = None
+if not args.fit_isoforest:
+    iso_model, iso_features_idx = deployed_isoforest()
+    if iso_model is None or iso_features_idx is None or sorted(iso_features_idx) != sorted(top_features_idx):
+        sys.exit(f"❌ The deployed IsolationForest does not score the selected features {top_features_idx} "
+                 f"(it uses {iso_features_idx}); rerun with --fit-isoforest to fit a new one")
+    # Same features (and the same dataset behind the scaling); keep the
+    # column order the IsolationForest was fitted with
+    top_features_idx = [int(i) for i in iso_features_idx]
+    selected_features = [feature_names[i] for i in top_features_idx]
+    print("🌲 Reusing the deployed IsolationForest (same selected features)")
+
 print(f"\n✅ Selected top {TOP_K_FEATURES} features for training:")
 print(f"   {selected_features}\n")
 
@@ -203,16 +283,9 @@ lgb_classifier = lgb.LGBMClassifier(
     class_weight='balanced'  # Cost-sensitive learning
 )
 
-# Create SVM classifier with class weights
-svm_classifier = SVC(
-    kernel='rbf',
-    C=10.0,
-    gamma='scale',
-    probability=True,
-    random_state=42,
-    cache_size=500,
-    class_weight='balanced'  # Cost-sensitive learning
-)
+# Create SVM member with class weights (exact RBF SVC or approximate kernel)
+svm_classifier = make_svm_member(SVM_MEMBER, class_weight='balanced',  # Cost-sensitive learning
+                                 n_components=SVM_APPROX_COMPONENTS)
 
 # Create ensemble using VotingClassifier
 clf = VotingClassifier(
@@ -225,53 +298,31 @@ clf = VotingClassifier(
     n_jobs=-1
 )
 
-print("Training ensemble on balanced data (this may take a few minutes)...")
+print(f"Training ensemble on balanced data with SVM member '{SVM_MEMBER}' (this may take a few minutes)...")
+fit_start = time.perf_counter()
 clf.fit(X_train_selected, y_train)
+print(f"✅ Ensemble trained in {time.perf_counter() - fit_start:.1f}s")
 
 # =========================================================
 # Per-Class Probability Threshold Tuning
 # =========================================================
 print("\n🎯 Optimizing per-class probability thresholds...")
 
-from sklearn.metrics import precision_recall_curve, f1_score
-
 # Get probability predictions
 y_proba = clf.predict_proba(X_test_selected)
 
-# Find optimal threshold for each class
-optimal_thresholds = {}
-for class_idx in range(len(categories)):
-    # Binary classification for this class
-    y_binary = (y_test == class_idx).astype(int)
-    proba_class = y_proba[:, class_idx]
-    
-    # Find threshold that maximizes F1 score
-    thresholds = np.arange(0.3, 0.9, 0.05)
-    best_f1 = 0
-    best_threshold = 0.5
-    
-    for threshold in thresholds:
-        y_pred_threshold = (proba_class >= threshold).astype(int)
-        f1 = f1_score(y_binary, y_pred_threshold, zero_division=0)
-        if f1 > best_f1:
-            best_f1 = f1
-            best_threshold = threshold
-    
-    optimal_thresholds[class_idx] = best_threshold
+# Find the F1-optimal threshold for each class
+optimal_thresholds = tune_thresholds(y_test, y_proba)
 
 print("📊 Optimal thresholds per class:")
 for idx, threshold in optimal_thresholds.items():
     print(f"   {categories[idx]}: {threshold:.2f}")
 
-# Apply optimized thresholds
-y_pred_optimized = np.argmax(y_proba, axis=1)  # Default prediction
-for i in range(len(y_proba)):
-    max_proba = np.max(y_proba[i])
-    predicted_class = np.argmax(y_proba[i])
-    if max_proba < optimal_thresholds[predicted_class]:
-        # If confidence is low, predict as most common class (BENIGN)
-        benign_idx = categories.index('BENIGN') if 'BENIGN' in categories else 0
-        y_pred_optimized[i] = benign_idx
+# Apply optimized thresholds (same vectorized routine as live inference):
+# low-confidence predictions fall back to the most common class (BENIGN)
+y_pred_optimized = apply_thresholds(
+    y_proba, threshold_vector(optimal_thresholds, len(categories)), benign_index(categories)
+)
 
 # =========================================================
 # Comprehensive Evaluation
@@ -309,27 +360,36 @@ print(cm)
 # =========================================================
 print("\n💾 Saving optimized model artifacts...")
 
-# Save all components
+if args.fit_isoforest:
+    # On the same scaled, selected features as the classifier, fitted on the
+    # real (unbalanced) traffic so its outlier rate is meaningful
+    print("🌲 Training IsolationForest on the selected features (--fit-isoforest)...")
+    iso_model = IsolationForest(n_estimators=100, contamination=0.05, random_state=42, n_jobs=-1)
+    iso_model.fit(scaler.transform(X_train_full)[:, top_features_idx])
+
+# One versioned bundle (manifest, checksums, feature schema) so every
+# component is guaranteed to come from this training run
 artifacts = {
+    'iso_model': iso_model,
     'classifier': clf,
     'scaler': scaler,
     'label_map': label_map,
     'optimal_thresholds': optimal_thresholds,
-    'selected_features': selected_features,
-    'feature_indices': top_features_idx,
-    'all_features': available
+    'selected_features_idx': top_features_idx,
 }
-
-joblib.dump(clf, os.path.join(BASE_DIR, "attack_classifier.pkl"))
-joblib.dump(scaler, os.path.join(BASE_DIR, "scaler.pkl"))
-joblib.dump(label_map, os.path.join(BASE_DIR, "attack_labels.pkl"))
-joblib.dump(optimal_thresholds, os.path.join(BASE_DIR, "optimal_thresholds.pkl"))
-joblib.dump(top_features_idx, os.path.join(BASE_DIR, "selected_features_idx.pkl"))
-
+manifest = save_bundle(artifacts, available, BUNDLE_DIR, training={
+    'trainer': "train_classifier",
+    'isoforest': "fitted" if args.fit_isoforest else "reused",
+    'dataset': os.path.basename(DATA_PATH),
+    'rows': int(len(X)),
+    'svm_member': SVM_MEMBER,
+    'test_accuracy': float(test_accuracy_optimized),
+})
+
+# Legacy per-component pickles (analysis.py without a bundle, replay_from_csv.py)
+# from the same objects; anomaly_model.pkl only changes with --fit-isoforest
+print(f"✅ Saved model bundle {manifest['version']}: {BUNDLE_DIR}")
 print("✅ Saved production-grade artifacts:")
-print(f"   ➤ {os.path.join(BASE_DIR, 'attack_classifier.pkl')}")
-print(f"   ➤ {os.path.join(BASE_DIR, 'scaler.pkl')}")
-print(f"   ➤ {os.path.join(BASE_DIR, 'attack_labels.pkl')}")
-print(f"   ➤ {os.path.join(BASE_DIR, 'optimal_thresholds.pkl')}")
-print(f"   ➤ {os.path.join(BASE_DIR, 'selected_features_idx.pkl')}")
+for path in write_legacy_pickles(artifacts):
+    print(f"   ➤ {path}")
 print(f"\n✨ Model ready for real-time deployment with {TOP_K_FEATURES} optimized features!")
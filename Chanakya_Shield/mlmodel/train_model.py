@@ -1,24 +1,28 @@
+import argparse
 import os
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest, RandomForestClassifier, VotingClassifier
-from sklearn.svm import SVC
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
 import lightgbm as lgb
 import joblib
 from pipeline.quantum_pipeline import apply_quantum_feature_selection
+from kernel_approx import make_svm_member
+from config import SVM_MEMBER, SVM_APPROX_COMPONENTS, MATRIX_CACHE
+from dataset_cache import load_dataset, training_dataset
+from matrix_cache import MatrixCache
+from model_bundle import BUNDLE_DIR, load_bundle, save_bundle, write_legacy_pickles
+from flow_table import ALL_FEATURE_COLUMNS
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "..", "datasets", "CICIDS2017_full.csv")
+# Combined Parquet parts (combine_dataset.py) or CICIDS2017_full.csv
+DATA_PATH = training_dataset()
 
-def train_and_save():
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
-
-    df = pd.read_csv(DATA_PATH)
-    df.columns = df.columns.str.strip()
+def load_and_clean(data_path):
+    # Parquet cache: only the 17 features and label, float32 (dataset_cache.py)
+    df = load_dataset(data_path)
 
     required_features = [
         'Destination Port', 'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
@@ -29,36 +33,62 @@ def train_and_save():
     ]
 
     available_features = [c for c in required_features if c in df.columns]
+    if 'Label' not in available_features:
+        raise ValueError(f"No Label column in {data_path}")
     df = df[available_features].copy()
 
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
     df.dropna(inplace=True)
 
-    X = df.drop(columns=['Label'], errors='ignore')
-    y = df['Label'] if 'Label' in df.columns else np.zeros(len(df))
+    # Label codes in order of first appearance (the order of y.unique())
+    codes, labels = pd.factorize(df['Label'].astype(object))
+    return {'X': df.drop(columns=['Label']).values, 'y': codes, 'labels': list(labels)}
 
-    # Encoding labels (Benign vs Attack)
-    y_binary = np.where(y == "BENIGN", 1, -1) # 1 for normal, -1 for anomaly (IsolationForest convention)
-    
+def select_features(X, y):
     # Feature Selection using QUBO
     rf_selector = RandomForestClassifier(n_estimators=50, random_state=42, n_jobs=-1)
     rf_selector.fit(X, y)
     feature_importance = rf_selector.feature_importances_
-    corr_matrix = np.corrcoef(X.values, rowvar=False)
+    corr_matrix = np.corrcoef(X, rowvar=False)
 
-    selected_indices = apply_quantum_feature_selection(X.values, feature_importance, corr_matrix, k=15)
+    selected_indices = apply_quantum_feature_selection(X, feature_importance, corr_matrix, k=15)
     
     # Ensure indices are valid
     if not selected_indices:
         selected_indices = list(range(X.shape[1])) # Fallback
+    return {'selected': np.asarray(selected_indices, dtype=np.int64)}
+
+def scale(X):
+    scaler = StandardScaler()
+    return {'X': scaler.fit_transform(X), 'scaler': scaler}
+
+def train_and_save(data_path=DATA_PATH, use_cache=MATRIX_CACHE):
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"Dataset not found at {data_path}")
+
+    # Cleaning, feature selection and scaling are cached as memory-mapped
+    # .npy arrays keyed by the dataset hash and stage parameters
+    cache = MatrixCache(data_path, enabled=use_cache)
+    clean = cache.stage("clean", {'drop': "inf/nan"}, lambda: load_and_clean(data_path))
+    X = clean['X']
+    y = np.asarray(clean['labels'], dtype=object)[clean['y']]
+
+    # Encoding labels (Benign vs Attack)
+    y_binary = np.where(y == "BENIGN", 1, -1) # 1 for normal, -1 for anomaly (IsolationForest convention)
     
-    print(f"DEBUG: Selected {len(selected_indices)} features.")
+    selection = cache.stage("select", {'rf_estimators': 50, 'k': 15, 'random_state': 42},
+                            lambda: select_features(X, y))
+    selected_indices = [int(i) for i in selection['selected']]
     
-    X_selected = X.iloc[:, selected_indices]
+    print(f"DEBUG: Selected {len(selected_indices)} features.")
     
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X_selected)
+    # Scale all 17 features, then select: the order analysis.py and the
+    # model bundle expect (a per-column scaler gives the same values)
+    scaled = cache.stage("scale", {'scaler': "standard", 'columns': "all"}, lambda: scale(X))
+    scaler = scaled['scaler']
+    X_scaled = scaled['X'][:, selected_indices]
     print(f"DEBUG: Scaler expects {scaler.n_features_in_} features.")
+    cache.summary()
 
     # Hybrid Ensemble Training
     
@@ -71,9 +101,9 @@ def train_and_save():
     # We train on all to distinguish types. 
     # If dataset has string labels, we need to encode them for ensemble
     
-    attack_labels = y.unique()
+    attack_labels = clean['labels']
     label_map = {label: idx for idx, label in enumerate(attack_labels)}
-    y_encoded = y.map(label_map)
+    y_encoded = clean['y']
     
     # Create LightGBM classifier with optimized hyperparameters
     lgb_classifier = lgb.LGBMClassifier(
@@ -92,15 +122,8 @@ def train_and_save():
         importance_type='gain'
     )
     
-    # Create SVM classifier with optimized parameters
-    svm_classifier = SVC(
-        kernel='rbf',
-        C=10.0,
-        gamma='scale',
-        probability=True,
-        random_state=42,
-        cache_size=500
-    )
+    # Create SVM member (exact RBF SVC or approximate kernel, see config.SVM_MEMBER)
+    svm_classifier = make_svm_member(SVM_MEMBER, n_components=SVM_APPROX_COMPONENTS)
     
     # Create ensemble using VotingClassifier with weighted voting
     ensemble_classifier = VotingClassifier(
@@ -116,14 +139,48 @@ def train_and_save():
     print("Training optimized LightGBM + SVM ensemble classifier...")
     ensemble_classifier.fit(X_scaled, y_encoded)
 
-    # Artifact Saving
-    joblib.dump(iso_forest, os.path.join(BASE_DIR, "anomaly_model.pkl"))
-    joblib.dump(ensemble_classifier, os.path.join(BASE_DIR, "attack_classifier.pkl"))
-    joblib.dump(scaler, os.path.join(BASE_DIR, "scaler.pkl"))
+    # Artifact Saving: publish a bundle, which the running detector reloads,
+    # and the per-component pickles from the same fitted objects
+    components = {
+        'iso_model': iso_forest,
+        'classifier': ensemble_classifier,
+        'scaler': scaler,
+        'label_map': label_map,
+        'optimal_thresholds': None,
+        'selected_features_idx': selected_indices,
+    }
+    manifest = save_bundle(components, ALL_FEATURE_COLUMNS, BUNDLE_DIR, training={
+        'trainer': "train_model",
+        'dataset': os.path.basename(os.path.normpath(data_path)),
+        'rows': int(len(X)),
+        'svm_member': SVM_MEMBER,
+    })
+    write_legacy_pickles(components)
     joblib.dump(selected_indices, os.path.join(BASE_DIR, "selected_features.pkl"))
-    joblib.dump(label_map, os.path.join(BASE_DIR, "attack_labels.pkl"))
     
-    print("Training complete. LightGBM + SVM ensemble artifacts saved.")
+    print(f"Training complete. LightGBM + SVM ensemble published as bundle {manifest['version']}.")
 
 if __name__ == "__main__":
-    train_and_save()
+    parser = argparse.ArgumentParser(description="Train the anomaly model and attack classifier")
+    parser.add_argument("--data", default=DATA_PATH, help="Dataset (CSV, Parquet file or parts directory)")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Stream row groups into a LightGBM Dataset instead of loading every row "
+                             "(full-corpus training, see lgb_out_of_core.py)")
+    parser.add_argument("--sample-rows", type=int, default=200_000,
+                        help="Out-of-core: rows sampled for feature selection, IsolationForest and the SVM member")
+    parser.add_argument("--rounds", type=int, default=300, help="Out-of-core: LightGBM boosting rounds")
+    parser.add_argument("--no-matrix-cache", action="store_true",
+                        help="Recompute the preprocessing stages instead of reusing cached arrays")
+    args = parser.parse_args()
+
+    if args.out_of_core:
+        from lgb_out_of_core import train_out_of_core
+        manifest = train_out_of_core(args.data, BUNDLE_DIR, svm_member=SVM_MEMBER,
+                                     svm_components=SVM_APPROX_COMPONENTS,
+                                     sample_rows=args.sample_rows, num_boost_round=args.rounds)
+        bundle = load_bundle(os.path.join(BUNDLE_DIR, manifest['version']), mmap=False)
+        write_legacy_pickles(vars(bundle))
+        joblib.dump(bundle.selected_features_idx, os.path.join(BASE_DIR, "selected_features.pkl"))
+        print(f"Training complete. Out-of-core LightGBM + SVM ensemble published as bundle {manifest['version']}.")
+    else:
+        train_and_save(args.data, use_cache=MATRIX_CACHE and not args.no_matrix_cache)
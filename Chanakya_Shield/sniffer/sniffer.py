@@ -1,36 +1,19 @@
 from scapy.all import sniff, IP, TCP
-import mysql.connector
 import datetime
 
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
 
-conn = mysql.connector.connect(
-    host=os.getenv("DB_HOST", "localhost"),
-    user=os.getenv("DB_USER", "root"),
-    password=os.getenv("DB_PASSWORD", ""),
-    database=os.getenv("DB_NAME", "packeteye")
-)
-cursor = conn.cursor()
-
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS packets (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    timestamp DATETIME,
-    src_ip VARCHAR(45),
-    dest_ip VARCHAR(45),
-    protocol VARCHAR(10),
-    length INT,
-    flags INT,
-    status VARCHAR(10),   -- NULL until ML detects anomaly
-    reason VARCHAR(255)   -- NULL until ML detects anomaly
-)
-""")
-conn.commit()
+# Same versioned schema (indexes, partitions) as the detector; migrations
+# run from `python mlmodel/schema.py --migrate`
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mlmodel"))
+from db_writer import MySQLBackend, check_schema, db_config_from_env
+
+check_schema(MySQLBackend(pool_size=1, **db_config_from_env()))
 
 
 def process_packet(packet):
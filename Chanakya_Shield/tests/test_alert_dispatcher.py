@@ -0,0 +1,110 @@
+import threading
+
+import alert_dispatcher
+from alert_dispatcher import TelegramDispatcher, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Response:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = str(payload)
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """Answers each POST from ``responses`` (then 200) and records the texts."""
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.texts = []
+        self.lock = threading.Lock()
+
+    def post(self, url, data, timeout):
+        with self.lock:
+            self.texts.append(data["text"])
+            return self.responses.pop(0) if self.responses else Response(200)
+
+    def close(self):
+        pass
+
+
+def dispatcher(session, **kwargs):
+    d = TelegramDispatcher("token", "chat", rate=1000, burst=100, **kwargs)
+    d.session = session
+    return d
+
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(alert_dispatcher.time, "monotonic", clock)
+    bucket = TokenBucket(rate=2.0, burst=3)
+    for _ in range(3):
+        assert bucket.wait_time() == 0
+        bucket.take()
+    assert bucket.wait_time() == 0.5
+    clock.now += 0.5
+    assert bucket.wait_time() == 0
+    clock.now += 10
+    bucket.wait_time()
+    assert bucket.tokens == 3   # capped at the burst
+
+
+def test_repeated_key_is_coalesced_into_one_summary():
+    session = FakeSession()
+    d = dispatcher(session, coalesce_window=60)
+    key = ("10.0.0.1", "DDoS")
+    first = d.deliver("alert 1", key)
+    followers = [d.deliver(f"alert {i}", key) for i in range(2, 5)]
+
+    assert first.wait(2)
+    assert all(f.coalesced and f.wait(0) for f in followers)
+    assert d.submit("alert 5", key) is False
+    d.close()
+
+    assert session.texts[0] == "alert 1"
+    assert session.texts[1] == alert_dispatcher.default_summary(key, 4, 60)
+    assert d.stats()['coalesced'] == 4
+
+
+def test_rejected_alert_reopens_its_key():
+    session = FakeSession([Response(400, {"description": "bad chat"})])
+    d = dispatcher(session, coalesce_window=60)
+    key = ("10.0.0.1", "DDoS")
+    rejected = d.deliver("alert 1", key)
+
+    assert rejected.wait(2) is False
+    assert rejected.status == "rejected"
+    retry = d.deliver("alert 1 again", key)
+    assert not retry.coalesced and retry.wait(2)
+    d.close()
+    assert d.stats()['failed'] == 1
+
+
+def test_rate_limited_alert_is_retried():
+    session = FakeSession([Response(429, {"parameters": {"retry_after": 0}})])
+    d = dispatcher(session)
+    delivery = d.deliver("alert")
+
+    assert delivery.wait(5)
+    d.close()
+    assert session.texts == ["alert", "alert"]
+    assert d.stats()['sent'] == 1
+
+
+def test_disabled_dispatcher_reports_disabled():
+    d = TelegramDispatcher("", "")
+    delivery = d.deliver("alert")
+    assert delivery.status == "disabled"
+    assert d.submit("alert") is False
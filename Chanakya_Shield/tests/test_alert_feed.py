@@ -0,0 +1,89 @@
+import socket
+
+import pytest
+
+from alert_feed import AlertFeed, Checkpoint, Doorbell, DoorbellListener
+from db_writer import SQLiteBackend
+from schema import migrate
+
+
+@pytest.fixture
+def backend():
+    backend = SQLiteBackend()
+    migrate(backend)
+    return backend
+
+
+def insert(backend, statuses):
+    conn = backend.connect()
+    conn.executemany(
+        "INSERT INTO packets (timestamp, src_ip, dest_ip, status, attack_type) VALUES (?, ?, ?, ?, ?)",
+        [("2026-01-01 00:00:00", f"10.0.0.{i}", "10.0.0.254", status, "DDoS")
+         for i, status in enumerate(statuses)]
+    )
+    conn.commit()
+
+
+def test_drain_pages_anomalies_and_checkpoints_each_page(backend, tmp_path):
+    insert(backend, ["Anomaly", "Normal", "Anomaly", "Anomaly", "Normal", "Anomaly", "Anomaly"])
+    feed = AlertFeed(backend, tmp_path / "last_id.txt", page_size=2)
+    pages = []
+
+    def handler(rows):
+        pages.append([row["id"] for row in rows])
+        assert feed.checkpoint.load() == (pages[-2][-1] if len(pages) > 1 else 0)
+
+    assert feed.drain(handler) == 5
+    assert pages == [[1, 3], [4, 6], [7]]
+    assert Checkpoint(tmp_path / "last_id.txt").value == 7
+
+    insert(backend, ["Anomaly"])
+    assert feed.drain(pages.append) == 1
+    assert pages[-1][0]["id"] == 8
+
+
+def test_failed_page_is_read_again(backend, tmp_path):
+    insert(backend, ["Anomaly"] * 5)
+    feed = AlertFeed(backend, tmp_path / "last_id.txt", page_size=2)
+    seen = []
+
+    def flaky(rows):
+        seen.append([row["id"] for row in rows])
+        if len(seen) == 2:
+            raise RuntimeError("delivery timed out")
+
+    with pytest.raises(RuntimeError):
+        feed.drain(flaky)
+    assert feed.checkpoint.value == 2
+
+    # A restarted service resumes from the file
+    resumed = AlertFeed(backend, tmp_path / "last_id.txt", page_size=2)
+    assert resumed.drain(flaky) == 3
+    assert seen == [[1, 2], [3, 4], [3, 4], [5]]
+
+
+def test_checkpoint_tolerates_missing_or_corrupt_file(tmp_path):
+    path = tmp_path / "last_id.txt"
+    assert Checkpoint(path).value == 0
+    path.write_text("garbage")
+    assert Checkpoint(path).value == 0
+    Checkpoint(path).save(42)
+    assert path.read_text() == "42"
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".last_id-")]
+
+
+def test_doorbell_wakes_listener():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    listener = DoorbellListener("127.0.0.1", port)
+    doorbell = Doorbell("127.0.0.1", port)
+    try:
+        assert listener.wait(0.01) is False
+        doorbell.ring()
+        doorbell.ring()
+        assert listener.wait(1.0) is True
+        assert listener.wait(0.01) is False   # both rings consumed by one wake-up
+    finally:
+        doorbell.close()
+        listener.close()
@@ -0,0 +1,94 @@
+import time
+
+from detection_pipeline import AdaptiveBatcher, DetectionPipeline
+
+
+def test_batcher_grows_on_backlog_and_full_fast_batches():
+    batcher = AdaptiveBatcher(min_size=8, max_size=32, latency_target=0.2)
+    batcher.observe(8, 0.01, 0.01, filled=False, backlog=3)
+    assert batcher.size == 16
+    batcher.observe(16, 0.01, 0.01, filled=True)
+    assert batcher.size == 32
+    batcher.observe(32, 0.01, 0.01, filled=True)
+    assert batcher.size == 32   # capped
+    assert batcher.stats()['grows'] == 2
+
+
+def test_batcher_shrinks_when_latency_exceeds_target():
+    batcher = AdaptiveBatcher(min_size=8, max_size=64, latency_target=0.2)
+    batcher.size = 32
+    batcher.observe(32, 0.15, 0.1, filled=True)
+    assert batcher.size == 16
+    batcher.observe(16, 0.05, 0.01, filled=False)   # partial and fast: unchanged
+    assert batcher.size == 16
+    assert batcher.stats()['shrinks'] == 1
+
+
+def test_batcher_without_latency_target_grows_to_max():
+    batcher = AdaptiveBatcher(min_size=8, max_size=64, latency_target=None)
+    for _ in range(5):
+        batcher.observe(batcher.size, 10.0, 10.0, filled=True)
+    assert batcher.size == 64
+
+
+def make_pipeline(sink, **kwargs):
+    def extract(packet, row):
+        row[0] = packet
+        return (packet,)
+
+    return DetectionPipeline(extract, lambda block: [meta[0] for meta in block.meta], sink, **kwargs)
+
+
+def test_timer_flushes_partial_batch():
+    written = []
+    pipeline = make_pipeline(written.extend, batcher=AdaptiveBatcher(min_size=64, max_size=64,
+                                                                      latency_target=0.05))
+    pipeline.start()
+    try:
+        for packet in range(3):
+            pipeline.submit(packet)
+        deadline = time.monotonic() + 2.0
+        while len(written) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert written == [0, 1, 2]
+        assert pipeline.batcher.stats()['timer_flushes'] >= 1
+    finally:
+        pipeline.stop()
+
+
+def test_stop_delivers_every_scored_packet_to_a_slow_sink():
+    written = []
+
+    def slow_sink(result):
+        time.sleep(0.02)
+        written.extend(result)
+
+    pipeline = make_pipeline(slow_sink, batcher=AdaptiveBatcher(min_size=8, max_size=8),
+                             sink_queue_size=1, sink_timeout=0.001)
+    pipeline.start()
+    for packet in range(200):
+        pipeline.submit(packet)
+    pipeline.stop()
+
+    stats = pipeline.stats()
+    lost = stats['capture']['dropped'] + stats['sink']['dropped_rows']
+    assert len(written) + lost == 200
+    assert stats['sink']['dropped'] * 8 == stats['sink']['dropped_rows']
+
+
+def test_batches_queued_at_stop_are_not_dropped():
+    written = []
+
+    def slow_sink(result):
+        time.sleep(0.02)
+        written.extend(result)
+
+    pipeline = make_pipeline(slow_sink, batcher=AdaptiveBatcher(min_size=8, max_size=8),
+                             sink_queue_size=1, sink_timeout=0.005)
+    for packet in range(200):   # 25 blocks waiting for inference
+        pipeline.submit(packet)
+    pipeline.start()
+    pipeline.stop()
+
+    assert sorted(written) == list(range(200))
+    assert pipeline.stats()['sink']['dropped'] == 0
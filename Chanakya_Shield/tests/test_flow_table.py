@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+
+from flow_table import N_FEATURES, FlowTable, ip_to_int
+
+A = ip_to_int("10.0.0.1")
+B = ip_to_int("10.0.0.2")
+C = ip_to_int("10.0.0.3")
+
+
+def row():
+    return np.zeros(N_FEATURES)
+
+
+def test_both_directions_share_one_flow():
+    table = FlowTable(max_flows=8)
+    out = row()
+    first = table.update(A, B, 100, 0x02, 80, 1000.0, out)
+    second = table.update(B, A, 60, 0x12, 5555, 1000.5, out)
+
+    assert first == second
+    assert len(table) == 1
+    # dport, duration (us), fwd/bwd packets and bytes, means, packets/s
+    assert out[0] == 5555
+    assert out[1] == 500000
+    assert list(out[2:8]) == [1, 1, 100, 60, 100.0, 60.0]
+    assert out[8] == 4.0
+    # This packet's flags (SYN + ACK)
+    assert list(out[9:15]) == [0, 1, 0, 0, 1, 0]
+
+
+def test_record_verdicts_ignores_reused_slots():
+    ended = []
+    table = FlowTable(max_flows=1, on_expire=ended.extend)
+    stale = table.update(A, B, 100, 0, 80, 1000.0, row())
+    current = table.update(A, C, 100, 0, 80, 1001.0, row())   # evicts A-B from the only slot
+
+    table.record_verdicts([stale, current], [0.9, 0.4], [3, -1])
+    table.drain()
+
+    assert [r.flow_id for r in ended] == [stale, current]
+    record = ended[-1]
+    assert record.max_score == 0.4
+    assert record.attack_packets == 0 and record.verdict == -1
+
+
+def test_packet_after_idle_timeout_starts_new_flow():
+    ended = []
+    table = FlowTable(max_flows=8, idle_timeout=10.0, on_expire=ended.extend)
+    first = table.update(A, B, 100, 0, 80, 1000.0, row())
+    out = row()
+    second = table.update(A, B, 100, 0, 80, 1011.0, out)
+
+    assert second != first
+    assert [r.reason for r in ended] == ["idle"]
+    assert out[2] == 1   # forward packet count restarted
+    assert table.stats()['evicted_idle'] == 1
+
+
+def test_expire_ends_idle_and_active_flows():
+    ended = []
+    table = FlowTable(max_flows=8, idle_timeout=10.0, active_timeout=30.0, on_expire=ended.extend)
+    table.update(A, B, 100, 0, 80, 1000.0, row())      # idle by 1015
+    for t in range(1000, 1035, 5):                      # busy, but older than 30 s
+        table.update(A, C, 100, 0, 80, float(t), row())
+
+    assert table.expire(now=1015.0) == 1
+    assert table.expire(now=1035.0) == 1
+    assert [r.reason for r in ended] == ["idle", "active"]
+    assert len(table) == 0
+
+
+def test_full_table_evicts_least_recently_seen():
+    ended = []
+    table = FlowTable(max_flows=4, on_expire=ended.extend)
+    peers = [ip_to_int(f"10.0.1.{i}") for i in range(5)]
+    for i, peer in enumerate(peers[:4]):
+        table.update(A, peer, 100, 0, 80, 1000.0 + i, row())
+    table.update(A, peers[0], 100, 0, 80, 1005.0, row())   # refresh the oldest
+    table.update(A, peers[4], 100, 0, 80, 1006.0, row())   # table full
+
+    assert len(table) == 4
+    assert [(r.reason, r.ip_b) for r in ended] == [("lru", peers[1])]
+    assert table.stats()['evicted_lru'] == 1
+
+
+def test_sweeper_expires_in_background():
+    ended = []
+    table = FlowTable(max_flows=8, idle_timeout=0.05, on_expire=ended.extend)
+    table.update(A, B, 100, 0, 80, 1000.0, row())
+    table.start_sweeper(interval=0.01)
+    try:
+        deadline = time.monotonic() + 2.0
+        while not ended and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        table.stop_sweeper()
+    assert [r.reason for r in ended] == ["idle"]
@@ -0,0 +1,92 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import model_bundle
+from model_bundle import BundleError, BundleWatcher
+
+FEATURES = [f"f{i}" for i in range(6)]
+SELECTED = [0, 2, 3, 5]
+
+
+@pytest.fixture(scope="module")
+def components():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, len(FEATURES)))
+    y = (X[:, 0] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    X_sel = scaler.transform(X)[:, SELECTED]
+    return {
+        'iso_model': IsolationForest(n_estimators=10, random_state=0).fit(X_sel),
+        'classifier': LogisticRegression().fit(X_sel, y),
+        'scaler': scaler,
+        'label_map': {'BENIGN': 0, 'DDoS': 1},
+        'optimal_thresholds': {'BENIGN': 0.5, 'DDoS': 0.6},
+        'selected_features_idx': np.array(SELECTED),
+    }
+
+
+def test_save_publishes_current_and_loads(tmp_path, components):
+    manifest = model_bundle.save_bundle(components, FEATURES, str(tmp_path))
+    assert (tmp_path / model_bundle.CURRENT_FILE).read_text().strip() == manifest['version']
+    assert manifest['schema']['selected_features'] == ["f0", "f2", "f3", "f5"]
+
+    bundle = model_bundle.load_bundle(str(tmp_path))
+    assert bundle.version == manifest['version']
+    assert bundle.label_map == components['label_map']
+    X = np.ones((3, len(SELECTED)))
+    assert np.array_equal(bundle.classifier.predict_proba(X), components['classifier'].predict_proba(X))
+
+
+def test_old_versions_are_collected(tmp_path, components):
+    versions = [model_bundle.save_bundle(components, FEATURES, str(tmp_path))['version'] for _ in range(4)]
+    assert model_bundle._version_dirs(str(tmp_path)) == versions[-model_bundle.KEEP_VERSIONS:]
+    assert model_bundle.load_bundle(str(tmp_path)).version == versions[-1]
+
+
+def test_validate_rejects_mismatched_schema(tmp_path, components):
+    with pytest.raises(BundleError, match="Scaler expects"):
+        model_bundle.save_bundle(components, FEATURES + ["extra"], str(tmp_path))
+    assert not (tmp_path / model_bundle.CURRENT_FILE).exists()
+
+
+def test_checksum_mismatch_raises(tmp_path, components):
+    manifest = model_bundle.save_bundle(components, FEATURES, str(tmp_path))
+    with open(tmp_path / manifest['version'] / model_bundle.MODELS_FILE, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(BundleError, match="Checksum"):
+        model_bundle.load_bundle(str(tmp_path))
+
+
+def test_watcher_swaps_on_publish_only(tmp_path, components):
+    first = model_bundle.save_bundle(components, FEATURES, str(tmp_path))
+    loaded = []
+    watcher = BundleWatcher(str(tmp_path), loaded.append, current_version=first['version'])
+    assert not watcher.check()
+
+    second = model_bundle.save_bundle(components, FEATURES, str(tmp_path))
+    assert watcher.check()
+    assert [bundle.version for bundle in loaded] == [second['version']]
+    assert watcher.version == second['version']
+    assert not watcher.check()
+
+
+def test_watcher_waits_for_a_first_bundle(tmp_path, components):
+    loaded = []
+    watcher = BundleWatcher(str(tmp_path), loaded.append)
+    assert not watcher.check()
+    manifest = model_bundle.save_bundle(components, FEATURES, str(tmp_path))
+    assert watcher.check()
+    assert loaded[0].version == manifest['version']
+
+
+def test_legacy_pickles_match_bundle(tmp_path, components):
+    paths = model_bundle.write_legacy_pickles(components, str(tmp_path))
+    assert sorted(os.path.basename(p) for p in paths) == sorted(model_bundle.LEGACY_FILES.values())
+    assert joblib.load(tmp_path / "optimal_thresholds.pkl") == components['optimal_thresholds']
+    assert joblib.load(tmp_path / "selected_features_idx.pkl").tolist() == SELECTED
@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+import schema
+from db_writer import SQLiteBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "detections.db"))
+
+
+def query(backend, sql, params=()):
+    conn = backend.connect()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        backend.release(conn)
+
+
+def test_migrate_creates_tables_indexes_and_records_versions(backend):
+    assert schema.migrate(backend) == schema.LATEST_VERSION
+    versions = [row[0] for row in query(backend, "SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [number for number, _, _ in schema.MIGRATIONS]
+    indexes = {row[0] for row in query(backend, "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {name for table in schema.INDEXES.values() for name in table} <= indexes
+
+
+def test_migrate_is_idempotent(backend, capsys):
+    schema.migrate(backend)
+    capsys.readouterr()
+    assert schema.migrate(backend) == schema.LATEST_VERSION
+    assert "migrated" not in capsys.readouterr().out
+    assert len(query(backend, "SELECT * FROM schema_version")) == len(schema.MIGRATIONS)
+
+
+def test_migrate_upgrades_an_old_packets_table(backend):
+    conn = backend.connect()
+    conn.execute("CREATE TABLE packets (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME, "
+                 "src_ip VARCHAR(45), dest_ip VARCHAR(45), protocol VARCHAR(10), length INT, flags INT)")
+    conn.execute("INSERT INTO packets (timestamp, src_ip) VALUES (NULL, '10.0.0.1')")
+    conn.commit()
+    backend.release(conn)
+
+    schema.migrate(backend)
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        assert set(schema.PACKETS_LATE_COLUMNS) <= schema._columns(cursor, "packets")
+    finally:
+        backend.release(conn)
+    # The timestamp stays nullable outside MySQL partitioning
+    assert query(backend, "SELECT src_ip, timestamp FROM packets") == [("10.0.0.1", None)]
+
+
+def test_check_migrates_private_sqlite_only(backend):
+    assert schema.check(backend) == schema.LATEST_VERSION
+
+
+def test_maintain_deletes_expired_rows_on_sqlite(backend):
+    schema.migrate(backend)
+    today = datetime.date(2026, 3, 1)
+    conn = backend.connect()
+    conn.executemany("INSERT INTO packets (timestamp, src_ip) VALUES (?, ?)", [
+        (datetime.datetime(2026, 1, 1), "old"),
+        (datetime.datetime(2026, 2, 20), "recent"),
+    ])
+    conn.commit()
+    backend.release(conn)
+
+    report = schema.maintain(backend, retention_days=30, today=today)
+    assert report['packets'] == {'added': 0, 'dropped': 1}
+    assert query(backend, "SELECT src_ip FROM packets") == [("recent",)]
+
+
+def test_day_partitions_cover_each_day_once():
+    clauses = schema._day_partitions(datetime.date(2026, 2, 27), datetime.date(2026, 3, 1))
+    assert [clause.split()[1] for clause in clauses] == ["p20260227", "p20260228", "p20260301"]
+    assert schema._from_days(schema._to_days(datetime.date(2026, 3, 2))) == datetime.date(2026, 3, 2)
+    assert clauses[-1].endswith(f"({schema._to_days(datetime.date(2026, 3, 2))})")
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import VotingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import GaussianNB
+
+from scoring import CascadeScorer, apply_thresholds, benign_index, threshold_vector, tune_thresholds
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = np.digitize(X[:, 0] + 0.5 * X[:, 1], [-0.5, 0.5])
+    # The member names are what CascadeScorer looks up; any probabilistic
+    # estimators stand in for LightGBM and the SVM
+    ensemble = VotingClassifier(
+        [("lgb", LogisticRegression()), ("svm", GaussianNB())], voting="soft", weights=[2, 1]
+    ).fit(X, y)
+    return X, y, ensemble
+
+
+def test_threshold_vector_and_apply():
+    thresholds = threshold_vector({1: 0.7, 5: 0.9}, 3)
+    assert thresholds.tolist() == [0.5, 0.7, 0.5]
+    y_proba = np.array([[0.2, 0.6, 0.2], [0.1, 0.8, 0.1], [0.1, 0.3, 0.6]])
+    assert apply_thresholds(y_proba, thresholds, benign_idx=0).tolist() == [0, 1, 2]
+
+
+def test_benign_index_accepts_lists_and_dicts():
+    assert benign_index(["DDoS", "BENIGN"]) == 1
+    assert benign_index({0: "PortScan", 3: "BENIGN"}) == 3
+    assert benign_index(["DDoS"]) == 0
+
+
+def test_tune_thresholds_picks_the_best_f1():
+    y_true = np.array([0, 0, 1, 1])
+    y_proba = np.array([[0.6, 0.4], [0.45, 0.55], [0.3, 0.7], [0.2, 0.8]])
+    thresholds = tune_thresholds(y_true, y_proba)
+    # Class 1 needs a threshold above 0.55 and at most 0.7 to separate perfectly
+    assert 0.55 < thresholds[1] <= 0.7
+    assert set(thresholds) == {0, 1}
+
+
+def test_cascade_matches_full_ensemble_when_everything_is_uncertain(data):
+    X, _, ensemble = data
+    thresholds = threshold_vector({0: 0.4, 1: 0.5, 2: 0.6}, 3)
+    scorer = CascadeScorer(ensemble, uncertain_band=(0.0, 1.01))
+    outliers = np.ones(len(X), dtype=bool)
+
+    expected = apply_thresholds(ensemble.predict_proba(X), thresholds, benign_idx=1)
+    assert np.array_equal(scorer.predict(X, outliers, thresholds, benign_idx=1), expected)
+    assert scorer.stats()['svm_rate'] == 1.0
+
+
+def test_cascade_skips_inliers_and_confident_rows(data):
+    X, _, ensemble = data
+    scorer = CascadeScorer(ensemble, uncertain_band=(0.2, 0.9))
+    outliers = np.zeros(len(X), dtype=bool)
+    outliers[::3] = True
+
+    predictions = scorer.predict(X, outliers, None, benign_idx=1)
+    assert (predictions[~outliers] == 1).all()
+
+    lgb = ensemble.named_estimators_["lgb"]
+    confidence = lgb.predict_proba(X[outliers]).max(axis=1)
+    confident = confidence >= 0.9
+    assert np.array_equal(predictions[outliers][confident], np.argmax(lgb.predict_proba(X[outliers][confident]), axis=1))
+
+    stats = scorer.stats()
+    assert stats['rows'] == len(X)
+    assert stats['lgb_rows'] == outliers.sum()
+    assert stats['svm_rows'] == (~confident & (confidence >= 0.2)).sum()
+
+
+def test_cascade_needs_an_lgb_member(data):
+    X, y, _ = data
+    ensemble = VotingClassifier([("lr", LogisticRegression())], voting="soft").fit(X, y)
+    with pytest.raises(ValueError):
+        CascadeScorer(ensemble)